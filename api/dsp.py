@@ -1,11 +1,13 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 import requests
-from requests import adapters
-from urllib3.util import retry
 
 import config
+from api.pagination import HalPaginator
+from api.session import create_session, shared_session
 from utils.token_manager import TokenManager
 
 
@@ -17,7 +19,7 @@ class AAPTokenClient:
 
     def retrieve_token(self):
         token = ''
-        response = requests.get(self.url, auth=(self.username, self.password))
+        response = shared_session().get(self.url, auth=(self.username, self.password))
         if response.ok:
             token = response.text
         return token
@@ -49,17 +51,8 @@ class DataSubmissionPortal:
         self.aap_api_domain = config.AAP_API_DOMAIN
         self.token_client = AAPTokenClient(url=config.AAP_API_URL)
         self.token_manager = TokenManager(token_client=self.token_client)
-        retry_policy = retry.Retry(
-            total=100,  # seems that this has a default value of 10,
-            # setting this to a very high number so that it'll respect the status retry count
-            status=17,  # status is the no. of retries if response is in status_forcelist,
-            # this count will retry for ~20mins with back off timeout within
-            read=10,
-            status_forcelist=[500, 502, 503, 504],
-            backoff_factor=0.6)
-        self.session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=retry_policy)
-        self.session.mount('https://', adapter)
+        self.session = create_session()
+        self.paginator = HalPaginator(self.session, self.get_headers)
 
     def get_headers(self):
         return {
@@ -140,6 +133,20 @@ class DataSubmissionPortal:
         else:
             response.raise_for_status()
 
+    def get_current_versions(self, entity_keys: List[Tuple[str, str]],
+                             max_workers: int = None) -> Dict[Tuple[str, str], dict]:
+        """
+        Current versions of many (entity_type, alias) pairs, None for the aliases not in DSP. DSP has no bulk
+        search so the searches are sent concurrently.
+        """
+        entity_keys = list(dict.fromkeys(entity_keys))
+        max_workers = max_workers if max_workers else config.BULK_LOOKUP_WORKERS
+        if len(entity_keys) <= 1 or max_workers <= 1:
+            return {entity_key: self.get_current_version(*entity_key) for entity_key in entity_keys}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(entity_keys))) as executor:
+            versions = executor.map(lambda entity_key: self.get_current_version(*entity_key), entity_keys)
+            return dict(zip(entity_keys, versions))
+
     # ===
 
     def _get(self, url):
@@ -175,12 +182,4 @@ class DataSubmissionPortal:
         return []
 
     def _get_all(self, url, entity_type):
-        r = self.session.get(url, headers=self.get_headers())
-        r.raise_for_status()
-        if "_embedded" in r.json():
-            for entity in r.json()["_embedded"][entity_type]:
-                yield entity
-            while "next" in r.json()["_links"]:
-                r = self.session.get(r.json()["_links"]["next"]["href"], headers=self.get_headers())
-                for entity in r.json()["_embedded"][entity_type]:
-                    yield entity
+        return self.paginator.get_all(url, entity_type)
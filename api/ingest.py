@@ -1,20 +1,37 @@
 import json
 import logging
 import os
-from typing import Iterator, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
 from urllib.parse import urlparse
 
 import requests
 from ingest.utils.s2s_token_client import S2STokenClient
 from ingest.utils.token_manager import TokenManager
-from requests import adapters
-from urllib3.util import retry
 
 import config
+from api import schema
+from api.pagination import HalPaginator
+from api.revalidation import RevalidationStore, enable_revalidation
+from api.schema import SchemaRegistry
+from api.session import create_session, shared_session
+from utils.cache import EntityCache, LruEntityCache, SingleFlight
+
+# shared by all IngestAPI instances so that threads archiving from the same project wait on one request per url
+_in_flight = SingleFlight()
+
+
+def create_token_manager():
+    if os.environ.get('INGEST_API_GCP'):
+        token_client = S2STokenClient()
+        token_client.setup_from_env_var('INGEST_API_GCP')
+        return TokenManager(token_client)
+    return False
 
 
 class IngestAPI:
-    def __init__(self, url=None):
+    def __init__(self, url=None, entity_cache: EntityCache = None, schema_registry: SchemaRegistry = None,
+                 revalidation_store: RevalidationStore = None, single_flight: SingleFlight = None):
         self.logger = logging.getLogger(__name__)
         self.headers = {
             'Content-type': 'application/json',
@@ -22,28 +39,18 @@ class IngestAPI:
         self.url = url if url else config.INGEST_API_URL
         self.url = self.url.rstrip('/')
         self.logger.info(f'Using {self.url}')
-        self.entity_cache = {}
+        self.entity_cache = entity_cache if entity_cache is not None else self.create_entity_cache()
         self.cache_enabled = True
+        self.schema_registry = schema_registry if schema_registry is not None else schema._registry
+        self.single_flight = single_flight if single_flight is not None else _in_flight
+        self.bulk_lookup_workers = config.BULK_LOOKUP_WORKERS
 
-        retry_policy = retry.Retry(
-            total=100,  # seems that this has a default value of 10,
-            # setting this to a very high number so that it'll respect the status retry count
-            status=17,  # status is the no. of retries if response is in status_forcelist,
-            # this count will retry for ~20mins with back off timeout within
-            read=10,
-            status_forcelist=[500, 502, 503, 504],
-            backoff_factor=0.6)
-
-        self.session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=retry_policy)
-        self.session.mount('https://', adapter)
-
-        if os.environ.get('INGEST_API_GCP'):
-            token_client = S2STokenClient()
-            token_client.setup_from_env_var('INGEST_API_GCP')
-            self.token_manager = TokenManager(token_client)
-        else:
-            self.token_manager = False
+        self.session = create_session()
+        # entities that drop out of the entity cache are revalidated with conditional GETs instead of re-downloaded
+        self.revalidation_store = enable_revalidation(self.session, revalidation_store)
+        self.paginator = HalPaginator(self.session, self.get_headers)
+
+        self.token_manager = create_token_manager()
 
     def set_token(self, token):
         self.token = token
@@ -89,15 +96,42 @@ class IngestAPI:
     def get_concrete_entity_type(self, entity):
         content = entity.get('content')
         schema_url = content.get('describedBy')
-        response = self.session.get(schema_url, headers=self.get_headers())
-        schema = self._handle_response(response)
+        return self.schema_registry.get_schema_name(schema_url, self._get_schema)
 
-        return schema.get('name')
+    def _get_schema(self, schema_url):
+        # not retried on 5xx like the ingest requests, the name can be told from the url in the meantime
+        response = shared_session().get(schema_url, headers=self.get_headers())
+        return self._handle_response(response)
 
     def get_entity_by_uuid(self, entity_type, uuid):
         entity_url = f'{self.url}/{entity_type}/search/findByUuid?uuid={uuid}'
         return self.get_entity(entity_url)
 
+    def get_entities_by_uuid(self, entity_uuids: Iterable[Tuple[str, str]]) -> List[dict]:
+        """
+        Resolves many (entity_type, uuid) pairs at once, in the order given. Cached entities are returned without
+        a request, the rest are looked up concurrently.
+        """
+        entity_urls = [f'{self.url}/{entity_type}/search/findByUuid?uuid={uuid}' for entity_type, uuid in entity_uuids]
+        return self.get_entities(entity_urls)
+
+    def get_entities(self, entity_urls: List[str]) -> List[dict]:
+        entities = {}
+        missing_urls = []
+        for entity_url in dict.fromkeys(entity_urls):
+            entity_json = self._get_cached_entity(entity_url)
+            if entity_json:
+                entities[entity_url] = entity_json
+            else:
+                missing_urls.append(entity_url)
+
+        if len(missing_urls) > 1 and self.bulk_lookup_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.bulk_lookup_workers, len(missing_urls))) as executor:
+                entities.update(zip(missing_urls, executor.map(self.get_entity, missing_urls)))
+        else:
+            entities.update((entity_url, self.get_entity(entity_url)) for entity_url in missing_urls)
+        return [entities[entity_url] for entity_url in entity_urls]
+
     def get_entity_by_id(self, entity_type, entity_id):
         entity_url = f'{self.url}/{entity_type}/{entity_id}'
         return self.get_entity(entity_url)
@@ -105,9 +139,13 @@ class IngestAPI:
     def get_entity(self, entity_url):
         entity_json = self._get_cached_entity(entity_url)
         if not entity_json:
-            response = self.session.get(entity_url, headers=self.get_headers())
-            entity_json = self._handle_response(response)
-            self._cache_entity(entity_url, entity_json)
+            entity_json = self.single_flight.do(f'GET {entity_url}', lambda: self.__fetch_entity(entity_url))
+        return entity_json
+
+    def __fetch_entity(self, entity_url):
+        response = self.session.get(entity_url, headers=self.get_headers())
+        entity_json = self._handle_response(response)
+        self._cache_entity(entity_url, entity_json)
         return entity_json
 
     def patch_entity_by_id(self, entity_type, entity_id, entity_patch):
@@ -115,16 +153,43 @@ class IngestAPI:
         patch = json.dumps(entity_patch)
         response = self.session.patch(entity_url, patch, headers=self.get_headers())
         entity_json = self._handle_response(response)
+        self._invalidate_cached_entity(entity_url, entity_json)
         self._cache_entity(entity_url, entity_json)
         return entity_json
 
+    @staticmethod
+    def create_entity_cache() -> EntityCache:
+        return LruEntityCache(max_entries=config.ENTITY_CACHE_MAX_ENTRIES,
+                              max_bytes=config.ENTITY_CACHE_MAX_BYTES,
+                              default_ttl=config.ENTITY_CACHE_TTL,
+                              ttl_by_type=config.ENTITY_CACHE_TTL_BY_TYPE)
+
+    def get_cache_stats(self) -> dict:
+        return self.entity_cache.stats.as_dict()
+
+    def get_revalidation_stats(self) -> dict:
+        return self.revalidation_store.stats.as_dict() if self.revalidation_store is not None else {}
+
     def _get_cached_entity(self, url):
-        if self.cache_enabled and self.entity_cache.get(url):
+        if self.cache_enabled:
             return self.entity_cache.get(url)
 
     def _cache_entity(self, url, entity_json):
-        if self.cache_enabled and not self.entity_cache.get(url):
-            self.entity_cache[url] = entity_json
+        if self.cache_enabled and entity_json:
+            self.entity_cache.put(url, entity_json)
+
+    def _invalidate_cached_entity(self, url, entity_json):
+        """An entity is cached under its self link and under its uuid search urls, all of them are invalidated"""
+        self_link = entity_json.get('_links', {}).get('self', {}).get('href', url)
+        urls = {url, self_link}
+        entity_uuid = (entity_json.get('uuid') or {}).get('uuid')
+        if entity_uuid:
+            entity_type, _ = self.entity_info_from_url(self_link)
+            urls.add(f'{self.url}/{entity_type}/search/findByUuid?uuid={entity_uuid}')
+            if entity_type == 'submissionEnvelopes':
+                urls.add(f'{self.url}/submissionEnvelopes/search/findByUuidUuid?uuid={entity_uuid}')
+        for cached_url in urls:
+            self.entity_cache.invalidate(cached_url)
 
     def get_submission_by_uuid(self, submission_uuid):
         entity_url = f'{self.url}/submissionEnvelopes/search/findByUuidUuid?uuid={submission_uuid}'
@@ -192,15 +257,7 @@ class IngestAPI:
         return link['href'].rsplit("{")[0] if link else ''
 
     def _get_all(self, url, entity_type):
-        r = self.session.get(url, headers=self.get_headers())
-        r.raise_for_status()
-        if "_embedded" in r.json():
-            for entity in r.json()["_embedded"][entity_type]:
-                yield entity
-            while "next" in r.json()["_links"]:
-                r = self.session.get(r.json()["_links"]["next"]["href"], headers=self.get_headers())
-                for entity in r.json()["_embedded"][entity_type]:
-                    yield entity
+        return self.paginator.get_all(url, entity_type)
 
     def create_archive_submission(self, archive_submission):
         url = f'{self.url}/archiveSubmissions/'
@@ -238,6 +295,13 @@ class IngestAPI:
         return self.post(url, payload)
 
     def get(self, url, **kwargs):
+        # kwargs other than params could make two GETs of the same url differ, so those are not shared
+        if set(kwargs) - {'params'}:
+            return self.__get(url, **kwargs)
+        key = 'GET ' + requests.Request('GET', url, params=kwargs.get('params')).prepare().url
+        return self.single_flight.do(key, lambda: self.__get(url, **kwargs))
+
+    def __get(self, url, **kwargs):
         r = self.session.get(url, headers=self.headers, **kwargs)
         r.raise_for_status()
         return r.json()
@@ -250,7 +314,9 @@ class IngestAPI:
     def patch(self, url, patch):
         r = self.session.patch(url, json=patch, headers=self.headers)
         r.raise_for_status()
-        return r.json()
+        entity_json = r.json()
+        self._invalidate_cached_entity(url, entity_json)
+        return entity_json
 
     def put(self, url):
         r = self.session.put(url, headers=self.headers)
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+
+import aiohttp
+from urllib3.util import retry
+
+import config
+from api import schema
+from api.ingest import IngestAPI, create_token_manager
+from api.pagination import HalPaginator
+from api.schema import SchemaRegistry
+from api.session import create_retry_policy, create_shared_retry_policy
+from utils.cache import EntityCache
+
+
+class AsyncRetry:
+    """
+    Applies the counts and backoff of a urllib3 Retry policy to aiohttp requests, so that AsyncIngestAPI retries the
+    same way as the requests session used by IngestAPI.
+    """
+
+    def __init__(self, policy: retry.Retry):
+        self.total = policy.total
+        self.connect = policy.connect
+        self.read = policy.read
+        self.status = policy.status
+        self.status_forcelist = set(policy.status_forcelist or [])
+        self.backoff_factor = policy.backoff_factor
+        self.backoff_max = getattr(policy, 'backoff_max', None) or getattr(policy, 'BACKOFF_MAX', None) or \
+            getattr(retry.Retry, 'DEFAULT_BACKOFF_MAX', 120)
+        methods = getattr(policy, 'allowed_methods', None) or getattr(policy, 'method_whitelist', None)
+        self.allowed_methods = {method.upper() for method in methods} if methods else None
+        self.retry_after_status_codes = set(getattr(retry.Retry, 'RETRY_AFTER_STATUS_CODES', {413, 429, 503}))
+
+    def new_state(self) -> 'AsyncRetryState':
+        return AsyncRetryState(self)
+
+    def is_method_retryable(self, method: str) -> bool:
+        return self.allowed_methods is None or method.upper() in self.allowed_methods
+
+
+class AsyncRetryState:
+    def __init__(self, policy: AsyncRetry):
+        self.policy = policy
+        self.total = policy.total
+        self.connect = policy.connect
+        self.read = policy.read
+        self.status = policy.status
+        self.attempts = 0
+
+    def on_status(self, method: str, status: int) -> bool:
+        if status not in self.policy.status_forcelist or not self.policy.is_method_retryable(method):
+            return False
+        return self.__consume('status')
+
+    def on_connect_error(self) -> bool:
+        return self.__consume('connect')
+
+    def on_read_error(self, method: str) -> bool:
+        if not self.policy.is_method_retryable(method):
+            return False
+        return self.__consume('read')
+
+    def get_backoff(self, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                pass
+        if self.attempts <= 1:
+            return 0
+        return min(self.policy.backoff_max, self.policy.backoff_factor * (2 ** (self.attempts - 1)))
+
+    def __consume(self, counter: str) -> bool:
+        remaining = getattr(self, counter)
+        if remaining is not None:
+            if remaining <= 0:
+                return False
+            setattr(self, counter, remaining - 1)
+        if self.total is not None:
+            if self.total <= 0:
+                return False
+            self.total -= 1
+        self.attempts += 1
+        return True
+
+
+class AsyncIngestAPI:
+    """
+    asyncio counterpart of IngestAPI, sharing its entity cache, schema registry, retry policy and token handling.
+    All requests go through one aiohttp session whose connection pool is bounded by INGEST_ASYNC_POOL_SIZE.
+    Use it as an async context manager so that the pool is closed when done:
+
+        async with AsyncIngestAPI() as ingest_api:
+            biomaterials = await asyncio.gather(*[ingest_api.get_biomaterial_by_uuid(uuid) for uuid in uuids])
+    """
+
+    def __init__(self, url=None, entity_cache: EntityCache = None, schema_registry: SchemaRegistry = None,
+                 pool_size: int = None, retry_policy: retry.Retry = None):
+        self.logger = logging.getLogger(__name__)
+        self.headers = {
+            'Content-type': 'application/json',
+        }
+        self.url = url if url else config.INGEST_API_URL
+        self.url = self.url.rstrip('/')
+        self.logger.info(f'Using {self.url}')
+        self.entity_cache = entity_cache if entity_cache is not None else IngestAPI.create_entity_cache()
+        self.cache_enabled = True
+        self.schema_registry = schema_registry if schema_registry is not None else schema._registry
+        self.pool_size = pool_size if pool_size else config.INGEST_ASYNC_POOL_SIZE
+        self.retry = AsyncRetry(retry_policy if retry_policy else create_retry_policy())
+        # as with IngestAPI, schemas are not retried on 5xx, the name can be told from the url in the meantime
+        self.schema_retry = AsyncRetry(create_shared_retry_policy())
+        self.token_manager = create_token_manager()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def set_token(self, token):
+        self.token = token
+        self.headers['Authorization'] = self.token
+        self.logger.debug(f'Token set!')
+
+        return self.headers
+
+    async def get_headers(self):
+        # refresh token, the token client may block so it is called outside of the event loop
+        if self.token_manager:
+            loop = asyncio.get_running_loop()
+            token = await loop.run_in_executor(None, self.token_manager.get_token)
+            self.set_token(f'Bearer {token}')
+            self.logger.debug(f'Token refreshed!')
+
+        return dict(self.headers)
+
+    def get_related_entity(self, entity, relation, related_entity_type) -> AsyncIterator[dict]:
+        related_entity_uri = IngestAPI._get_link(entity, relation)
+        return self._get_all(related_entity_uri, related_entity_type)
+
+    async def get_related_entity_count(self, entity, relation, entity_type) -> int:
+        if relation in entity["_links"]:
+            entity_uri = entity["_links"][relation]["href"]
+            result = await self.get(entity_uri)
+            page = result.get('page')
+            if page:
+                return page.get('totalElements')
+            return len(result["_embedded"][entity_type])
+
+    async def get_submission_by_id(self, submission_id):
+        get_submission_url = self.url + '/submissionEnvelopes/' + submission_id
+        try:
+            return await self.get(get_submission_url)
+        except aiohttp.ClientResponseError:
+            return None
+
+    async def get_concrete_entity_type(self, entity):
+        schema_url = entity.get('content').get('describedBy')
+        if schema_url in self.schema_registry:
+            return self.schema_registry.get_schema_name(schema_url)
+        try:
+            schema_json = await self._request('GET', schema_url, retry_policy=self.schema_retry)
+        except aiohttp.ClientError as e:
+            self.logger.warning(f'Could not retrieve schema {schema_url}, using url to resolve type: {str(e)}')
+            return self.schema_registry.name_from_url(schema_url)
+        return self.schema_registry.get_schema_name(schema_url, lambda url: schema_json)
+
+    async def get_entity_by_uuid(self, entity_type, uuid):
+        entity_url = f'{self.url}/{entity_type}/search/findByUuid?uuid={uuid}'
+        return await self.get_entity(entity_url)
+
+    async def get_entity_by_id(self, entity_type, entity_id):
+        entity_url = f'{self.url}/{entity_type}/{entity_id}'
+        return await self.get_entity(entity_url)
+
+    async def get_entity(self, entity_url):
+        entity_json = self.entity_cache.get(entity_url) if self.cache_enabled else None
+        if not entity_json:
+            entity_json = await self._request('GET', entity_url)
+            if self.cache_enabled and entity_json:
+                self.entity_cache.put(entity_url, entity_json)
+        return entity_json
+
+    async def patch_entity_by_id(self, entity_type, entity_id, entity_patch):
+        entity_url = f'{self.url}/{entity_type}/{entity_id}'
+        entity_json = await self._request('PATCH', entity_url, json=entity_patch)
+        self.entity_cache.invalidate(entity_url)
+        if self.cache_enabled and entity_json:
+            self.entity_cache.put(entity_url, entity_json)
+        return entity_json
+
+    async def get_submission_by_uuid(self, submission_uuid):
+        entity_url = f'{self.url}/submissionEnvelopes/search/findByUuidUuid?uuid={submission_uuid}'
+        return await self.get_entity(entity_url)
+
+    async def get_biomaterial_by_uuid(self, biomaterial_uuid):
+        return await self.get_entity_by_uuid('biomaterials', biomaterial_uuid)
+
+    async def get_project_by_uuid(self, project_uuid):
+        return await self.get_entity_by_uuid('projects', project_uuid)
+
+    async def get_file_by_uuid(self, file_uuid):
+        return await self.get_entity_by_uuid('files', file_uuid)
+
+    async def get_manifest_by_id(self, manifest_id):
+        return await self.get_entity_by_id('bundleManifests', manifest_id)
+
+    def get_manifests_from_project(self, project_uuid, bundle_type="PRIMARY") -> AsyncIterator[dict]:
+        entity_url = f'{self.url}/projects/search/findBundleManifestsByProjectUuidAndBundleType' + \
+                     f'?projectUuid={project_uuid}&bundleType={bundle_type}'
+        return self._get_all(entity_url, 'bundleManifests')
+
+    def get_manifests_from_submission(self, submission_uuid) -> AsyncIterator[dict]:
+        entity_url = f'{self.url}/bundleManifests/search/findByEnvelopeUuid?uuid={submission_uuid}'
+        return self._get_all(entity_url, 'bundleManifests')
+
+    async def get_archive_submission_by_dsp_uuid(self, dsp_uuid):
+        url = f'{self.url}/archiveSubmissions/search/findByDspUuid?dspUuid={dsp_uuid}'
+        return await self.get(url)
+
+    async def get_archive_entity_by_dsp_uuid(self, dsp_uuid):
+        url = f'{self.url}/archiveEntities/search/findByDspUuid?dspUuid={dsp_uuid}'
+        return await self.get(url)
+
+    async def get_archive_entity_by_archive_submission_url_and_alias(self, archive_submission_url: str, alias: str):
+        url = f'{self.url}/archiveEntities/search/findByArchiveSubmissionAndAlias'
+        return await self.get(url, params={'archiveSubmission': archive_submission_url, 'alias': alias})
+
+    async def get_entities(self, entity_urls: List[str]) -> List[dict]:
+        return list(await asyncio.gather(*[self.get_entity(entity_url) for entity_url in entity_urls]))
+
+    async def get(self, url, **kwargs):
+        return await self._request('GET', url, **kwargs)
+
+    async def post(self, url, content):
+        return await self._request('POST', url, json=content)
+
+    async def patch(self, url, patch):
+        entity_json = await self._request('PATCH', url, json=patch)
+        self.entity_cache.invalidate(url)
+        return entity_json
+
+    async def put(self, url):
+        return await self._request('PUT', url)
+
+    async def delete(self, url):
+        return await self._request('DELETE', url)
+
+    async def _get_all(self, url, entity_type) -> AsyncIterator[dict]:
+        if config.PAGE_SIZE:
+            url = HalPaginator.set_query_params(url, {'size': config.PAGE_SIZE}, overwrite=False)
+        page = await self.get(url)
+        if '_embedded' not in page:
+            return
+        for entity in page['_embedded'][entity_type]:
+            yield entity
+
+        next_link = page['_links'].get('next')
+        page_info = page.get('page', {})
+        total_pages = page_info.get('totalPages')
+        if next_link and total_pages:
+            next_url = next_link['href'].split('{')[0]
+            page_urls = [HalPaginator.set_query_params(next_url, {'page': number})
+                         for number in range(page_info.get('number', 0) + 1, total_pages)]
+            # pages are requested in windows so that memory stays bounded for very long collections
+            window = max(config.PAGE_PREFETCH_WORKERS, 1) * 2
+            for start in range(0, len(page_urls), window):
+                pages = await asyncio.gather(*[self.get(page_url) for page_url in page_urls[start:start + window]])
+                for page in pages:
+                    for entity in HalPaginator.get_embedded(page, entity_type):
+                        yield entity
+        else:
+            while next_link:
+                page = await self.get(next_link['href'].split('{')[0])
+                for entity in HalPaginator.get_embedded(page, entity_type):
+                    yield entity
+                next_link = page.get('_links', {}).get('next')
+
+    async def _request(self, method, url, retry_policy: AsyncRetry = None, **kwargs):
+        session = self._get_session()
+        retry_policy = retry_policy if retry_policy else self.retry
+        retry_state = retry_policy.new_state()
+        while True:
+            retry_after = None
+            try:
+                async with session.request(method, url, headers=await self.get_headers(), **kwargs) as response:
+                    if response.status < 400 or not retry_state.on_status(method, response.status):
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+                    if response.status in retry_policy.retry_after_status_codes:
+                        retry_after = response.headers.get('Retry-After')
+                    self.logger.debug(f'{method} {url} responded {response.status}, retrying')
+            except aiohttp.ClientConnectorError:
+                if not retry_state.on_connect_error():
+                    raise
+            except (aiohttp.ServerDisconnectedError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+                if not retry_state.on_read_error(method):
+                    raise
+            await asyncio.sleep(retry_state.get_backoff(retry_after))
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if not self.session or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
@@ -1,8 +1,9 @@
 import logging
 import config
-import requests
 from urllib.parse import quote
 
+from api.session import shared_session
+
 
 # iri: "http://purl.obolibrary.org/obo/UBERON_0000948"
 # curie: "obo:UBERON_0000948"
@@ -78,7 +79,7 @@ def get_all(query_url, result_type):
 
 
 def get_json(query_url):
-    response = requests.get(query_url)
+    response = shared_session().get(query_url)
     response.raise_for_status()
     return response.json()
 
@@ -0,0 +1,89 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+import requests
+
+import config
+
+
+class HalPaginator:
+    """
+    Iterates over the embedded entities of a paged HAL resource, parsing each page once.
+    When the first page reports page.totalPages, the remaining pages are requested concurrently on a bounded pool,
+    the entities are still yielded in page order.
+    """
+
+    def __init__(self, session: requests.Session, get_headers: Callable[[], dict],
+                 page_size: int = None, max_workers: int = None):
+        self.session = session
+        self.get_headers = get_headers
+        self.page_size = page_size if page_size is not None else config.PAGE_SIZE
+        self.max_workers = max_workers if max_workers is not None else config.PAGE_PREFETCH_WORKERS
+
+    def get_all(self, url: str, entity_type: str) -> Iterator[dict]:
+        if self.page_size:
+            url = self.set_query_params(url, {'size': self.page_size}, overwrite=False)
+        page = self.get_page(url)
+        if '_embedded' not in page:
+            return
+        yield from self.get_embedded(page, entity_type)
+
+        next_url = self.get_next_url(page)
+        if not next_url:
+            return
+
+        page_info = page.get('page', {})
+        total_pages = page_info.get('totalPages')
+        if total_pages and self.max_workers > 1:
+            next_number = page_info.get('number', 0) + 1
+            page_urls = [self.set_query_params(next_url, {'page': number})
+                         for number in range(next_number, total_pages)]
+            yield from self.__get_pages_concurrently(page_urls, entity_type)
+        else:
+            while next_url:
+                page = self.get_page(next_url)
+                yield from self.get_embedded(page, entity_type)
+                next_url = self.get_next_url(page)
+
+    def get_page(self, url: str) -> dict:
+        response = self.session.get(url, headers=self.get_headers())
+        response.raise_for_status()
+        return response.json()
+
+    def __get_pages_concurrently(self, page_urls, entity_type) -> Iterator[dict]:
+        # at most 2 pages per worker are held in memory ahead of the consumer
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = deque()
+            page_urls = iter(page_urls)
+            for page_url in page_urls:
+                futures.append(executor.submit(self.get_page, page_url))
+                if len(futures) >= window:
+                    break
+            while futures:
+                page = futures.popleft().result()
+                next_page_url = next(page_urls, None)
+                if next_page_url:
+                    futures.append(executor.submit(self.get_page, next_page_url))
+                yield from self.get_embedded(page, entity_type)
+
+    @staticmethod
+    def get_embedded(page: dict, entity_type: str) -> list:
+        return page.get('_embedded', {}).get(entity_type, [])
+
+    @staticmethod
+    def get_next_url(page: dict):
+        next_link = page.get('_links', {}).get('next')
+        return next_link['href'].split('{')[0] if next_link else None
+
+    @staticmethod
+    def set_query_params(url: str, params: dict, overwrite=True) -> str:
+        parsed_url = urlparse(url)
+        query = parse_qsl(parsed_url.query, keep_blank_values=True)
+        existing_keys = {key for key, _ in query}
+        if overwrite:
+            query = [(key, value) for key, value in query if key not in params]
+        query.extend((key, str(value)) for key, value in params.items() if overwrite or key not in existing_keys)
+        return urlunparse(parsed_url._replace(query=urlencode(query)))
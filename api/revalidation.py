@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+from requests import adapters
+
+import config
+from api.session import TimeoutHTTPAdapter
+from utils.cache import CacheStats
+
+
+class StoredResponse:
+    __slots__ = ('url', 'etag', 'last_modified', 'content_type', 'body')
+
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str], content_type: Optional[str],
+                 body: bytes):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.body = body
+
+    def to_dict(self) -> dict:
+        return {
+            'url': self.url,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'content_type': self.content_type,
+            'body': self.body.decode(config.ENCODING)
+        }
+
+    @staticmethod
+    def from_dict(stored: dict) -> 'StoredResponse':
+        return StoredResponse(stored['url'], stored.get('etag'), stored.get('last_modified'),
+                              stored.get('content_type'), stored['body'].encode(config.ENCODING))
+
+
+class RevalidationStore(ABC):
+    """
+    Keeps the last body and validators (ETag, Last-Modified) of the GET responses, keyed by url, so that they can be
+    revalidated with a conditional request instead of downloaded again.
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[StoredResponse]:
+        pass
+
+    @abstractmethod
+    def put(self, stored: StoredResponse):
+        pass
+
+    @abstractmethod
+    def invalidate(self, url: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class MemoryRevalidationStore(RevalidationStore):
+    def __init__(self, max_entries: int = 10000):
+        super().__init__()
+        self.max_entries = max_entries
+        self.__entries: 'OrderedDict[str, StoredResponse]' = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[StoredResponse]:
+        with self.__lock:
+            stored = self.__entries.get(url)
+            if stored:
+                self.__entries.move_to_end(url)
+            return stored
+
+    def put(self, stored: StoredResponse):
+        with self.__lock:
+            self.__entries[stored.url] = stored
+            self.__entries.move_to_end(stored.url)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, url: str):
+        with self.__lock:
+            if self.__entries.pop(url, None):
+                self.stats.invalidations += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+class DiskRevalidationStore(RevalidationStore):
+    """
+    Stores one json file per url so that the responses survive between runs, e.g. when re-archiving a project.
+    Files older than max_age seconds are not used, and the oldest ones are removed when there are more than
+    max_entries.
+    """
+
+    def __init__(self, directory: str, max_entries: int = None, max_age: float = None):
+        super().__init__()
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.__lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.__count = len(self)
+
+    def get(self, url: str) -> Optional[StoredResponse]:
+        path = self.__path(url)
+        try:
+            if self.__is_expired(os.path.getmtime(path)):
+                self.__remove(path)
+                self.stats.evictions += 1
+                return None
+            with open(path, encoding=config.ENCODING) as stored_file:
+                stored = json.load(stored_file)
+        except (OSError, ValueError):
+            return None
+        # guards against hash collisions
+        return StoredResponse.from_dict(stored) if stored.get('url') == url else None
+
+    def put(self, stored: StoredResponse):
+        path = self.__path(stored.url)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding=config.ENCODING) as stored_file:
+            json.dump(stored.to_dict(), stored_file)
+        is_new = not os.path.exists(path)
+        os.replace(temp_path, path)
+        with self.__lock:
+            if is_new:
+                self.__count += 1
+            if self.max_entries and self.__count > self.max_entries:
+                self.__evict()
+
+    def invalidate(self, url: str):
+        if self.__remove(self.__path(url)):
+            self.stats.invalidations += 1
+
+    def clear(self):
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.json'):
+                self.__remove(os.path.join(self.directory, file_name))
+
+    def __len__(self):
+        return len([file_name for file_name in os.listdir(self.directory) if file_name.endswith('.json')])
+
+    def __evict(self):
+        # removes a tenth more than needed, so that listing the directory isn't done on every put once it is full
+        keep = self.max_entries - self.max_entries // 10
+        files = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.json'):
+                path = os.path.join(self.directory, file_name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        files.sort()
+        for _, path in files[:max(len(files) - keep, 0)]:
+            if os.path.exists(path):
+                os.remove(path)
+                self.stats.evictions += 1
+        self.__count = min(len(files), keep)
+
+    def __is_expired(self, modified: float) -> bool:
+        return bool(self.max_age) and time.time() - modified > self.max_age
+
+    def __remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        with self.__lock:
+            self.__count = max(self.__count - 1, 0)
+        return True
+
+    def __path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode(config.ENCODING)).hexdigest() + '.json')
+
+
+class RevalidatingHTTPAdapter(TimeoutHTTPAdapter):
+    """
+    Sends GETs for urls in the store as conditional requests (If-None-Match/If-Modified-Since). A 304 is turned into
+    a 200 carrying the stored body, so callers can't tell the difference except for response.revalidated.
+    """
+
+    def __init__(self, store: RevalidationStore, **kwargs):
+        self.store = store
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs):
+        if request.method != 'GET':
+            response = super().send(request, **kwargs)
+            if response.ok:
+                self.store.invalidate(request.url)
+            return response
+
+        stored = self.store.get(request.url)
+        if stored:
+            if stored.etag:
+                request.headers['If-None-Match'] = stored.etag
+            if stored.last_modified:
+                request.headers['If-Modified-Since'] = stored.last_modified
+
+        response = super().send(request, **kwargs)
+        response.revalidated = False
+        if stored and response.status_code == requests.codes.not_modified:
+            self.store.stats.hits += 1
+            return self.__from_stored(response, stored)
+
+        self.store.stats.misses += 1
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == requests.codes.ok and (etag or last_modified) and not kwargs.get('stream'):
+            self.store.put(StoredResponse(request.url, etag, last_modified, response.headers.get('Content-Type'),
+                                          response.content))
+        return response
+
+    @staticmethod
+    def __from_stored(response: requests.Response, stored: StoredResponse) -> requests.Response:
+        # the (empty) 304 body is read first, so that the connection goes back to the pool
+        response.raw.read()
+        response.raw.release_conn()
+        response.status_code = requests.codes.ok
+        response.reason = 'OK'
+        response._content = stored.body
+        response._content_consumed = True
+        if stored.content_type:
+            response.headers['Content-Type'] = stored.content_type
+        response.headers.pop('Content-Length', None)
+        response.revalidated = True
+        return response
+
+
+def create_revalidation_store() -> Optional[RevalidationStore]:
+    if not config.REVALIDATION_CACHE_ENABLED:
+        return None
+    if config.REVALIDATION_CACHE_DIR:
+        return DiskRevalidationStore(config.REVALIDATION_CACHE_DIR, max_entries=config.REVALIDATION_CACHE_MAX_ENTRIES,
+                                     max_age=config.REVALIDATION_CACHE_MAX_AGE)
+    return MemoryRevalidationStore(config.REVALIDATION_CACHE_MAX_ENTRIES)
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def shared_revalidation_store() -> Optional[RevalidationStore]:
+    """Process-wide store, so that the sessions of all the IngestAPIs stay within REVALIDATION_CACHE_MAX_ENTRIES"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = create_revalidation_store()
+        return _shared_store
+
+
+def enable_revalidation(session: requests.Session, store: RevalidationStore = None) -> Optional[RevalidationStore]:
+    """
+    Replaces the adapters of a session with RevalidatingHTTPAdapters keeping their retries, timeout and pool size.
+    Works for sessions created elsewhere too, e.g. the one of ingest.api.ingestapi.IngestApi. Without a store, the
+    sessions share the one of the process.
+    """
+    store = store if store is not None else shared_revalidation_store()
+    if store is None:
+        return None
+    for prefix, current in list(session.adapters.items()):
+        adapter = RevalidatingHTTPAdapter(store, timeout=getattr(current, 'timeout', None),
+                                          max_retries=current.max_retries,
+                                          pool_connections=getattr(current, '_pool_connections',
+                                                                   adapters.DEFAULT_POOLSIZE),
+                                          pool_maxsize=getattr(current, '_pool_maxsize', adapters.DEFAULT_POOLSIZE))
+        session.mount(prefix, adapter)
+    return store
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+from requests import RequestException
+
+import config
+
+
+class SchemaRegistry:
+    """
+    Process-wide map of schema urls (content.describedBy) to concrete entity type names, so that each schema is
+    downloaded at most once per process. It can be preloaded from a directory of schema json files and falls back to
+    the last segment of the schema url when the schema can't be fetched. That name is not kept, so the schema is
+    asked for again the next time.
+    """
+
+    def __init__(self, schema_dir: str = None):
+        self.logger = logging.getLogger(__name__)
+        self.__names = {}
+        self.__lock = threading.Lock()
+        if schema_dir:
+            self.load_dir(schema_dir)
+
+    def get_schema_name(self, schema_url: str, fetch_schema: Callable[[str], dict] = None) -> str:
+        name = self.__names.get(schema_url)
+        if name:
+            return name
+
+        if fetch_schema:
+            try:
+                name = fetch_schema(schema_url).get('name')
+            except RequestException as e:
+                self.logger.warning(f'Could not retrieve schema {schema_url}, using url to resolve type: {str(e)}')
+                return self.name_from_url(schema_url)
+        if not name:
+            name = self.name_from_url(schema_url)
+
+        self.register(schema_url, name)
+        return name
+
+    def register(self, schema_url: str, name: str):
+        with self.__lock:
+            self.__names[schema_url] = name
+
+    def register_schema(self, schema: dict):
+        schema_url = schema.get('$id') or schema.get('id')
+        name = schema.get('name') or self.name_from_url(schema_url)
+        if schema_url and name:
+            self.register(schema_url, name)
+
+    def load_dir(self, schema_dir: str):
+        for root, _, file_names in os.walk(schema_dir):
+            for file_name in file_names:
+                if not file_name.endswith('.json'):
+                    continue
+                with open(os.path.join(root, file_name), encoding=config.ENCODING) as schema_file:
+                    self.register_schema(json.load(schema_file))
+        self.logger.info(f'Loaded {len(self)} schemas from {schema_dir}')
+
+    def clear(self):
+        with self.__lock:
+            self.__names.clear()
+
+    def __contains__(self, schema_url):
+        return schema_url in self.__names
+
+    def __len__(self):
+        return len(self.__names)
+
+    @staticmethod
+    def name_from_url(schema_url: Optional[str]) -> Optional[str]:
+        if schema_url:
+            return schema_url.rstrip('/').rsplit('/', 1)[-1]
+
+
+_registry = SchemaRegistry(config.SCHEMA_DIR)
@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests import adapters
+from urllib3.util import retry
+
+import config
+
+
+def create_retry_policy() -> retry.Retry:
+    return retry.Retry(
+        total=100,  # seems that this has a default value of 10,
+        # setting this to a very high number so that it'll respect the status retry count
+        status=17,  # status is the no. of retries if response is in status_forcelist,
+        # this count will retry for ~20mins with back off timeout within
+        read=10,
+        status_forcelist=[500, 502, 503, 504],
+        backoff_factor=0.6)
+
+
+def create_shared_retry_policy() -> retry.Retry:
+    return retry.Retry(total=config.HTTP_SHARED_CONNECT_RETRIES,
+                       connect=config.HTTP_SHARED_CONNECT_RETRIES,
+                       # False raises the read error itself, as requests does when it doesn't retry
+                       read=False,
+                       status=0,
+                       status_forcelist=[],
+                       backoff_factor=0.6)
+
+
+class TimeoutHTTPAdapter(adapters.HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to requests sent without one."""
+
+    def __init__(self, timeout: Tuple[float, float] = None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(retry_policy: retry.Retry = None,
+                   pool_maxsize: int = None,
+                   pool_maxsize_by_host: Dict[str, int] = None,
+                   timeout: Tuple[float, float] = None) -> requests.Session:
+    """
+    Creates a keep-alive session whose adapters retry, time out and pool connections the same way for http:// and
+    https:// urls. Hosts listed in pool_maxsize_by_host get their own connection pool of that size.
+    """
+    retry_policy = retry_policy if retry_policy else create_retry_policy()
+    pool_maxsize = pool_maxsize if pool_maxsize else config.HTTP_POOL_MAXSIZE
+    pool_maxsize_by_host = pool_maxsize_by_host if pool_maxsize_by_host is not None else config.HTTP_POOL_MAXSIZE_BY_HOST
+    timeout = timeout if timeout else (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+
+    session = requests.Session()
+    adapter = TimeoutHTTPAdapter(timeout=timeout, max_retries=retry_policy,
+                                 pool_connections=config.HTTP_POOL_CONNECTIONS, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    for host, host_pool_maxsize in pool_maxsize_by_host.items():
+        host = urlparse(host).netloc if '//' in host else host
+        host_adapter = TimeoutHTTPAdapter(timeout=timeout, max_retries=retry_policy,
+                                          pool_connections=1, pool_maxsize=host_pool_maxsize)
+        session.mount(f'https://{host}', host_adapter)
+        session.mount(f'http://{host}', host_adapter)
+    return session
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def shared_session() -> requests.Session:
+    """
+    Process-wide session for the clients that don't keep state in their session e.g. the ontology and ENA calls.
+    These calls were not retried before, so only failed connections are retried, HTTP_SHARED_CONNECT_RETRIES times.
+    Read errors are raised and 5xx responses given back as they were with a bare requests call.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session(retry_policy=create_shared_retry_policy())
+        return _shared_session
+
@@ -1,5 +1,5 @@
 import logging
-from typing import List
+from typing import Dict, Iterable, List, Tuple
 
 from requests import HTTPError
 
@@ -82,20 +82,25 @@ class Accessioner:
     def accession_entities(self, entity_map: ArchiveEntityMap):
         accessions = self.get_accessions_from_map(entity_map)
 
-        self.ingest_api.entity_cache = {}
+        self.ingest_api.entity_cache.clear()
+        ingest_urls = [accession.ingest_url for accession in accessions]
+        ingest_entities = dict(zip(ingest_urls, self.ingest_api.get_entities(ingest_urls)))
         for accession in accessions:
             entity_type, entity_id = self.ingest_api.entity_info_from_url(accession.ingest_url)
-            ingest_entity = self.ingest_api.get_entity_by_id(entity_type, entity_id)
-            entity_patch = Accessioner.generate_patch(accession, ingest_entity)
+            entity_patch = Accessioner.generate_patch(accession, ingest_entities[accession.ingest_url])
             try:
-                self.ingest_api.patch_entity_by_id(entity_type, entity_id, entity_patch)
+                # an entity can get more than one accession e.g. project and study, so later patches build on this one
+                ingest_entities[accession.ingest_url] = \
+                    self.ingest_api.patch_entity_by_id(entity_type, entity_id, entity_patch)
             except HTTPError:
                 logging.error("Failed to send to ingest", HTTPError)
 
     def get_accessions_from_map(self, entity_map: ArchiveEntityMap) -> List[IngestAccession]:
+        # gone through twice instead of listed, so that the entities the map keeps on disk stay there
+        entity_urls = self.get_ingest_entity_urls(entity_map.get_entities())
         accessions: List[IngestAccession] = []
         for entity in entity_map.get_entities():
-            accessions.extend(self.get_accessions_from_entity(entity))
+            accessions.extend(self.get_accessions_from_entity(entity, entity_urls))
 
         return accessions
 
@@ -104,7 +109,24 @@ class Accessioner:
         entity = self.ingest_api.get_entity_by_uuid(plural_type, metadata_uuid)
         return entity['_links']['self']['href']
 
-    def get_accessions_from_entity(self, entity: ArchiveEntity) -> List[IngestAccession]:
+    def get_ingest_entity_urls(self, entities: Iterable[ArchiveEntity]) -> Dict[Tuple[str, str], str]:
+        """Resolves the ingest urls of the metadata accessioned by all the entities in one bulk lookup"""
+        metadata_uuids = []
+        for entity in entities:
+            if entity.accession:
+                ingest_entity_type = self.ARCHIVE_TO_INGEST_ENTITY_TYPE_MAP[entity.archive_entity_type]
+                for ingest_entity_uuid in entity.accessioned_metadata_uuids or []:
+                    metadata_uuids.append((ingest_entity_type, ingest_entity_uuid))
+        metadata_uuids = list(dict.fromkeys(metadata_uuids))
+        ingest_entities = self.ingest_api.get_entities_by_uuid(
+            [(self.PLURAL_INGEST_TYPE_MAP[metadata_type], uuid) for metadata_type, uuid in metadata_uuids])
+        return {
+            metadata_uuid: ingest_entity['_links']['self']['href']
+            for metadata_uuid, ingest_entity in zip(metadata_uuids, ingest_entities)
+        }
+
+    def get_accessions_from_entity(self, entity: ArchiveEntity,
+                                   entity_urls: Dict[Tuple[str, str], str] = None) -> List[IngestAccession]:
         accessions: List[IngestAccession] = []
 
         if entity.accession:
@@ -112,7 +134,9 @@ class Accessioner:
             accession_type = self.ARCHIVE_ACCESSION_TYPE_MAP[entity.archive_entity_type]
             accessioned_metadata_uuids = entity.accessioned_metadata_uuids or []
             for ingest_entity_uuid in accessioned_metadata_uuids:
-                entity_url = self.get_ingest_entity_url(ingest_entity_type, ingest_entity_uuid)
+                entity_url = entity_urls.get((ingest_entity_type, ingest_entity_uuid)) if entity_urls else None
+                if not entity_url:
+                    entity_url = self.get_ingest_entity_url(ingest_entity_type, ingest_entity_uuid)
                 accession = IngestAccession(ingest_entity_type, entity_url, entity.accession, accession_type)
                 accessions.append(accession)
 
@@ -1,19 +1,31 @@
 import json
 import logging
-from typing import Iterator, Tuple, List
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterator, Tuple, List, Optional, Set
 
+import config
 from api import ontology
 from api.dsp import DataSubmissionPortal
 from api.ingest import IngestAPI
 from archiver.accessioner import Accessioner
+from archiver.checkpoint import ConversionCheckpoint
 from archiver.converter import ConversionError, SampleConverter, ProjectConverter, \
     SequencingExperimentConverter, SequencingRunConverter, StudyConverter
 from archiver.ingest_tracker import IngestTracker
 from archiver.submission import ArchiveEntityMap, ArchiveEntity, ArchiveSubmission
 from utils import protocols
+from utils.cache import EntityCache, LruEntityCache
 from utils.graph import Graph
 
 
+ARCHIVE_ENTITY_TYPES = ["project", "study", "sample", "sequencingExperiment", "sequencingRun"]
+# notify_file_archiver builds the file upload plan from the ingest data of the runs
+RAW_DATA_NEEDED_AFTER_CONVERSION = ["sequencingRun"]
+
+
 def _print_same_line(string):
     print(f'\r{string}', end='')
 
@@ -22,6 +34,62 @@ class ArchiverException(Exception):
     """Base-class for all exceptions raised by this module."""
 
 
+class ManifestConversionError(ArchiverException):
+    """
+    Raised by a concurrent IngestArchiver.convert when some manifests failed. The errors are keyed by manifest id and
+    the entity map holds the entities of the manifests that didn't fail.
+    """
+
+    def __init__(self, errors: Dict[str, Exception], entity_map: 'ArchiveEntityMap'):
+        super().__init__(f'Failed to convert {len(errors)} manifest(s): {", ".join(errors)}')
+        self.errors = errors
+        self.entity_map = entity_map
+
+
+class ConversionProgress:
+    """An event passed to the progress callback of IngestArchiver while converting manifests"""
+    MANIFEST_STARTED = 'manifest_started'
+    MANIFEST_FAILED = 'manifest_failed'
+    MANIFEST_RESUMED = 'manifest_resumed'
+    ENTITIES_FOUND = 'entities_found'
+    ENTITY_CONVERTED = 'entity_converted'
+
+    def __init__(self, stage: str, manifest_id: str, archive_entity_type: str = None, count: int = None,
+                 total: int = None, error: Exception = None):
+        self.stage = stage
+        self.manifest_id = manifest_id
+        self.archive_entity_type = archive_entity_type
+        self.count = count
+        self.total = total
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+    def __repr__(self):
+        return f'ConversionProgress({self.to_dict()})'
+
+
+def log_progress(progress: ConversionProgress):
+    logging.getLogger(__name__).debug(progress.to_dict())
+
+
+def print_progress(progress: ConversionProgress):
+    """Prints the progress like the archiver used to, for the command line"""
+    if progress.stage == ConversionProgress.MANIFEST_STARTED:
+        print(f'\n* PROCESSING MANIFEST {progress.count}/{progress.total}: {progress.manifest_id}')
+    elif progress.stage == ConversionProgress.MANIFEST_RESUMED:
+        print(f'Resumed {progress.total} entities of manifest {progress.manifest_id} from the checkpoint')
+    elif progress.stage == ConversionProgress.MANIFEST_FAILED:
+        print(f'\n* FAILED MANIFEST {progress.manifest_id}: {progress.error}')
+    elif progress.stage == ConversionProgress.ENTITIES_FOUND:
+        print(f'Found {progress.total} {progress.archive_entity_type} entities in manifest {progress.manifest_id}')
+    elif progress.stage == ConversionProgress.ENTITY_CONVERTED:
+        _print_same_line(f'{progress.count}/{progress.total}')
+        if progress.count == progress.total:
+            print('')
+
+
 class Biomaterial:
     def __init__(self, data, derived_by_process=None, derived_with_protocols=None,
                  derived_from_biomaterials: List[dict] = None):
@@ -33,41 +101,130 @@ class Biomaterial:
     @classmethod
     def from_uuid(cls, ingest_api, biomaterial_uuid):
         data = ingest_api.get_biomaterial_by_uuid(biomaterial_uuid)
+        return cls.from_entity(ingest_api, data)
+
+    @classmethod
+    def from_entity(cls, ingest_api, data):
+        return BiomaterialGraph(ingest_api).get_biomaterials([data])[0]
 
-        derived_by_processes_count = ingest_api.get_related_entity_count(data, 'derivedByProcesses', 'processes')
 
-        if derived_by_processes_count:
-            derived_by_processes_iter = ingest_api.get_related_entity(data, 'derivedByProcesses', 'processes')
-            derived_by_processes = list(derived_by_processes_iter)
+def create_context_cache() -> EntityCache:
+    return LruEntityCache(max_entries=config.CONVERSION_CONTEXT_MAX_ENTRIES)
+
+
+class BiomaterialGraph:
+    """
+    Resolves the processes, protocols and input biomaterials of many biomaterials together. The related entities are
+    listed once per link, without counting them first, so processes shared by several biomaterials, e.g. the
+    collection of all the specimens of a donor, and their protocols are fetched once. The lists can be shared between
+    graphs through related_entities, e.g. by all the manifests of a ConversionContext.
+    """
+
+    def __init__(self, ingest_api, related_entities: EntityCache = None, max_workers: int = None):
+        self.ingest_api = ingest_api
+        self.related_entities = related_entities if related_entities is not None else create_context_cache()
+        self.max_workers = max_workers if max_workers else config.BULK_LOOKUP_WORKERS
+        self.protocol_types: Dict[str, str] = {}
+
+    def get_biomaterials(self, biomaterials_data: List[dict]) -> List[Biomaterial]:
+        processes_by_biomaterial = self.get_related_entities(biomaterials_data, 'derivedByProcesses', 'processes')
+        processes = list(self.__unique(process for processes in processes_by_biomaterial for process in processes))
+        protocols_by_process = dict(zip(map(self.__key, processes),
+                                        self.get_related_entities(processes, 'protocols', 'protocols')))
+        inputs_by_process = dict(zip(map(self.__key, processes),
+                                     self.get_related_entities(processes, 'inputBiomaterials', 'biomaterials')))
+
+        biomaterials = []
+        for data, derived_by_processes in zip(biomaterials_data, processes_by_biomaterial):
+            if not derived_by_processes:
+                biomaterials.append(Biomaterial(data))
+                continue
 
             derived_with_protocols = {}
             derived_from_biomaterials = []
             for derived_by_process in derived_by_processes:
-                protocols = ingest_api.get_related_entity(derived_by_process, 'protocols', 'protocols')
-
-                for protocol in protocols:
-                    protocol_type = ingest_api.get_concrete_entity_type(protocol)
+                for protocol in protocols_by_process[self.__key(derived_by_process)]:
+                    protocol_type = self.get_protocol_type(protocol)
                     if not derived_with_protocols.get(protocol_type):
                         derived_with_protocols[protocol_type] = []
                     derived_with_protocols[protocol_type].append(protocol)
 
-                input_biomaterials_count = ingest_api.get_related_entity_count(derived_by_process, 'inputBiomaterials',
-                                                                           'biomaterials')
-                if not input_biomaterials_count:
+                input_biomaterials = inputs_by_process[self.__key(derived_by_process)]
+                if not input_biomaterials:
                     raise ArchiverException('A biomaterial has been derived by a process with no input biomaterial')
+                derived_from_biomaterials.extend(input_biomaterials)
+
+            biomaterials.append(Biomaterial(data, derived_by_process, derived_with_protocols,
+                                            derived_from_biomaterials))
+        return biomaterials
+
+    def get_related_entities(self, entities: List[dict], relation: str, entity_type: str) -> List[List[dict]]:
+        """Lists the related entities of each entity, in order, fetching each link once and concurrently"""
+        links = [self.__link(entity, relation) for entity in entities]
+        # looked up once, as related_entities may drop them in the meantime
+        related_by_link = {link: self.related_entities.get(link) for link in links if link}
+        missing = {link: entity for link, entity in zip(links, entities)
+                   if link and related_by_link[link] is None}
+
+        def fetch(entity):
+            return list(self.ingest_api.get_related_entity(entity, relation, entity_type))
+
+        if len(missing) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                fetched = dict(zip(missing, executor.map(fetch, missing.values())))
+        else:
+            fetched = {link: fetch(entity) for link, entity in missing.items()}
+        for link, related in fetched.items():
+            self.related_entities.put(link, related)
+        related_by_link.update(fetched)
+        return [related_by_link[link] if link else [] for link in links]
+
+    def get_protocol_type(self, protocol: dict) -> str:
+        key = self.__key(protocol)
+        if key not in self.protocol_types:
+            self.protocol_types[key] = self.ingest_api.get_concrete_entity_type(protocol)
+        return self.protocol_types[key]
+
+    def __unique(self, entities: Iterator[dict]) -> Iterator[dict]:
+        return iter({self.__key(entity): entity for entity in entities}.values())
+
+    @staticmethod
+    def __link(entity: dict, relation: str) -> Optional[str]:
+        link = entity.get('_links', {}).get(relation)
+        return link['href'].rsplit('{')[0] if link else None
 
-                input_biomaterials = ingest_api.get_related_entity(derived_by_process, 'inputBiomaterials', 'biomaterials')
+    @classmethod
+    def __key(cls, entity: dict) -> str:
+        return cls.__link(entity, 'self') or json.dumps(entity, sort_keys=True)
 
-                derived_from_biomaterials.extend(list(input_biomaterials))
 
-            return cls(data, derived_by_process, derived_with_protocols, derived_from_biomaterials)
-        else:
-            return cls(data)
+class ConversionContext:
+    """
+    State shared by all the manifests converted together, so that the documents and archive entities they have in
+    common, e.g. the project, the study and the donors, are fetched and converted once per submission instead of
+    once per manifest. The documents are kept in caches of CONVERSION_CONTEXT_MAX_ENTRIES, the least recently used
+    are dropped and fetched again if a later manifest needs them.
+    """
+
+    def __init__(self):
+        # biomaterials by uuid
+        self.biomaterials: EntityCache = create_context_cache()
+        # related entities by link, see BiomaterialGraph
+        self.related_entities: EntityCache = create_context_cache()
+        # only the keys, the entities themselves are in the ArchiveEntityMap which may keep them on disk
+        self.entities: Set[Tuple[str, str]] = set()
+
+    def is_converted(self, archive_entity: ArchiveEntity) -> bool:
+        return (archive_entity.archive_entity_type, archive_entity.id) in self.entities
+
+    def add_converted(self, archive_entity: ArchiveEntity):
+        self.entities.add((archive_entity.archive_entity_type, archive_entity.id))
 
 
 class Manifest:
-    def __init__(self, ingest_api: IngestAPI, manifest_id: str):
+    def __init__(self, ingest_api: IngestAPI, manifest_id: str, context: ConversionContext = None):
         self.ingest_api = ingest_api
+        self.context = context
 
         self.manifest_id = manifest_id
         self.manifest = self.ingest_api.get_manifest_by_id(self.manifest_id)
@@ -125,20 +282,33 @@ class Manifest:
         return self.input_biomaterial
 
     def _init_biomaterials(self) -> Iterator['Biomaterial']:
-        for biomaterial_uuid in list(self.manifest['fileBiomaterialMap']):
-            yield Biomaterial.from_uuid(self.ingest_api, biomaterial_uuid)
+        shared = self.context.biomaterials if self.context else None
+        uuids = list(self.manifest['fileBiomaterialMap'])
+        known = {uuid: shared.get(uuid) if shared is not None else None for uuid in uuids}
+        missing_uuids = [('biomaterials', uuid) for uuid in uuids if known[uuid] is None]
+        if missing_uuids:
+            graph = BiomaterialGraph(self.ingest_api, self.context.related_entities if self.context else None)
+            fetched = graph.get_biomaterials(self.ingest_api.get_entities_by_uuid(missing_uuids))
+            loaded = dict(zip([uuid for _, uuid in missing_uuids], fetched))
+        else:
+            loaded = {}
+        for uuid in uuids:
+            biomaterial = known[uuid]
+            if biomaterial is None:
+                biomaterial = loaded[uuid]
+                if shared is not None:
+                    shared.put(uuid, biomaterial)
+            yield biomaterial
 
     def _init_assay_process(self):
         file_uuid = list(self.manifest['fileFilesMap'])[0]
         file = self.ingest_api.get_file_by_uuid(file_uuid)
 
-        derived_by_processes_count = self.ingest_api.get_related_entity_count(file, 'derivedByProcesses', 'processes')
-        if derived_by_processes_count:
-            if derived_by_processes_count > 1:
-                raise ArchiverException(f'Manifest {self.manifest_id} has many assay processes.')
-            derived_by_processes = self.ingest_api.get_related_entity(file, 'derivedByProcesses', 'processes')
-            return next(derived_by_processes)
-        return None
+        derived_by_processes = self.ingest_api.get_related_entity(file, 'derivedByProcesses', 'processes')
+        derived_by_processes = list(islice(derived_by_processes, 2))
+        if len(derived_by_processes) > 1:
+            raise ArchiverException(f'Manifest {self.manifest_id} has many assay processes.')
+        return derived_by_processes[0] if derived_by_processes else None
 
     def _init_protocols(self):
         assay = self.get_assay_process()
@@ -165,24 +335,30 @@ class Manifest:
     def _init_input_biomaterial(self):
         assay = self.get_assay_process()
 
-        input_biomaterials_count = self.ingest_api.get_related_entity_count(assay, 'inputBiomaterials', 'biomaterials')
-
-        if not input_biomaterials_count:
-            raise ArchiverException('No input biomaterial found to the assay process.')
-
         input_biomaterials = self.ingest_api.get_related_entity(assay, 'inputBiomaterials', 'biomaterials')
         # TODO get first for now, clarify if it's possible to have multiple and how to specify the links
+        input_biomaterial = next(iter(input_biomaterials), None)
 
-        return next(input_biomaterials)
+        if not input_biomaterial:
+            raise ArchiverException('No input biomaterial found to the assay process.')
+
+        return input_biomaterial
 
 
 class IngestArchiver:
     def __init__(self, ingest_api: IngestAPI,
                  dsp_api: DataSubmissionPortal,
                  ontology_api=ontology.__api__,
-                 exclude_types=None, alias_prefix=None, dsp_validation=True):
+                 exclude_types=None, alias_prefix=None, dsp_validation=True, max_workers: int = None,
+                 progress: Callable[[ConversionProgress], None] = log_progress, keep_raw_data: bool = None,
+                 checkpoint: ConversionCheckpoint = None):
 
         self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers if max_workers else config.CONVERT_WORKERS
+        self.progress = progress
+        self.keep_raw_data = config.KEEP_RAW_DATA if keep_raw_data is None else keep_raw_data
+        self.checkpoint = checkpoint
+        self.__progress_lock = threading.Lock()
         self.ingest_api = ingest_api
         self.exclude_types = exclude_types if exclude_types else []
         self.alias_prefix = f"{alias_prefix}_" if alias_prefix else ""
@@ -202,6 +378,9 @@ class IngestArchiver:
 
         self.converter['sample'].ingest_api = self.ingest_api
 
+        # DSP current versions by (archive entity type, alias), shared by all the manifests converted
+        self.current_versions = {}
+
     def archive(self, entity_map: ArchiveEntityMap):
         archive_submission, _ = self.archive_metadata(entity_map)
         self.notify_file_archiver(archive_submission)
@@ -212,10 +391,7 @@ class IngestArchiver:
         archive_submission = ArchiveSubmission(dsp_api=self.dsp_api)
         archive_submission.entity_map = entity_map
 
-        converted_entities = entity_map.get_converted_entities()
-
-        if converted_entities:
-            archive_submission.converted_entities = converted_entities
+        if entity_map.get_conversion_summary():
             archive_submission.submission = self.dsp_api.create_submission()
             dsp_submission_url = archive_submission.get_url()
             archive_submission.dsp_url = dsp_submission_url
@@ -226,10 +402,14 @@ class IngestArchiver:
             ingest_tracker = self.ingest_tracker
             ingest_tracker.create_archive_submission(archive_submission)
 
-            for entity in converted_entities:
-                archive_submission.add_entity(entity)
+            def on_created(entity: ArchiveEntity):
+                # put back, so that the DSP links are kept if the map moved the entity out of memory meanwhile
+                entity_map.add_entity(entity)
                 ingest_tracker.add_entity(entity)
 
+            archive_submission.add_entities(entity_map.get_converted_entities(),
+                                            aliases=entity_map.get_converted_aliases(), on_created=on_created)
+
         else:
             archive_submission.is_completed = True
             archive_submission.add_error('ingest_archiver.archive_metadata.no_entities',
@@ -245,7 +425,6 @@ class IngestArchiver:
 
         if entity_map:
             archive_submission.entity_map = entity_map
-            archive_submission.converted_entities = list(archive_submission.entity_map.get_converted_entities())
 
         if archive_submission.status == 'Draft':
             archive_submission.validate_and_submit()
@@ -259,82 +438,225 @@ class IngestArchiver:
 
         return archive_submission
 
-    def get_manifest(self, manifest_id):
-        return Manifest(ingest_api=self.ingest_api, manifest_id=manifest_id)
+    def get_manifest(self, manifest_id, context: ConversionContext = None):
+        return Manifest(ingest_api=self.ingest_api, manifest_id=manifest_id, context=context)
+
+    def convert(self, manifests, max_workers: int = None) -> ArchiveEntityMap:
+        """
+        Converts the manifests one by one or, with more than one worker, fetches and converts them concurrently.
+        Either way the entities end up in the map in manifest order so the result doesn't depend on timing.
+        """
+        max_workers = max_workers if max_workers else self.max_workers
+        self.current_versions = {}
+        context = ConversionContext()
+        manifest_ids = [manifest_url.rsplit('/', 1)[-1] for manifest_url in manifests]
+        if max_workers > 1:
+            return self._convert_concurrently(manifest_ids, context, max_workers)
 
-    def convert(self, manifests) -> ArchiveEntityMap:
         entity_map = ArchiveEntityMap()
-        idx = 0
-        for manifest_url in manifests:
-            idx = idx + 1
-            manifest_id = manifest_url.rsplit('/', 1)[-1]
-            print(f'\n* PROCESSING MANIFEST {idx}/{len(manifests)}: {manifest_id}')
-            manifest = self.get_manifest(manifest_id)
-            entities = self._convert(manifest)
+        for idx, manifest_id in enumerate(manifest_ids, start=1):
+            self._report(ConversionProgress.MANIFEST_STARTED, manifest_id, count=idx, total=len(manifest_ids))
+            manifest = self.get_manifest(manifest_id, context)
+            entities = self._load_checkpoint(manifest)
+            if entities is not None:
+                entities = self._resume(manifest_id, entities, context)
+            else:
+                entities = self._convert(manifest, context)
+                self._save_checkpoint(manifest_id, entities, self._checkpoint_parameters(manifest))
             entity_map.add_entities(entities)
         return entity_map
 
-    def _convert(self, manifest: Manifest):
-        aggregator = ArchiveEntityAggregator(manifest, self.ingest_api, alias_prefix=self.alias_prefix)
+    def _checkpoint_parameters(self, manifest: Manifest) -> dict:
+        """what the entities converted from the manifest depend on besides its id"""
+        return {
+            'alias_prefix': self.alias_prefix,
+            'exclude_types': sorted(self.exclude_types),
+            'dsp_validation': self.dsp_validation,
+            'manifest_update_date': manifest.manifest.get('updateDate')
+        }
 
-        entities = []
-        for archive_entity_type in ["project", "study", "sample", "sequencingExperiment", "sequencingRun"]:
-            print(f"Finding {archive_entity_type} entities in manifest...")
-            progress_ctr = 0
+    def _load_checkpoint(self, manifest: Manifest) -> Optional[List[ArchiveEntity]]:
+        """the entities of a manifest converted by a previous run, None if it has to be converted"""
+        if not self.checkpoint or not self.checkpoint.is_done(manifest.manifest_id):
+            return None
+        return self.checkpoint.load(manifest.manifest_id, self._checkpoint_parameters(manifest))
+
+    def _resume(self, manifest_id: str, entities: List[ArchiveEntity],
+                context: ConversionContext) -> List[ArchiveEntity]:
+        entities = [entity for entity in entities if not context.is_converted(entity)]
+        for entity in entities:
+            context.add_converted(entity)
+        self._report(ConversionProgress.MANIFEST_RESUMED, manifest_id, count=len(entities), total=len(entities))
+        return entities
 
-            if self.exclude_types and archive_entity_type in self.exclude_types:
-                print(f"Skipping {archive_entity_type} entities in manifest...")
-                continue
+    def _save_checkpoint(self, manifest_id: str, entities: List[ArchiveEntity], parameters: dict):
+        if self.checkpoint:
+            self.checkpoint.save(manifest_id, entities, parameters)
 
-            for archive_entity in aggregator.get_archive_entities(archive_entity_type):
-                progress_ctr = progress_ctr + 1
-                _print_same_line(str(progress_ctr))
-
-                converter = self.converter[archive_entity_type]
-
-                if self.dsp_validation:
-                    current_version = self.dsp_api.get_current_version(archive_entity.archive_entity_type,
-                                                                       archive_entity.id)
-                    if current_version and current_version.get('accession'):
-                        archive_entity.accession = current_version.get('accession')
-                        msg = f'This alias has already been submitted to DSP, accession: {archive_entity.accession}.'
-                        archive_entity.add_error('ingest_archiver.convert.entity_already_in_dsp_and_has_accession', msg,
-                                                 {
-                                                     "current_version": current_version["_links"]["self"]["href"]
-                                                 })
-                    elif current_version and not current_version.get('accession'):
-                        msg = f'This alias has already been submitted to DSP, but still has no accession.'
-                        archive_entity.add_error('ingest_archiver.convert.entity_already_in_dsp', msg, {
-                            "current_version": current_version["_links"]["self"]["href"]
-                        })
-                    elif Accessioner.is_metadata_accessioned(archive_entity):
-                        msg = f'Metadata already have an accession'
-                        archive_entity.add_error('ingest_archiver.convert.entity_has_accession', msg, {
-                            "current_version": current_version["_links"]["self"]["href"]
-                        })
-
-                if not archive_entity.errors:
-                    try:
-                        archive_entity.conversion = converter.convert(archive_entity.data)
-                        archive_entity.conversion['alias'] = archive_entity.id
-                        archive_entity.conversion.update(archive_entity.links)
-
-                    except ConversionError as e:
-                        msg = f'An error occured converting data to a {archive_entity_type}: {str(e)}.'
-                        archive_entity.add_error('ingest_archiver.convert.error', msg, {
-                            'data': json.dumps(archive_entity.data),
-                            'error': str(e)
-                        })
+    def _convert(self, manifest: Manifest, context: ConversionContext = None):
+        """
+        Converts the archive entities of the manifest, skipping the ones already converted in the given context
+        """
+        entities = []
+        for archive_entity_type, archive_entities in self._aggregate(manifest):
+            if context:
+                archive_entities = [entity for entity in archive_entities if not context.is_converted(entity)]
+            if self.dsp_validation:
+                self.prefetch_current_versions(archive_entities)
+
+            self._report(ConversionProgress.ENTITIES_FOUND, manifest.manifest_id, archive_entity_type,
+                         total=len(archive_entities))
+            for count, archive_entity in enumerate(archive_entities, start=1):
+                self._convert_entity(archive_entity)
+                if context:
+                    context.add_converted(archive_entity)
                 entities.append(archive_entity)
-            print("")
+                self._report(ConversionProgress.ENTITY_CONVERTED, manifest.manifest_id, archive_entity_type,
+                             count=count, total=len(archive_entities))
 
         return entities
 
+    def _convert_concurrently(self, manifest_ids: List[str], context: ConversionContext,
+                              max_workers: int) -> ArchiveEntityMap:
+        """
+        Fetches and aggregates up to max_workers manifests ahead of the one being converted and converts the entities
+        of each manifest concurrently, so that only the manifests in that window are held in memory. The manifests are
+        converted in order, so entities shared by several manifests belong to the first one, as when converting
+        sequentially.
+        """
+        entity_map = ArchiveEntityMap()
+        errors: Dict[str, Exception] = {}
+        indexed_manifest_ids = iter(enumerate(manifest_ids, start=1))
+        # (manifest id, future of _try_aggregate) of the manifests in the window, in order
+        aggregating = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def aggregate_next():
+                for idx, next_manifest_id in islice(indexed_manifest_ids, 1):
+                    aggregating.append((next_manifest_id, executor.submit(
+                        self._try_aggregate, next_manifest_id, idx, len(manifest_ids), context)))
+
+            for _ in range(max_workers):
+                aggregate_next()
+            while aggregating:
+                manifest_id, aggregated = aggregating.popleft()
+                entities_by_type, resumed, parameters, error = aggregated.result()
+                aggregate_next()
+                if error:
+                    errors[manifest_id] = error
+                elif resumed is not None:
+                    entity_map.add_entities(self._resume(manifest_id, resumed, context))
+                else:
+                    entities = self._convert_aggregated(manifest_id, entities_by_type, context, executor)
+                    self._save_checkpoint(manifest_id, entities, parameters)
+                    entity_map.add_entities(entities)
+
+        if errors:
+            raise ManifestConversionError(errors, entity_map)
+        return entity_map
+
+    def _convert_aggregated(self, manifest_id: str, entities_by_type: List[Tuple[str, List[ArchiveEntity]]],
+                            context: ConversionContext, executor: ThreadPoolExecutor) -> List[ArchiveEntity]:
+        entities = []
+        for archive_entity_type, archive_entities in entities_by_type:
+            archive_entities = [entity for entity in archive_entities if not context.is_converted(entity)]
+            for archive_entity in archive_entities:
+                context.add_converted(archive_entity)
+            entities.extend(archive_entities)
+
+        if self.dsp_validation:
+            self.prefetch_current_versions(entities)
+        for count, archive_entity in enumerate(executor.map(self._convert_entity, entities), start=1):
+            self._report(ConversionProgress.ENTITY_CONVERTED, manifest_id, archive_entity.archive_entity_type,
+                         count=count, total=len(entities))
+        return entities
+
+    def _try_aggregate(self, manifest_id: str, idx: int, total: int, context: ConversionContext):
+        """(entities by type, entities resumed from the checkpoint, checkpoint parameters, error) of the manifest"""
+        self._report(ConversionProgress.MANIFEST_STARTED, manifest_id, count=idx, total=total)
+        try:
+            manifest = self.get_manifest(manifest_id, context)
+            parameters = self._checkpoint_parameters(manifest)
+            resumed = self._load_checkpoint(manifest)
+            if resumed is not None:
+                return None, resumed, parameters, None
+            entities_by_type = self._aggregate(manifest)
+        except Exception as e:
+            self.logger.exception(f'Failed to aggregate the entities of manifest {manifest_id}')
+            self._report(ConversionProgress.MANIFEST_FAILED, manifest_id, error=e)
+            return None, None, None, e
+        for archive_entity_type, archive_entities in entities_by_type:
+            self._report(ConversionProgress.ENTITIES_FOUND, manifest_id, archive_entity_type,
+                         total=len(archive_entities))
+        return entities_by_type, None, parameters, None
+
+    def _aggregate(self, manifest: Manifest) -> List[Tuple[str, List[ArchiveEntity]]]:
+        aggregator = ArchiveEntityAggregator(manifest, self.ingest_api, alias_prefix=self.alias_prefix)
+        return [(archive_entity_type, list(aggregator.get_archive_entities(archive_entity_type)))
+                for archive_entity_type in ARCHIVE_ENTITY_TYPES
+                if archive_entity_type not in self.exclude_types]
+
+    def _convert_entity(self, archive_entity: ArchiveEntity) -> ArchiveEntity:
+        archive_entity_type = archive_entity.archive_entity_type
+        converter = self.converter[archive_entity_type]
+
+        if self.dsp_validation:
+            current_version = self.get_current_version(archive_entity)
+            if current_version and current_version.get('accession'):
+                archive_entity.accession = current_version.get('accession')
+                msg = f'This alias has already been submitted to DSP, accession: {archive_entity.accession}.'
+                archive_entity.add_error('ingest_archiver.convert.entity_already_in_dsp_and_has_accession', msg,
+                                         {
+                                             "current_version": current_version["_links"]["self"]["href"]
+                                         })
+            elif current_version and not current_version.get('accession'):
+                msg = f'This alias has already been submitted to DSP, but still has no accession.'
+                archive_entity.add_error('ingest_archiver.convert.entity_already_in_dsp', msg, {
+                    "current_version": current_version["_links"]["self"]["href"]
+                })
+            elif Accessioner.is_metadata_accessioned(archive_entity):
+                msg = f'Metadata already have an accession'
+                archive_entity.add_error('ingest_archiver.convert.entity_has_accession', msg, {
+                    "current_version": current_version["_links"]["self"]["href"]
+                })
+
+        if not archive_entity.errors:
+            try:
+                archive_entity.conversion = converter.convert(archive_entity.data)
+                archive_entity.conversion['alias'] = archive_entity.id
+                archive_entity.conversion.update(archive_entity.links)
+                if not self.keep_raw_data and archive_entity_type not in RAW_DATA_NEEDED_AFTER_CONVERSION:
+                    archive_entity.data = None
+
+            except ConversionError as e:
+                msg = f'An error occured converting data to a {archive_entity_type}: {str(e)}.'
+                archive_entity.add_error('ingest_archiver.convert.error', msg, {
+                    'data': json.dumps(archive_entity.data),
+                    'error': str(e)
+                })
+        return archive_entity
+
+    def _report(self, stage: str, manifest_id: str, archive_entity_type: str = None, count: int = None,
+                total: int = None, error: Exception = None):
+        with self.__progress_lock:
+            self.progress(ConversionProgress(stage, manifest_id, archive_entity_type, count, total, error))
+
+    def prefetch_current_versions(self, archive_entities: List[ArchiveEntity]):
+        entity_keys = [(entity.archive_entity_type, entity.id) for entity in archive_entities]
+        missing_keys = [entity_key for entity_key in entity_keys if entity_key not in self.current_versions]
+        if missing_keys:
+            self.current_versions.update(self.dsp_api.get_current_versions(missing_keys))
+
+    def get_current_version(self, archive_entity: ArchiveEntity):
+        entity_key = (archive_entity.archive_entity_type, archive_entity.id)
+        if entity_key not in self.current_versions:
+            self.current_versions[entity_key] = self.dsp_api.get_current_version(*entity_key)
+        return self.current_versions[entity_key]
+
     # TODO save notification to file for now, should be sending to rabbit mq in the future
     def notify_file_archiver(self, archive_submission: ArchiveSubmission) -> []:
         messages = []
         # TODO a bit redundant with converter, refactor this
-        for entity in archive_submission.converted_entities:
+        for entity in archive_submission.entity_map.get_converted_entities():
             if entity.archive_entity_type == 'sequencingRun':
                 data = entity.data
                 files = []
@@ -0,0 +1,80 @@
+import json
+import os
+import re
+import threading
+from typing import List, Optional
+
+import config
+from archiver.submission import ArchiveEntity, Error
+
+# saved along the REPORT.json fields as they are needed to archive an entity but not in the report
+CHECKPOINT_FIELDS = ['manifest_id', 'metadata_uuids', 'accessioned_metadata_uuids', 'data']
+
+
+class ConversionCheckpoint:
+    """
+    Records the entities converted from each manifest in a directory, one json file per manifest written as soon as
+    the manifest is converted, so that IngestArchiver.convert can skip the manifests that are done when a run that
+    died is started again. The files have the REPORT.json layout, {"entities": {alias: report entity}}, with the
+    fields needed to archive the entities added to each report entity.
+
+    Each file also keeps the parameters it was converted with, e.g. the alias prefix and the updateDate of the
+    manifest, and is only loaded back with the same parameters, so a run with other options or after the metadata
+    was fixed converts the manifest again.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def is_done(self, manifest_id: str) -> bool:
+        return os.path.isfile(self.__path(manifest_id))
+
+    def save(self, manifest_id: str, entities: List[ArchiveEntity], parameters: dict = None):
+        report_entities = {}
+        for entity in entities:
+            report_entity = entity.to_report()
+            report_entity.update({field: getattr(entity, field) for field in CHECKPOINT_FIELDS})
+            report_entities[entity.id] = report_entity
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.__path(manifest_id)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding=config.ENCODING) as checkpoint_file:
+            json.dump({'manifest_id': manifest_id, 'parameters': parameters, 'entities': report_entities},
+                      checkpoint_file)
+        os.replace(temp_path, path)
+
+    def load(self, manifest_id: str, parameters: dict = None) -> Optional[List[ArchiveEntity]]:
+        """Gives back None when there is no checkpoint for the manifest or it was saved with other parameters"""
+        try:
+            with open(self.__path(manifest_id), encoding=config.ENCODING) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('parameters') != parameters:
+            return None
+
+        entities = []
+        for alias, report_entity in checkpoint['entities'].items():
+            entity = ArchiveEntity.map_from_report(alias, report_entity)
+            entity.errors = [Error(**error) for error in entity.errors]
+            for field in CHECKPOINT_FIELDS:
+                setattr(entity, field, report_entity.get(field))
+            entities.append(entity)
+        return entities
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.json'):
+                os.remove(os.path.join(self.directory, file_name))
+
+    def __path(self, manifest_id: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', manifest_id) + '.json')
+
+
+def create_conversion_checkpoint(name: str) -> Optional[ConversionCheckpoint]:
+    if not config.CONVERSION_CHECKPOINT_DIR:
+        return None
+    return ConversionCheckpoint(os.path.join(config.CONVERSION_CHECKPOINT_DIR, name))
@@ -1,27 +1,30 @@
 import logging
-from typing import List
+from typing import List, Set
 import datetime
 
 from biostudiesclient.exceptions import RestErrorException
 
 import config
 from archiver import first_element_or_self, ArchiveException
+from api.revalidation import enable_revalidation
 
 from hca.loader import HcaLoader, IngestApi
+from hca.snapshot import create_hca_submission_snapshot
 from hca.submission import HcaSubmission
 from hca.updater import HcaUpdater
-from hca.assay import AssayData
+from hca.assay import AssayData, HcaSubmissionAssayData, ASSAY_ENTITY_TYPES
 from converter.biosamples import BioSamplesConverter
-from submitter.biosamples import BioSamplesSubmitter
+from submitter.base import get_load_profile
+from submitter.biosamples import BioSamplesSubmitter, ARCHIVE_TYPE as BIOSAMPLES_ARCHIVE_TYPE
 from submission_broker.services.biosamples import BioSamples, AapClient
 from submission_broker.services.biostudies import BioStudies
 
 from submitter.biosamples_submitter_service import BioSamplesSubmitterService
-from submitter.biostudies import BioStudiesSubmitter
+from submitter.biostudies import BioStudiesSubmitter, ARCHIVE_TYPE as BIOSTUDIES_ARCHIVE_TYPE
 from converter.biostudies import BioStudiesConverter
 from submitter.biostudies_submitter_service import BioStudiesSubmitterService
 from submitter.ena_submitter_service import Ena
-from submitter.ena import EnaSubmitter
+from submitter.ena import EnaSubmitter, ARCHIVE_TYPE as ENA_ARCHIVE_TYPE
 
 from converter.ena.ena_experiment import EnaExperiment
 from converter.ena.ena_run import EnaRun
@@ -36,15 +39,17 @@ class DirectArchiver:
         self.__biosamples_submitter = biosamples_submitter
         self.__biostudies_submitter = biostudies_submitter
         self.__ena_submitter = ena_submitter
+        self.load_profile = self.get_load_profile(biosamples_submitter, biostudies_submitter, ena_submitter)
         self.logger = logging.getLogger(__name__)
 
     def archive_project(self, project_uuid: str) -> HcaSubmission:
-        hca_submission = self.__loader.get_project(project_uuid=project_uuid)
+        hca_submission = self.__loader.get_project(project_uuid=project_uuid, entity_types=self.load_profile)
         self.__archive(hca_submission)
         return hca_submission
 
     def archive_submission(self, submission_uuid: str, archive_job: dict, ingest_api):
-        hca_submission = self.__loader.get_submission(submission_uuid=submission_uuid)
+        hca_submission = self.__loader.get_submission(submission_uuid=submission_uuid,
+                                                      entity_types=self.load_profile)
         self.__archive(hca_submission, ingest_api, archive_job, submission_uuid)
 
     def __archive(self, submission: HcaSubmission, ingest_api, archive_job, submission_uuid=None):
@@ -84,7 +89,8 @@ class DirectArchiver:
                                                biostudies_accessions, ena_accessions)
 
         if submission_uuid:
-            hca_assays_responses = self.__archive_ena_experiments_and_runs(submission_uuid, ingest_api, archive_job)
+            hca_assays_responses = self.__archive_ena_experiments_and_runs(submission_uuid, ingest_api, archive_job,
+                                                                           submission)
             if self.__has_response_errors([hca_assays_responses]):
                 self.__handle_error_response(ingest_api, archive_job, "hca_assays", hca_assays_responses)
                 return
@@ -160,7 +166,7 @@ class DirectArchiver:
                 return True
         return False
 
-    def __archive_ena_experiments_and_runs(self, sub_uuid, ingest_api, archive_job):
+    def __archive_ena_experiments_and_runs(self, sub_uuid, ingest_api, archive_job, submission: HcaSubmission):
         hca_assays_responses = {}
         logging.info("Archive ENA experiments and runs from HCA assays")
         hca_assays_responses['info'] = 'ENA experiments and runs from HCA assays'
@@ -168,7 +174,7 @@ class DirectArchiver:
 
         logging.info("Getting assay data...")
         try:
-            data = AssayData(IngestAPI(), sub_uuid)
+            data = self.__create_assay_data(sub_uuid, submission)
             data.load()
             study_ref = data.get_project_accession()
         except Exception as e:
@@ -220,6 +226,12 @@ class DirectArchiver:
 
         return hca_assays_responses
 
+    def __create_assay_data(self, sub_uuid: str, submission: HcaSubmission) -> AssayData:
+        # the assays are found in the loaded submission when it has all their entities, otherwise ingest is asked
+        if set(ASSAY_ENTITY_TYPES).issubset(self.load_profile):
+            return HcaSubmissionAssayData(IngestAPI(), submission, sub_uuid)
+        return AssayData(IngestAPI(), sub_uuid)
+
     @staticmethod
     def __archive_experiment(assay, study_ref, alias_prefix):
         ena_experiment = EnaExperiment(study_ref, alias_prefix)
@@ -247,6 +259,18 @@ class DirectArchiver:
         self.__biosamples_submitter.update_samples_with_biostudies_accession(submission, biosample_accessions,
                                                                              biostudies_accession)
 
+    @staticmethod
+    def get_load_profile(biosamples_submitter: BioSamplesSubmitter = None,
+                         biostudies_submitter: BioStudiesSubmitter = None,
+                         ena_submitter: EnaSubmitter = None) -> Set[str]:
+        """The entity types to load from ingest for the configured submitters"""
+        submitters = {
+            BIOSAMPLES_ARCHIVE_TYPE: biosamples_submitter,
+            BIOSTUDIES_ARCHIVE_TYPE: biostudies_submitter,
+            ENA_ARCHIVE_TYPE: ena_submitter
+        }
+        return get_load_profile(archive_type for archive_type, submitter in submitters.items() if submitter)
+
     @staticmethod
     def create_submitter_for_biosamples(aap_password, aap_url, aap_user, biosamples_domain, biosamples_url, hca_updater):
         aap_client = AapClient(aap_user, aap_password, aap_url)
@@ -284,7 +308,8 @@ def direct_archiver_from_params(
 ) -> DirectArchiver:
     logger = logging.getLogger(__name__)
     ingest_client = IngestApi(ingest_url)
-    hca_loader = HcaLoader(ingest_client)
+    enable_revalidation(ingest_client.session)
+    hca_loader = HcaLoader(ingest_client, snapshot=create_hca_submission_snapshot())
     hca_updater = HcaUpdater(ingest_client)
 
     biosamples_submitter = \
@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import config
+
+# (archive entity type, alias)
+EntityKey = Tuple[str, str]
+
+
+class EntityStore(ABC):
+    """Where an ArchiveEntityMap keeps its entities"""
+
+    @abstractmethod
+    def get(self, key: EntityKey) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def put(self, key: EntityKey, entity: Any):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryEntityStore(EntityStore):
+    def __init__(self):
+        self.__entities = {}
+
+    def get(self, key: EntityKey) -> Optional[Any]:
+        return self.__entities.get(key)
+
+    def put(self, key: EntityKey, entity: Any):
+        self.__entities[key] = entity
+
+
+class SpillingEntityStore(EntityStore):
+    """
+    Keeps the max_entities most recently used entities in memory and moves the others to a SQLite file, so that the
+    memory used by a huge project is bounded. The file is only created once the entities don't fit in memory, in
+    directory or the temp dir, and is removed when the store is closed or garbage collected.
+
+    An entity is saved when it is moved out of memory. If it is still used elsewhere at that point, e.g. by the
+    converted entities of an ArchiveSubmission, the same object is given back while it is alive, and the changes
+    made to it are saved the next time it is moved out of memory. That only happens once it is back in memory,
+    so an entity changed after it was moved out has to be put again, or got, before it is garbage collected,
+    otherwise the saved copy from before the change is the one given back.
+    """
+
+    def __init__(self, encode: Callable[[Any], dict], decode: Callable[[dict], Any], max_entities: int,
+                 directory: str = None):
+        self.encode = encode
+        self.decode = decode
+        self.max_entities = max_entities
+        self.directory = directory
+        self.spilled = 0
+        self.__memory: 'OrderedDict[EntityKey, Any]' = OrderedDict()
+        self.__alive = weakref.WeakValueDictionary()
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__finalizer = None
+        self.__lock = threading.RLock()
+
+    def get(self, key: EntityKey) -> Optional[Any]:
+        """
+        The entity is kept in memory again, so changes made to it from now on are saved. Changes made to it while
+        it was out of memory are lost if it was garbage collected in the meantime, put it again after changing it.
+        """
+        with self.__lock:
+            entity = self.__memory.get(key)
+            if entity is not None:
+                self.__memory.move_to_end(key)
+                return entity
+            entity = self.__alive.get(key)
+            if entity is None:
+                entity = self.__load(key)
+            if entity is not None:
+                self.__keep(key, entity)
+            return entity
+
+    def put(self, key: EntityKey, entity: Any):
+        with self.__lock:
+            self.__keep(key, entity)
+
+    def close(self):
+        with self.__lock:
+            self.__memory.clear()
+            if self.__finalizer:
+                self.__finalizer()
+            self.__connection = None
+
+    def __keep(self, key: EntityKey, entity: Any):
+        self.__memory[key] = entity
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.max_entities:
+            spilled_key, spilled = self.__memory.popitem(last=False)
+            self.__save(spilled_key, spilled)
+            self.__alive[spilled_key] = spilled
+
+    def __save(self, key: EntityKey, entity: Any):
+        self.__connect().execute('INSERT OR REPLACE INTO entities (entity_type, alias, body) VALUES (?, ?, ?)',
+                                 (key[0], key[1], json.dumps(self.encode(entity))))
+        self.spilled += 1
+
+    def __load(self, key: EntityKey) -> Optional[Any]:
+        if not self.__connection:
+            return None
+        row = self.__connection.execute('SELECT body FROM entities WHERE entity_type = ? AND alias = ?',
+                                        key).fetchone()
+        return self.decode(json.loads(row[0])) if row else None
+
+    def __connect(self) -> sqlite3.Connection:
+        if not self.__connection:
+            file_descriptor, path = tempfile.mkstemp(prefix='entity-map-', suffix='.sqlite', dir=self.directory)
+            os.close(file_descriptor)
+            self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.__connection.execute('PRAGMA journal_mode = OFF')
+            self.__connection.execute('PRAGMA synchronous = OFF')
+            self.__connection.execute(
+                'CREATE TABLE entities (entity_type TEXT, alias TEXT, body TEXT, PRIMARY KEY (entity_type, alias))')
+            self.__finalizer = weakref.finalize(self, _remove_database, self.__connection, path)
+        return self.__connection
+
+
+def _remove_database(connection: sqlite3.Connection, path: str):
+    connection.close()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def create_entity_store(encode: Callable[[Any], dict], decode: Callable[[dict], Any]) -> EntityStore:
+    if not config.ENTITY_MAP_MAX_IN_MEMORY:
+        return MemoryEntityStore()
+    return SpillingEntityStore(encode, decode, config.ENTITY_MAP_MAX_IN_MEMORY, config.ENTITY_MAP_SPILL_DIR)
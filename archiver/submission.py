@@ -1,20 +1,61 @@
 import json
-from typing import Iterator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, TextIO, Tuple
 from typing import List
 
-import polling
-
 import config
+from archiver.entity_store import EntityStore, create_entity_store
+from utils.poller import Poller, PollTimeoutException
+
+
+def create_validation_poller() -> Poller:
+    return Poller(step=config.VALIDATION_POLLING_STEP,
+                  max_step=config.VALIDATION_POLLING_MAX_STEP,
+                  backoff=config.POLLING_BACKOFF,
+                  jitter=config.POLLING_JITTER,
+                  timeout=None if config.VALIDATION_POLL_FOREVER else config.VALIDATION_POLLING_TIMEOUT)
+
+
+def create_submission_poller() -> Poller:
+    return Poller(step=config.SUBMISSION_POLLING_STEP,
+                  max_step=config.SUBMISSION_POLLING_MAX_STEP,
+                  backoff=config.POLLING_BACKOFF,
+                  jitter=config.POLLING_JITTER,
+                  timeout=None if config.SUBMISSION_POLL_FOREVER else config.SUBMISSION_POLLING_TIMEOUT)
 
 
 class Error:
+    __slots__ = ('error_code', 'message', 'details')
+
     def __init__(self, error_code: str, message: str, details: dict):
         self.error_code = error_code
         self.message = message
         self.details = details
 
+    def to_dict(self) -> dict:
+        return {'error_code': self.error_code, 'message': self.message, 'details': self.details}
+
+    @staticmethod
+    def report_errors(errors: list) -> List[dict]:
+        """errors read back from a report are already dicts"""
+        return [error.to_dict() if isinstance(error, Error) else error for error in errors]
+
+
+ERROR_FIELDS = set(Error.__slots__)
+
+ARCHIVE_ENTITY_FIELDS = ('data', 'metadata_uuids', 'accessioned_metadata_uuids', 'conversion', 'errors', 'warnings',
+                         'id', 'archive_entity_type', 'accession', 'dsp_json', 'dsp_url', 'dsp_uuid',
+                         'dsp_current_version', 'links', 'manifest_id')
+
 
 class ArchiveEntity:
+    """
+    Slotted as there are tens of thousands of them in a big submission. data, the ingest metadata the entity is
+    converted from, is None once released after conversion, see IngestArchiver.keep_raw_data.
+    """
+    __slots__ = ARCHIVE_ENTITY_FIELDS + ('__weakref__',)
+
     def __init__(self):
         self.data = {}
         self.metadata_uuids = None
@@ -33,7 +74,7 @@ class ArchiveEntity:
         self.manifest_id = None
 
     def __str__(self):
-        return str(vars(self))
+        return str({field: getattr(self, field) for field in ARCHIVE_ENTITY_FIELDS})
 
     @staticmethod
     def map_from_report(report_id, report_entity):
@@ -63,82 +104,129 @@ class ArchiveEntity:
     def add_error(self, error_code, message, details=None):
         self.errors.append(Error(error_code, message, details))
 
+    def to_report(self) -> dict:
+        report_entity = {}
+        report_entity['type'] = self.archive_entity_type
+        report_entity['errors'] = Error.report_errors(self.errors)
+        report_entity['accession'] = self.accession
+        report_entity['warnings'] = self.warnings
+        report_entity['converted_data'] = self.conversion
+
+        if self.dsp_json:
+            report_entity['entity_url'] = self.dsp_json['_links']['self']['href']
+        return report_entity
+
+    def to_dict(self) -> dict:
+        entity = {field: getattr(self, field) for field in ARCHIVE_ENTITY_FIELDS}
+        entity['errors'] = Error.report_errors(self.errors)
+        return entity
+
+    @staticmethod
+    def from_dict(entity_dict: dict) -> 'ArchiveEntity':
+        entity = ArchiveEntity()
+        for field, value in entity_dict.items():
+            setattr(entity, field, value)
+        entity.errors = [Error(**error) if isinstance(error, dict) and set(error) == ERROR_FIELDS else error
+                         for error in entity_dict['errors']]
+        return entity
+
 
 class ArchiveEntityMap:
-    def __init__(self):
-        self.entities_dict_type = {}
+    """
+    The archive entities by type and alias. The aliases are kept in memory, in the order they were added, and the
+    entities in an EntityStore which may move them to disk, see entity_store.create_entity_store.
+
+    An entity is counted as converted, i.e. with a conversion and no errors, when it is added, so add it again after
+    changing either.
+    """
+
+    def __init__(self, store: EntityStore = None):
+        self.store = store if store else create_entity_store(ArchiveEntity.to_dict, ArchiveEntity.from_dict)
+        self.aliases_by_type: Dict[str, Dict[str, None]] = {}
+        self.converted_aliases_by_type: Dict[str, Dict[str, None]] = {}
+        # the type of each alias, for find_entity
+        self.alias_index: Dict[str, str] = {}
 
     def add_entities(self, entities):
         for entity in entities:
             self.add_entity(entity)
 
     def add_entity(self, entity: ArchiveEntity):
-        if not self.entities_dict_type.get(entity.archive_entity_type):
-            self.entities_dict_type[entity.archive_entity_type] = {}
-        self.entities_dict_type[entity.archive_entity_type][entity.id] = entity
+        self.__put(entity.archive_entity_type, entity.id, entity)
+
+    def __put(self, entity_type, alias, entity: ArchiveEntity):
+        self.aliases_by_type.setdefault(entity_type, {})[alias] = None
+        self.alias_index.setdefault(alias, entity_type)
+        converted_aliases = self.converted_aliases_by_type.setdefault(entity_type, {})
+        if entity.conversion and not entity.errors:
+            converted_aliases[alias] = None
+        else:
+            converted_aliases.pop(alias, None)
+        self.store.put((entity_type, alias), entity)
 
     def get_entity(self, entity_type, archive_entity_id):
-        if self.entities_dict_type.get(entity_type):
-            return self.entities_dict_type[entity_type].get(archive_entity_id)
+        if archive_entity_id in self.aliases_by_type.get(entity_type, {}):
+            return self.store.get((entity_type, archive_entity_id))
         return None
 
-    def get_converted_entities(self):
-        entities = []
-        for entities_dict in self.entities_dict_type.values():
-            for entity in entities_dict.values():
-                if entity.conversion and not entity.errors:
-                    entities.append(entity)
-        return entities
+    def get_converted_entities(self) -> Iterator['ArchiveEntity']:
+        for entity_type, aliases in list(self.converted_aliases_by_type.items()):
+            for alias in aliases:
+                yield self.store.get((entity_type, alias))
+
+    def get_converted_aliases(self) -> Set[str]:
+        return {alias for aliases in self.converted_aliases_by_type.values() for alias in aliases}
 
     def get_conversion_summary(self):
-        summary = {}
-        for entities_dict in self.entities_dict_type.values():
-            for entity in entities_dict.values():
-                if entity.conversion and not entity.errors:
-                    if not summary.get(entity.archive_entity_type):
-                        summary[entity.archive_entity_type] = 0
-                    summary[entity.archive_entity_type] = summary[entity.archive_entity_type] + 1
-        return summary
+        return {entity_type: len(aliases) for entity_type, aliases in self.converted_aliases_by_type.items()
+                if aliases}
+
+    def __len__(self):
+        return sum(len(aliases) for aliases in self.aliases_by_type.values())
 
     def generate_report(self):
         report = {}
-        entities = {}
-        entity: ArchiveEntity
-        for entity in self.get_entities():
-            entities[entity.id] = {}
-            entities[entity.id]['type'] = entity.archive_entity_type
-            entities[entity.id]['errors'] = [error.__dict__ for error in entity.errors]
-            entities[entity.id]['accession'] = entity.accession
-            entities[entity.id]['warnings'] = entity.warnings
-            entities[entity.id]['converted_data'] = entity.conversion
-
-            if entity.dsp_json:
-                entities[entity.id]['entity_url'] = entity.dsp_json['_links']['self']['href']
-
-        report['entities'] = entities
+        report['entities'] = dict(self.iter_report_entities())
         report['conversion_summary'] = self.get_conversion_summary()
 
         return report
 
+    def iter_report_entities(self) -> Iterator[Tuple[str, dict]]:
+        for entity in self.iter_entities():
+            yield entity.id, entity.to_report()
+
+    def write_report(self, report_file: TextIO, indent: int = 4):
+        """
+        Writes the same json as generate_report one entity at a time, so that the report of a huge project doesn't
+        have to fit in memory
+        """
+        first_level = '\n' + ' ' * indent
+        second_level = first_level + ' ' * indent
+        report_file.write('{' + first_level + '"entities": {')
+        empty = True
+        for alias, report_entity in self.iter_report_entities():
+            report_file.write(('' if empty else ',') + second_level + json.dumps(alias) + ': ' +
+                              json.dumps(report_entity, indent=indent).replace('\n', second_level))
+            empty = False
+        report_file.write('}' if empty else first_level + '}')
+        summary = json.dumps(self.get_conversion_summary(), indent=indent).replace('\n', first_level)
+        report_file.write(',' + first_level + '"conversion_summary": ' + summary + '\n}')
+
     def find_entity(self, alias):
-        for entities_dict in self.entities_dict_type.values():
-            if entities_dict.get(alias):
-                return entities_dict.get(alias)
-        return None
+        entity_type = self.alias_index.get(alias)
+        return self.store.get((entity_type, alias)) if entity_type else None
+
+    def iter_entities(self) -> Iterator['ArchiveEntity']:
+        for entity_type, aliases in list(self.aliases_by_type.items()):
+            for alias in aliases:
+                yield self.store.get((entity_type, alias))
 
-    def get_entities(self) -> List["ArchiveEntity"]:
-        entities = []
-        for entity_type, entities_dict in self.entities_dict_type.items():
-            if not entities_dict:
-                continue
-            for alias, entity in entities_dict.items():
-                entities.append(entity)
-        return entities
+    def get_entities(self) -> Iterator["ArchiveEntity"]:
+        return self.iter_entities()
 
     def update(self, entity_type, entities: dict):
-        if not self.entities_dict_type.get(entity_type):
-            self.entities_dict_type[entity_type] = {}
-        self.entities_dict_type[entity_type].update_archive_submission(entities)
+        for alias, entity in entities.items():
+            self.__put(entity_type, alias, entity)
 
     @staticmethod
     def map_from_report(report):
@@ -156,14 +244,88 @@ class ArchiveEntityMap:
         return entity_map
 
 
+class ValidationSnapshot:
+    """
+    One read of the validation results of a DSP submission. The result details behind it are fetched concurrently
+    the first time they are needed and then shared by the errors, result details and error report views.
+    """
+
+    def __init__(self, dsp_api, validation_results_url: str, max_workers: int = None):
+        self.dsp_api = dsp_api
+        self.max_workers = max_workers if max_workers else config.BULK_LOOKUP_WORKERS
+        self.validation_results = list(dsp_api.get_validation_results(validation_results_url))
+        self.statuses = [validation_result['validationStatus'] for validation_result in self.validation_results]
+        self.__details: Optional[List[Tuple[dict, dict]]] = None
+        self.__lock = threading.Lock()
+
+    @property
+    def complete_count(self) -> int:
+        return self.statuses.count("Complete")
+
+    @property
+    def is_validated(self) -> bool:
+        return self.complete_count == len(self.statuses)
+
+    def get_details(self) -> List[Tuple[dict, dict]]:
+        """(validation result, validation result details) of the Complete and Pending results"""
+        with self.__lock:
+            if self.__details is None:
+                self.__details = self.__fetch_details()
+            return self.__details
+
+    def get_result_details(self) -> List[dict]:
+        return [details for validation_result, details in self.get_details()
+                if validation_result['validationStatus'] == "Complete"]
+
+    def get_errors(self) -> List:
+        return [details.get('errorMessages') for details in self.get_result_details() if details.get('errorMessages')]
+
+    def get_error_report(self) -> dict:
+        report = {
+            'errors': {},
+            'pending': []
+        }
+
+        for validation_result, validation_result_details in self.get_details():
+            if validation_result_details and validation_result_details.get('errorMessages'):
+                try:
+                    submittable_href = validation_result_details['_links']['submittable']['href']
+                except KeyError:
+                    submittable_href = False
+                report_key = submittable_href if submittable_href else 'NoSubmittable'
+                if not report['errors'].get(report_key):
+                    report['errors'][report_key] = []
+                    report['errors'][report_key].append(validation_result_details.get('errorMessages'))
+
+            if validation_result['validationStatus'] == "Pending" and validation_result_details and \
+                    validation_result_details.get('expectedResults'):
+                report['pending'].append(validation_result_details)
+
+        return report
+
+    def __fetch_details(self) -> List[Tuple[dict, dict]]:
+        validation_results = [validation_result for validation_result in self.validation_results
+                              if validation_result['validationStatus'] in ["Complete", "Pending"]]
+        # TODO fix how what to put as projection param, check dsp documentation, removing any params for now
+        details_urls = [validation_result['_links']['validationResult']['href'].split('{')[0]
+                        for validation_result in validation_results]
+        unique_urls = list(dict.fromkeys(details_urls))
+        if len(unique_urls) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_urls))) as executor:
+                details = dict(zip(unique_urls, executor.map(self.dsp_api.get_validation_result_details, unique_urls)))
+        else:
+            details = {url: self.dsp_api.get_validation_result_details(url) for url in unique_urls}
+        return [(validation_result, details[url]) for validation_result, url in zip(validation_results, details_urls)]
+
+
 class ArchiveSubmission:
-    def __init__(self, dsp_api, dsp_submission_url=None):
+    def __init__(self, dsp_api, dsp_submission_url=None, validation_poller: Poller = None,
+                 submission_poller: Poller = None):
         self.submission = {}
         self.errors: List['Error'] = list()
         self.processing_result = list()
         self.validation_result = list()
         self.is_completed = False
-        self.converted_entities = list()
         self.entity_map = ArchiveEntityMap()
         self.dsp_api = dsp_api
         self.file_upload_info = list()
@@ -173,6 +335,14 @@ class ArchiveSubmission:
         self.dsp_url = None
         self.dsp_submission_url = dsp_submission_url
         self.dsp_uuid = None
+        self.validation_poller = validation_poller if validation_poller else create_validation_poller()
+        self.submission_poller = submission_poller if submission_poller else create_submission_poller()
+        # no. of validation/processing results that are done, updated by each check while polling
+        self.validation_progress = 0
+        self.processing_progress = 0
+        self.validation_snapshot: Optional[ValidationSnapshot] = None
+        self.contents = None
+        self.contents_url = None
 
         if dsp_submission_url:
             self.submission = self.dsp_api.get_submission(dsp_submission_url)
@@ -188,9 +358,16 @@ class ArchiveSubmission:
     def __str__(self):
         return str(vars(self))
 
-    def add_entity(self, entity: ArchiveEntity):
+    def get_contents(self) -> dict:
+        # the contents document only holds the links to create submittables, so it is read once per submission
         get_contents_url = self.submission['_links']['contents']['href']
-        contents = self.dsp_api.get_contents(get_contents_url)
+        if self.contents is None or self.contents_url != get_contents_url:
+            self.contents = self.dsp_api.get_contents(get_contents_url)
+            self.contents_url = get_contents_url
+        return self.contents
+
+    def add_entity(self, entity: ArchiveEntity):
+        contents = self.get_contents()
 
         entity_link = self.dsp_api.get_entity_url(entity.archive_entity_type)
         create_entity_url = contents['_links'][f'{entity_link}:create']['href']
@@ -200,9 +377,70 @@ class ArchiveSubmission:
         entity.dsp_url = created_entity['_links']['self']['href']
         entity.dsp_uuid = entity.dsp_url.rsplit('/', 1)[-1]
 
-    def add_entities(self, converted_entities: List['ArchiveEntity']):
-        for entity in converted_entities:
-            self.add_entity(entity)
+    def add_entities(self, converted_entities: Iterable['ArchiveEntity'], max_workers: int = None,
+                     aliases: Set[str] = None, on_created: Callable[['ArchiveEntity'], None] = None):
+        """
+        Creates the entities concurrently on a bounded pool. An entity is only created once all the entities it refers
+        to by alias, e.g. the samples it is derived from, have been created, so the given order of the entities,
+        e.g. the topological order of the samples, is kept where it matters.
+
+        With the aliases of all the entities given, the entities are only gone through once, a wave at a time, so they
+        can come straight from an ArchiveEntityMap without all being held in memory. on_created is called with each
+        entity once its wave is created.
+        """
+        max_workers = max_workers if max_workers else config.DSP_SUBMITTABLE_WORKERS
+        if aliases is None:
+            converted_entities = list(converted_entities)
+            aliases = {entity.id for entity in converted_entities}
+        self.get_contents()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for wave in self.iter_creation_waves(converted_entities, aliases, max_size=max_workers * 8):
+                if len(wave) == 1 or max_workers == 1:
+                    for entity in wave:
+                        self.add_entity(entity)
+                else:
+                    list(executor.map(self.add_entity, wave))
+                if on_created:
+                    for entity in wave:
+                        on_created(entity)
+
+    @staticmethod
+    def get_creation_waves(entities: List['ArchiveEntity']) -> List[List['ArchiveEntity']]:
+        """Splits the entities, in order, into groups whose entities don't refer to each other"""
+        return list(ArchiveSubmission.iter_creation_waves(entities, {entity.id for entity in entities}))
+
+    @staticmethod
+    def iter_creation_waves(entities: Iterable['ArchiveEntity'], aliases: Set[str],
+                            max_size: int = None) -> Iterator[List['ArchiveEntity']]:
+        """get_creation_waves, going through the entities once, with the waves cut at max_size entities"""
+        wave = []
+        created = set()
+        in_wave = set()
+        for entity in entities:
+            dependencies = ArchiveSubmission.get_referenced_aliases(entity.conversion) & aliases
+            if wave and (dependencies - created or (max_size and len(wave) >= max_size)):
+                yield wave
+                created.update(in_wave)
+                in_wave = set()
+                wave = []
+            wave.append(entity)
+            in_wave.add(entity.id)
+        if wave:
+            yield wave
+
+    @staticmethod
+    def get_referenced_aliases(conversion) -> set:
+        aliases = set()
+        pending = [value for key, value in conversion.items() if key != 'alias'] if isinstance(conversion, dict) else []
+        while pending:
+            value = pending.pop()
+            if isinstance(value, dict):
+                if isinstance(value.get('alias'), str):
+                    aliases.add(value['alias'])
+                pending.extend(value.values())
+            elif isinstance(value, list):
+                pending.extend(value)
+        return aliases
 
     def add_error(self, error_code, message, details=None):
         self.errors.append(Error(error_code, message, details))
@@ -213,13 +451,8 @@ class ArchiveSubmission:
 
         is_validated = False
         try:
-            is_validated = polling.poll(
-                lambda: self.is_validated(),
-                step=config.VALIDATION_POLLING_STEP,
-                timeout=config.VALIDATION_POLLING_TIMEOUT if not config.VALIDATION_POLL_FOREVER else None,
-                poll_forever=True if config.VALIDATION_POLL_FOREVER else False
-            )
-        except polling.TimeoutException as te:
+            is_validated = self.validation_poller.poll(self.is_validated, progress=lambda: self.validation_progress)
+        except PollTimeoutException:
             self.add_error('archive_submission.validate.timed_out',
                            'DSP validation takes too long to complete.')
 
@@ -243,17 +476,15 @@ class ArchiveSubmission:
 
         is_validated = False
         try:
-            is_validated = polling.poll(
-                lambda: self.is_ready_to_submit(),
-                step=config.VALIDATION_POLLING_STEP,
-                timeout=config.VALIDATION_POLLING_TIMEOUT if not config.VALIDATION_POLL_FOREVER else None,
-                poll_forever=True if config.VALIDATION_POLL_FOREVER else False
-            )
-        except polling.TimeoutException as te:
+            # a validated submission with errors won't become submittable, so there is no point in waiting for it
+            is_validated = self.validation_poller.poll(self.is_ready_to_submit,
+                                                       progress=lambda: self.validation_progress,
+                                                       terminal=lambda: bool(self.validation_result))
+        except PollTimeoutException:
             self.add_error('archive_submission.validate_and_submit.timed_out',
                            'DSP validation takes too long to complete.')
 
-        if is_validated and self.get_all_validation_errors():
+        if (is_validated or self.validation_result) and self.get_all_validation_errors():
             validation_summary = self.get_all_validation_result_details()
             self.validation_result = validation_summary
             self.add_error('archive_submission.validate_and_submit.dsp_validation_errors',
@@ -274,16 +505,12 @@ class ArchiveSubmission:
         print("DSP Submission is submitted! Waiting for the submission result. Please do not complete again.")
 
         try:
-            self.is_completed = polling.poll(
-                lambda: self.is_processing_complete(),
-                step=config.SUBMISSION_POLLING_STEP,
-                timeout=config.SUBMISSION_POLLING_TIMEOUT if not config.SUBMISSION_POLL_FOREVER else None,
-                poll_forever=True if config.SUBMISSION_POLL_FOREVER else False
-            )
+            self.is_completed = self.submission_poller.poll(self.is_processing_complete,
+                                                            progress=lambda: self.processing_progress)
 
             self.process_result()
 
-        except polling.TimeoutException:
+        except PollTimeoutException:
             self.add_error('archive_submission.complete.timed_out',
                            'DSP submission takes too long to complete.')
 
@@ -328,68 +555,24 @@ class ArchiveSubmission:
 
         return False
 
-    def get_all_validation_result_details(self):
-        get_validation_results_url = self.submission['_links']['validationResults']['href']
-        validation_results = self.dsp_api.get_validation_results(get_validation_results_url)
-
-        summary = []
-        for validation_result in validation_results:
-            if validation_result['validationStatus'] == "Complete":
-                details_url = validation_result['_links']['validationResult']['href']
-                # TODO fix how what to put as projection param, check dsp documentation, removing any params for now
-                details_url = details_url.split('{')[0]
-                validation_result_details = self.dsp_api.get_validation_result_details(details_url)
-                summary.append(validation_result_details)
+    def get_validation_snapshot(self, refresh=False) -> 'ValidationSnapshot':
+        """
+        The validation results are read once per poll, by is_validated, and the other validation views use the
+        latest read. Pass refresh to read them again.
+        """
+        if refresh or self.validation_snapshot is None:
+            get_validation_results_url = self.submission['_links']['validationResults']['href']
+            self.validation_snapshot = ValidationSnapshot(self.dsp_api, get_validation_results_url)
+        return self.validation_snapshot
 
-        return summary
+    def get_all_validation_result_details(self):
+        return self.get_validation_snapshot().get_result_details()
 
     def get_all_validation_errors(self):
-        get_validation_results_url = self.submission['_links']['validationResults']['href']
-        validation_results = self.dsp_api.get_validation_results(get_validation_results_url)
-
-        errors = []
-        for validation_result in validation_results:
-            if validation_result['validationStatus'] == "Complete":
-                details_url = validation_result['_links']['validationResult']['href']
-                # TODO fix how what to put as projection param, check dsp documentation, removing any params for now
-                details_url = details_url.split('{')[0]
-                validation_result_details = self.dsp_api.get_validation_result_details(details_url)
-                if validation_result_details.get('errorMessages'):
-                    errors.append(validation_result_details.get('errorMessages'))
-        return errors
+        return self.get_validation_snapshot().get_errors()
 
     def get_validation_error_report(self):
-        get_validation_results_url = self.submission['_links']['validationResults']['href']
-        validation_results = self.dsp_api.get_validation_results(get_validation_results_url)
-
-        report = {
-            'errors': {},
-            'pending': []
-        }
-
-        for validation_result in validation_results:
-            validation_result_details = None
-            if validation_result['validationStatus'] in ["Complete", "Pending"]:
-                details_url = validation_result['_links']['validationResult']['href']
-                details_url = details_url.split('{')[0]
-                validation_result_details = self.dsp_api.get_validation_result_details(details_url)
-
-            if validation_result_details and validation_result_details.get('errorMessages'):
-                try:
-                    submittable_href = validation_result_details['_links']['submittable']['href']
-                except KeyError:
-                    submittable_href = False
-                report_key = submittable_href if submittable_href else 'NoSubmittable'
-                if not report['errors'].get(report_key):
-                    report['errors'][report_key] = []
-                    report['errors'][report_key].append(validation_result_details.get('errorMessages'))
-
-            if validation_result[
-                'validationStatus'] == "Pending" and validation_result_details and validation_result_details.get(
-                'expectedResults'):
-                report['pending'].append(validation_result_details)
-
-        return report
+        return self.get_validation_snapshot().get_error_report()
 
     def is_submittable(self):
         get_status_url = self.submission['_links']['submissionStatus']['href']
@@ -405,25 +588,18 @@ class ArchiveSubmission:
         return False
 
     def is_validated(self):
-        get_validation_results_url = self.submission['_links']['validationResults']['href']
-        validation_results = self.dsp_api.get_validation_results(get_validation_results_url)
-
-        for validation_result in validation_results:
-            if validation_result['validationStatus'] != "Complete":
-                return False
-
-        return True
+        snapshot = self.get_validation_snapshot(refresh=True)
+        self.validation_progress = snapshot.complete_count
+        return snapshot.is_validated
 
     def is_validated_and_submittable(self):
         return self.is_validated(self.submission) and self.is_submittable(self.submission)
 
     def is_processing_complete(self):
         results = self.dsp_api.get_processing_results(self.submission)
-        for result in results:
-            if result['status'] != "Completed" and result['status'] != "Error":
-                return False
-
-        return True
+        statuses = [result['status'] for result in results]
+        self.processing_progress = statuses.count("Completed") + statuses.count("Error")
+        return self.processing_progress == len(statuses)
 
     def delete_submission(self):
         delete_url = self.submission['_links']['self:delete']['href']
@@ -453,7 +629,7 @@ class ArchiveSubmission:
 
         report['accessions'] = self.accession_map
         report['completed'] = self.is_completed
-        report['submission_errors'] = [error.__dict__ for error in self.errors]
+        report['submission_errors'] = Error.report_errors(self.errors)
         report['file_upload_info'] = self.file_upload_info
 
         return report
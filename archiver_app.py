@@ -18,6 +18,7 @@ from api.dsp import DataSubmissionPortal
 from api.ingest import IngestAPI
 from archiver import ArchiveException
 from archiver.archiver import IngestArchiver, ArchiveSubmission, ArchiveEntityMap
+from archiver.checkpoint import create_conversion_checkpoint
 from archiver.data_archiver import DataArchiver, DataArchiverMessageBroker
 from archiver.direct import direct_archiver_from_config
 
@@ -121,7 +122,8 @@ def archive():
         archiver = IngestArchiver(ingest_api=ingest_api,
                                   dsp_api=DataSubmissionPortal(config.DSP_API_URL),
                                   exclude_types=exclude_types,
-                                  alias_prefix=alias_prefix)
+                                  alias_prefix=alias_prefix,
+                                  checkpoint=create_conversion_checkpoint(submission_uuid))
 
         thread = threading.Thread(target=async_archive,
                                   args=(ingest_api, archiver, submission_uuid))
@@ -224,6 +226,8 @@ def async_archive(ingest_api: IngestAPI, archiver: IngestArchiver, submission_uu
             'submissionUuid': submission_uuid,
             'fileUploadPlan': dsp_submission.file_upload_info
         })
+        if archiver.checkpoint:
+            archiver.checkpoint.clear()
         end = time.time()
         logger.info(f'Creating DSP submission for {submission_uuid} finished in {end - start}s')
     except Exception as e:
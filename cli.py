@@ -14,7 +14,8 @@ from optparse import OptionParser
 import config
 from api.dsp import DataSubmissionPortal
 from api.ingest import IngestAPI
-from archiver.archiver import IngestArchiver, ArchiveEntityMap, ArchiveSubmission
+from archiver.archiver import IngestArchiver, ArchiveEntityMap, ArchiveSubmission, print_progress
+from archiver.checkpoint import ConversionCheckpoint
 from archiver.direct import direct_archiver_from_config
 
 
@@ -29,7 +30,9 @@ class ArchiveCLI:
                                        dsp_api=self.dsp_api,
                                        exclude_types=self.split_exclude_types(exclude_types),
                                        alias_prefix=alias_prefix,
-                                       dsp_validation=not no_validation)
+                                       dsp_validation=not no_validation,
+                                       progress=print_progress,
+                                       checkpoint=ConversionCheckpoint(f'{self.output_dir}/CHECKPOINT'))
 
     def get_manifests_from_project(self, project_uuid):
         logging.info(f'GETTING MANIFESTS FOR PROJECT: {project_uuid}')
@@ -63,9 +66,8 @@ class ArchiveCLI:
         summary = entity_map.get_conversion_summary()
         logging.info(f'Entities to be converted: {json.dumps(summary)}')
 
-        report = entity_map.generate_report()
         logging.info("Saving Report file...")
-        self.save_dict_to_file("REPORT", report)
+        self.save_report_to_file("REPORT", entity_map)
         return entity_map
 
     def load_map(self, load_path):
@@ -99,6 +101,12 @@ class ArchiveCLI:
         self.save_dict_to_file("VALIDATION_ERROR_REPORT", submission.get_validation_error_report())
 
     def save_dict_to_file(self, file_name, json_content):
+        self._save_to_file(file_name, lambda open_file: json.dump(json_content, open_file, indent=4))
+
+    def save_report_to_file(self, file_name, entity_map: ArchiveEntityMap):
+        self._save_to_file(file_name, lambda open_file: entity_map.write_report(open_file, indent=4))
+
+    def _save_to_file(self, file_name, write):
         if not self.output_dir:
             return
 
@@ -112,7 +120,7 @@ class ArchiveCLI:
             os.remove(file)
 
         with open(file, "w") as open_file:
-            json.dump(json_content, open_file, indent=4)
+            write(open_file)
             open_file.close()
 
         logging.info(f"Saved to {directory}/{file_name}.json!")
@@ -196,7 +204,8 @@ if __name__ == '__main__':
                       help="Add this flag to not send submission to DSP for validation, will override complete flag to "
                            "false.",
                       action="store_true", default=False)
-    parser.add_option("-o", "--output_dir", help="Customise output directory name")
+    parser.add_option("-o", "--output_dir", help="Customise output directory name, running again with the same "
+                                                 "output directory resumes the conversion where it stopped")
 
     (options, args) = parser.parse_args()
 
@@ -1,3 +1,4 @@
+import json
 import os
 
 ARCHIVER_API_KEY = os.environ.get('ARCHIVER_API_KEY')
@@ -36,14 +37,20 @@ DSP_API_URL = os.environ.get('DSP_API_URL', os.environ.get('USI_API_URL', 'https
 JSON_DIR = os.path.dirname(__file__) + '/tests/unit/json/'
 ENCODING = 'utf-8'
 
-# polling config
-VALIDATION_POLLING_STEP = os.environ.get('VALIDATION_POLLING_STEP', 10)
-VALIDATION_POLLING_TIMEOUT = os.environ.get('VALIDATION_POLLING_TIMEOUT', 60)
-VALIDATION_POLL_FOREVER = os.environ.get('VALIDATION_POLL_FOREVER', True)
+# polling config, steps and timeouts are in seconds
+VALIDATION_POLLING_STEP = float(os.environ.get('VALIDATION_POLLING_STEP', 10))
+VALIDATION_POLLING_MAX_STEP = float(os.environ.get('VALIDATION_POLLING_MAX_STEP', 120))
+VALIDATION_POLLING_TIMEOUT = float(os.environ.get('VALIDATION_POLLING_TIMEOUT', 60))
+VALIDATION_POLL_FOREVER = os.environ.get('VALIDATION_POLL_FOREVER', 'true').lower() in ('true', '1', 'yes')
 
-SUBMISSION_POLLING_STEP = os.environ.get('SUBMISSION_POLLING_STEP', 30)
-SUBMISSION_POLLING_TIMEOUT = os.environ.get('SUBMISSION_POLLING_TIMEOUT', 120)
-SUBMISSION_POLL_FOREVER = os.environ.get('SUBMISSION_POLL_FOREVER', True)
+SUBMISSION_POLLING_STEP = float(os.environ.get('SUBMISSION_POLLING_STEP', 30))
+SUBMISSION_POLLING_MAX_STEP = float(os.environ.get('SUBMISSION_POLLING_MAX_STEP', 300))
+SUBMISSION_POLLING_TIMEOUT = float(os.environ.get('SUBMISSION_POLLING_TIMEOUT', 120))
+SUBMISSION_POLL_FOREVER = os.environ.get('SUBMISSION_POLL_FOREVER', 'true').lower() in ('true', '1', 'yes')
+
+# the polling step grows by POLLING_BACKOFF while there is no progress, +/- POLLING_JITTER of it
+POLLING_BACKOFF = float(os.environ.get('POLLING_BACKOFF', 1.5))
+POLLING_JITTER = float(os.environ.get('POLLING_JITTER', 0.1))
 
 ONTOLOGY_API_URL = os.environ.get('ONTOLOGY_API_URL', 'https://ontology.staging.archive.data.humancellatlas.org')
 
@@ -60,4 +67,57 @@ ENA_WEBIN_PASSWORD = os.environ.get('ENA_WEBIN_PASSWORD')
 ENA_WEBIN_BROWSER_BASE_URL = os.environ.get('ENA_WEBIN_BROWSER_BASE_URL', 'https://wwwdev.ebi.ac.uk/ena/submit/webin/report/studies/')
 
 ENA_FTP_DIR = os.environ.get('ENA_FTP_DIR', 'dev')
-ENA_FTP_HOST = os.environ.get('ENA_FTP_HOST', 'webin.ebi.ac.uk')
\ No newline at end of file
+ENA_FTP_HOST = os.environ.get('ENA_FTP_HOST', 'webin.ebi.ac.uk')
+# ingest entity cache config
+ENTITY_CACHE_MAX_ENTRIES = int(os.environ.get('ENTITY_CACHE_MAX_ENTRIES', 10000))
+ENTITY_CACHE_MAX_BYTES = int(os.environ.get('ENTITY_CACHE_MAX_BYTES', 0)) or None
+ENTITY_CACHE_TTL = float(os.environ.get('ENTITY_CACHE_TTL', 3600))
+ENTITY_CACHE_TTL_BY_TYPE = json.loads(os.environ.get('ENTITY_CACHE_TTL_BY_TYPE', '{"submissionEnvelopes": 60}'))
+
+# directory of json schemas used to resolve concrete entity types without calling the schema server
+SCHEMA_DIR = os.environ.get('SCHEMA_DIR')
+
+# paging config, PAGE_SIZE is only sent when set, otherwise the server default is used
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 0)) or None
+PAGE_PREFETCH_WORKERS = int(os.environ.get('PAGE_PREFETCH_WORKERS', 4))
+# no. of concurrent requests used to resolve lists of entities e.g. IngestAPI.get_entities_by_uuid
+BULK_LOOKUP_WORKERS = int(os.environ.get('BULK_LOOKUP_WORKERS', 8))
+# no. of processes checked at the same time by AssayData, with their link collections requested at once, 1 checks the
+# processes one by one and only requests the links needed
+ASSAY_WORKERS = int(os.environ.get('ASSAY_WORKERS', 8))
+# crawls the ingest graph level by level with BULK_LOOKUP_WORKERS concurrent requests when loading an HcaSubmission
+HCA_LOADER_BREADTH_FIRST = os.environ.get('HCA_LOADER_BREADTH_FIRST', 'false').lower() in ('true', '1', 'yes')
+# directory where HcaLoader keeps the HcaSubmissions it loads to reuse them while ingest has not changed, unset disables it
+HCA_SNAPSHOT_DIR = os.environ.get('HCA_SNAPSHOT_DIR')
+# no. of submittables created at the same time in a DSP submission
+DSP_SUBMITTABLE_WORKERS = int(os.environ.get('DSP_SUBMITTABLE_WORKERS', 8))
+# no. of manifests fetched and converted at the same time by IngestArchiver.convert, 1 converts them one by one
+CONVERT_WORKERS = int(os.environ.get('CONVERT_WORKERS', 1))
+INGEST_ASYNC_POOL_SIZE = int(os.environ.get('INGEST_ASYNC_POOL_SIZE', 100))
+
+# no. of archive entities an ArchiveEntityMap keeps in memory before moving the rest to a SQLite file in
+# ENTITY_MAP_SPILL_DIR (the temp dir by default), 0 keeps them all in memory
+ENTITY_MAP_MAX_IN_MEMORY = int(os.environ.get('ENTITY_MAP_MAX_IN_MEMORY', 20000))
+ENTITY_MAP_SPILL_DIR = os.environ.get('ENTITY_MAP_SPILL_DIR')
+# no. of biomaterials and of related entity lists the manifests converted together share, the least recently used
+# are fetched again when needed
+CONVERSION_CONTEXT_MAX_ENTRIES = int(os.environ.get('CONVERSION_CONTEXT_MAX_ENTRIES', 10000))
+# keeps the ingest metadata of the archive entities after they are converted, it is released by default
+KEEP_RAW_DATA = os.environ.get('KEEP_RAW_DATA', 'false').lower() in ('true', '1', 'yes')
+# where the app records the manifests converted for each submission, so that a conversion that died can be resumed
+CONVERSION_CHECKPOINT_DIR = os.environ.get('CONVERSION_CHECKPOINT_DIR')
+
+# http session config, shared by all the outbound clients
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))
+HTTP_POOL_MAXSIZE_BY_HOST = json.loads(os.environ.get('HTTP_POOL_MAXSIZE_BY_HOST', '{}'))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 600))
+HTTP_SHARED_CONNECT_RETRIES = int(os.environ.get('HTTP_SHARED_CONNECT_RETRIES', 0))
+
+# conditional GET (ETag/Last-Modified) revalidation of ingest reads, responses are kept on disk when a dir is set
+REVALIDATION_CACHE_ENABLED = os.environ.get('REVALIDATION_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+REVALIDATION_CACHE_DIR = os.environ.get('REVALIDATION_CACHE_DIR')
+REVALIDATION_CACHE_MAX_ENTRIES = int(os.environ.get('REVALIDATION_CACHE_MAX_ENTRIES', 10000))
+# seconds after which a response kept on disk is downloaded again
+REVALIDATION_CACHE_MAX_AGE = float(os.environ.get('REVALIDATION_CACHE_MAX_AGE', 7 * 24 * 60 * 60))
@@ -3,10 +3,10 @@ from abc import ABC, abstractmethod
 from json_converter.json_mapper import JsonMapper
 from lxml import etree
 from enum import Enum
-import requests
 from xsdata.formats.dataclass.serializers import XmlSerializer
 from xsdata.formats.dataclass.serializers.config import SerializerConfig
 
+from api.session import shared_session
 from converter import fixed_attribute, get_concrete_type
 from config import ENA_WEBIN_API_URL, ENA_WEBIN_USERNAME, ENA_WEBIN_PASSWORD
 
@@ -148,6 +148,6 @@ class EnaModel(ABC):
     @staticmethod
     def post(xml_type:XMLType, xml:any, update=False):
         action = 'MODIFY' if update else 'ADD' # default
-        response=requests.post(ENA_WEBIN_API_URL, files={xml_type.name: xml}, data={'ACTION': action}, auth=(ENA_WEBIN_USERNAME, ENA_WEBIN_PASSWORD))
+        response=shared_session().post(ENA_WEBIN_API_URL, files={xml_type.name: xml}, data={'ACTION': action}, auth=(ENA_WEBIN_USERNAME, ENA_WEBIN_PASSWORD))
         receipt_xml = response.text
         return receipt_xml
@@ -1,7 +1,7 @@
 import csv
 import os
 
-import requests
+from api.session import shared_session
 
 
 class SchemaProcessor:
@@ -33,7 +33,7 @@ class SchemaProcessor:
 
     @staticmethod
     def __load_schema(schema_path):
-        response = requests.get(schema_path)
+        response = shared_session().get(schema_path)
         response.raise_for_status()
         return response.json()
 
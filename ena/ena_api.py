@@ -5,9 +5,8 @@ import time
 import xml.etree.ElementTree as ET
 from typing import List
 
-import requests
-
 from api.ingest import IngestAPI
+from api.session import shared_session
 from ena.sequencing_run_converter import SequencingRunConverter
 from ena.util import write_xml, load_xml_tree_from_string, xml_to_string, load_xml_dict_from_string, write_json
 
@@ -70,7 +69,7 @@ class EnaApi:
 
     def post_files(self, files: dict):
         self._require_env_vars()
-        r = requests.post(self.url, files=files, auth=(self.user, self.password))
+        r = shared_session().post(self.url, files=files, auth=(self.user, self.password))
         r.raise_for_status()
         return r.text
 
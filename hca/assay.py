@@ -1,7 +1,34 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import config
 from api.ingest import IngestAPI
+from hca.submission import HcaSubmission, Entity
 import sys
 
+# the entity types an HcaSubmission needs to have been loaded with for HcaSubmissionAssayData to find its assays
+ASSAY_ENTITY_TYPES = ['processes', 'protocols', 'biomaterials', 'files']
+# the AssayData methods that get the link collections of a process, in the order the assay rules look at them
+ASSAY_LINK_CHECKS = [
+    'get_sequencing_and_library_preparation_protocols',
+    'get_input_biomaterials',
+    'get_derived_files',
+    'has_derived_biomaterials',
+    'has_input_files'
+]
+
+
+class _Lazy:
+    """Gets a link collection of a process when it is needed, like a Future that only runs on result()"""
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def result(self):
+        return self.function(*self.args)
+
+
 class AssayData:
     """
     Assay:
@@ -22,10 +49,11 @@ class AssayData:
         ...
     ]
     """
-    def __init__(self, ingest_api: IngestAPI, uuid: str):
+    def __init__(self, ingest_api: IngestAPI, uuid: str, max_workers: int = None):
         self.logger = logging.getLogger(__name__)
         self.ingest_api = ingest_api
         self.uuid = uuid
+        self.max_workers = max_workers if max_workers else config.ASSAY_WORKERS
 
     def load(self):
         self.submission = self.get_submission(self.uuid)
@@ -69,63 +97,80 @@ class AssayData:
             raise Exception(f'Error getting submission assays: {str(e)}')
 
     def __get_submission_assays(self):
-        assays = []
         # get processes
         processes = self.get_submission_entities('processes')
         num_processes = len(processes)
         self.logger.debug(f'{num_processes} processes in submission.')
 
-        for index, process in enumerate(processes):
+        if self.max_workers <= 1 or num_processes <= 1:
+            assays = [self.__check_assay(index, num_processes, process) for index, process in enumerate(processes)]
+        else:
+            # the links of a process are fetched by link_executor so that a process worker never waits on itself
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                    ThreadPoolExecutor(max_workers=self.max_workers * (len(ASSAY_LINK_CHECKS) - 1)) as link_executor:
+                assays = list(executor.map(
+                    lambda indexed: self.__check_assay(indexed[0], num_processes, indexed[1], link_executor),
+                    enumerate(processes)))
+        assays = [assay for assay in assays if assay]
+        self.logger.info(f'{len(assays)} assay processes found.')
+        return assays
 
-            self.logger.info(
-                f"{index + 1}/{num_processes} Checking {process['content']['process_core']['process_id']}")
-            # assay process protocol checks
-            sequencing_protocols, library_preparation_protocols = self.get_sequencing_and_library_preparation_protocols(process)
-            num_sequencing_protocols = len(sequencing_protocols)
-            num_library_preparation_protocols = len(library_preparation_protocols)
-            if num_sequencing_protocols == 1 and num_library_preparation_protocols > 0:
-                self.logger.info(f'Assay process sequencing and lib prep protocols found')
-            else:
-                self.logger.info(f'{num_sequencing_protocols} sequencing and {num_library_preparation_protocols} library preparation protocols found.')
-                continue
-
-            process["sequencing_protocol"] = sequencing_protocols[0]
-            process["library_preparation_protocols"] = library_preparation_protocols
-
-            # assay process input and output checks
-            process["input_biomaterials"] = self.get_input_biomaterials(process)
-            if not process["input_biomaterials"]:
-                self.logger.info(f'No input biomaterials found.')
-                continue
-
-            process["derived_files"] = self.get_derived_files(process)
-            if not process["derived_files"]:
-                self.logger.info(f'No derived files found.')
-                continue
+    def __check_assay(self, index, num_processes, process, link_executor: ThreadPoolExecutor = None):
+        """
+        Gives back the process with its assay fields if it is an assay, None otherwise. The protocols are asked for
+        first as they rule out most of the processes. Once they pass, with a link_executor the other link collections
+        of the process are all requested at once, otherwise each one when a rule needs it.
+        """
+        self.logger.info(
+            f"{index + 1}/{num_processes} Checking {process['content']['process_core']['process_id']}")
+        protocols_check, *link_checks = ASSAY_LINK_CHECKS
+        sequencing_protocols, library_preparation_protocols = getattr(self, protocols_check)(process)
+        num_sequencing_protocols = len(sequencing_protocols)
+        num_library_preparation_protocols = len(library_preparation_protocols)
+        if num_sequencing_protocols == 1 and num_library_preparation_protocols > 0:
+            self.logger.info(f'Assay process sequencing and lib prep protocols found')
+        else:
+            self.logger.info(f'{num_sequencing_protocols} sequencing and {num_library_preparation_protocols} library preparation protocols found.')
+            return None
+
+        links = {}
+        for name in link_checks:
+            check = getattr(self, name)
+            if link_executor:
+                links[name] = link_executor.submit(check, process)
             else:
-                all_sequence_files = True
-                for file in process["derived_files"]:
-                    described_by = file["content"]["describedBy"]
-                    all_sequence_files = all_sequence_files and described_by.endswith('sequence_file')
-                if not all_sequence_files:
-                    self.logger.info(f'Non sequence files found among derived files.')
-                    continue
-
-            # rule out unexpected in/output
-            if self.has_derived_biomaterials(process):
-                self.logger.info('Not assay: has derived biomaterials.')
-                continue
-
-            if self.has_input_files(process):
-                self.logger.info('Not assay: has input files.')
-                continue
-
-            if process["sequencing_protocol"] and process["library_preparation_protocols"] and process[
-                "input_biomaterials"] and process["derived_files"]:
-                assays.append(process)
+                links[name] = _Lazy(check, process)
+        return self.__check_assay_links(process, sequencing_protocols, library_preparation_protocols, links)
+
+    def __check_assay_links(self, process, sequencing_protocols, library_preparation_protocols, links: dict):
+        # assay process input and output checks
+        input_biomaterials = links['get_input_biomaterials'].result()
+        if not input_biomaterials:
+            self.logger.info(f'No input biomaterials found.')
+            return None
 
-        self.logger.info(f'{len(assays)} assay processes found.')
-        return assays
+        derived_files = links['get_derived_files'].result()
+        if not derived_files:
+            self.logger.info(f'No derived files found.')
+            return None
+        if not all(file["content"]["describedBy"].endswith('sequence_file') for file in derived_files):
+            self.logger.info(f'Non sequence files found among derived files.')
+            return None
+
+        # rule out unexpected in/output
+        if links['has_derived_biomaterials'].result():
+            self.logger.info('Not assay: has derived biomaterials.')
+            return None
+
+        if links['has_input_files'].result():
+            self.logger.info('Not assay: has input files.')
+            return None
+
+        process["sequencing_protocol"] = sequencing_protocols[0]
+        process["library_preparation_protocols"] = library_preparation_protocols
+        process["input_biomaterials"] = input_biomaterials
+        process["derived_files"] = derived_files
+        return process
 
     def get_input_biomaterials(self, process):
         input_biomaterials = self.get_all_entities(process["_links"]["inputBiomaterials"]["href"],
@@ -145,9 +190,12 @@ class AssayData:
         input_files = self.get_all_entities(process["_links"]["inputFiles"]["href"], 'files', [])
         return True if input_files else False
 
+    def get_protocols(self, process):
+        return self.get_all_entities(process["_links"]["protocols"]["href"], 'protocols', [])
+
     # seq file can only be created by these 2 protocols
     def get_sequencing_and_library_preparation_protocols(self, process):
-        protocols = self.get_all_entities(process["_links"]["protocols"]["href"], 'protocols', [])
+        protocols = self.get_protocols(process)
         sequencing_protocols = []
         library_preparation_protocols = []
         for protocol in protocols:
@@ -172,14 +220,14 @@ class AssayData:
             self.logger.error(f"No href link for entity {entity}")
             return None
 
-    def get_all_entities(self, url, entity_type, entities=[]):
-        response_json = self.ingest_api.get(url)
-        if "_embedded" in response_json:
+    def get_all_entities(self, url, entity_type, entities=None):
+        entities = [] if entities is None else entities
+        while url:
+            response_json = self.ingest_api.get(url)
+            if "_embedded" not in response_json:
+                break
             entities += response_json["_embedded"][entity_type]
-
-            if "next" in response_json["_links"]:
-                url = response_json["_links"]["next"]["href"]
-                self.get_all_entities(url, entity_type, entities)
+            url = response_json["_links"].get("next", {}).get("href")
         return entities
 
     def update_ingest_process_insdc_experiment_accession(self, process, experiment_accession):
@@ -217,4 +265,67 @@ class AssayData:
             raise Exception(f"Error updating ingest file insdc_run_accessions: {str(e)}")
 
 
+class HcaSubmissionAssayData(AssayData):
+    """
+    Finds the assays in an HcaSubmission loaded by HcaLoader with all of ASSAY_ENTITY_TYPES, from the links by name
+    that were loaded, instead of asking ingest for them again. Whatever is not in the HcaSubmission, e.g. processes of
+    the submission that are not in any bundle manifest, is asked to ingest like AssayData does.
+    """
+    def __init__(self, ingest_api: IngestAPI, hca_submission: HcaSubmission, uuid: str, max_workers: int = None):
+        super().__init__(ingest_api, uuid, max_workers)
+        self.hca_submission = hca_submission
+
+    def get_submission(self, uuid):
+        submission = self.hca_submission.get_entity_by_uuid('submissionEnvelopes', uuid)
+        return submission.attributes if submission else super().get_submission(uuid)
+
+    def get_submission_project(self):
+        projects = list(self.hca_submission.get_entities('projects'))
+        if len(projects) == 1:
+            return projects[0].attributes
+        return super().get_submission_project()
 
+    def get_submission_entities(self, entity_type):
+        entities = self.__get_manifest_entities(entity_type)
+        if len(entities) != self.ingest_api.get_related_entity_count(self.submission, entity_type, entity_type):
+            self.logger.info(f'Not all the {entity_type} of the submission were loaded, getting them from ingest.')
+            return super().get_submission_entities(entity_type)
+        # ingest ids grow with time, so this is the order ingest gives them in
+        entities.sort(key=lambda entity: entity.identifier.index)
+        # a copy, so the assay fields are not saved to ingest with the attributes of the entity
+        return [dict(entity.attributes) for entity in entities]
+
+    def get_protocols(self, process):
+        return self.__get_linked_entities(process, 'protocols', super().get_protocols)
+
+    def get_input_biomaterials(self, process):
+        return self.__get_linked_entities(process, 'inputBiomaterials', super().get_input_biomaterials)
+
+    def get_derived_files(self, process):
+        return self.__get_linked_entities(process, 'derivedFiles', super().get_derived_files)
+
+    def has_derived_biomaterials(self, process):
+        return bool(self.__get_linked_entities(process, 'derivedBiomaterials', super().has_derived_biomaterials))
+
+    def has_input_files(self, process):
+        return bool(self.__get_linked_entities(process, 'inputFiles', super().has_input_files))
+
+    def __get_linked_entities(self, process: dict, link_name: str, get_from_ingest):
+        entity = self.hca_submission.get_entity_by_uuid('processes', HcaSubmission.get_uuid(process))
+        if not entity:
+            return get_from_ingest(process)
+        return [linked_entity.attributes
+                for linked_entity in self.hca_submission.get_linked_entities_by_name(entity, link_name)]
+
+    def __get_manifest_entities(self, entity_type: str) -> List[Entity]:
+        """
+        The entities in the bundle manifests of the submission. The HcaSubmission can also hold entities of other
+        submissions, e.g. when a project was loaded or the graph reaches them.
+        """
+        submission = self.hca_submission.get_entity_by_uuid('submissionEnvelopes', self.uuid)
+        if not submission:
+            return []
+        indexes = set()
+        for manifest in self.hca_submission.get_linked_entities_by_name(submission, 'bundleManifests'):
+            indexes.update(manifest.get_linked_indexes(entity_type))
+        return [self.hca_submission.get_entity(entity_type, index) for index in indexes]
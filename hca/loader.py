@@ -1,23 +1,139 @@
-from typing import List, Union
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Union
 
+import requests
 from ingest.api.ingestapi import IngestApi
+
+import config
+from hca.snapshot import HcaSubmissionSnapshot
 from hca.submission import HcaSubmission, Entity, HandleCollision
 
 
+# the links followed from each type of entity, as (related entity type, link name)
+RELATED_LINKS = {
+    'biomaterials': [('processes', 'inputToProcesses'), ('processes', 'derivedByProcesses')],
+    'files': [('processes', 'inputToProcesses'), ('processes', 'derivedByProcesses')],
+    'processes': [
+        ('protocols', 'protocols'),
+        ('biomaterials', 'inputBiomaterials'),
+        ('biomaterials', 'derivedBiomaterials'),
+        ('files', 'inputFiles'),
+        ('files', 'derivedFiles')
+    ]
+}
+
+
+# loaded whatever the entity types asked for, they hold the rest together
+STRUCTURAL_ENTITY_TYPES = ['submissionEnvelopes', 'bundleManifests']
+
+# adding to these links doesn't change the updateDate of the entity they belong to, so a snapshot compares their
+# counts, as (entity type, related entity type, link name)
+COUNTED_LINKS = [
+    ('projects', 'submissionEnvelopes', 'submissionEnvelopes'),
+    ('submissionEnvelopes', 'bundleManifests', 'bundleManifests')
+]
+
+
 class HcaLoader:
-    def __init__(self, ingest: IngestApi):
+    """
+    Loads a project or submission and every entity linked to it from ingest into an HcaSubmission.
+
+    By default the links of each new entity are followed as soon as it is found, one request after another. With
+    breadth_first the graph is crawled level by level instead, the links of all the new entities of a level are
+    fetched with max_workers requests at a time and mapped on the calling thread. Both give the same links.
+
+    With a snapshot, what was loaded is saved and the next load of the same project or submission starts from it,
+    as long as none of its entities has a different updateDate in ingest and the project, when one was loaded, has
+    the same number of submissions and each submission the same number of bundle manifests, as those are added
+    without changing the updateDate. If ingest can't be asked, the project or submission is loaded again.
+
+    With entity_types, e.g. a load profile from submitter.base.get_load_profile, only the entities of those types are
+    loaded and only the links to them are followed. None loads everything.
+    """
+    def __init__(self, ingest: IngestApi, max_workers: int = None, breadth_first: bool = None,
+                 snapshot: HcaSubmissionSnapshot = None, entity_types: Iterable[str] = None):
         self.__ingest = ingest
+        self.max_workers = max_workers if max_workers else config.BULK_LOOKUP_WORKERS
+        self.breadth_first = config.HCA_LOADER_BREADTH_FIRST if breadth_first is None else breadth_first
+        self.snapshot = snapshot
+        self.entity_types = None if entity_types is None else set(entity_types).union(STRUCTURAL_ENTITY_TYPES)
 
-    def get_project(self, project_uuid: str) -> HcaSubmission:
-        hca_submission = HcaSubmission(HandleCollision.OVERWRITE)
-        self._map_project(hca_submission, project_uuid)
-        return hca_submission
+    def get_project(self, project_uuid: str, entity_types: Iterable[str] = None) -> HcaSubmission:
+        loader = self.scoped(entity_types) if entity_types is not None else self
+        return loader._load(self.__create_submission, 'projects', project_uuid, loader._map_project)
+
+    def get_submission(self, submission_uuid: str, entity_types: Iterable[str] = None) -> HcaSubmission:
+        loader = self.scoped(entity_types) if entity_types is not None else self
+        return loader._load(self.__create_submission, 'submissionEnvelopes', submission_uuid, loader._map_submission)
 
-    def get_submission(self, submission_uuid: str) -> HcaSubmission:
-        hca_submission = HcaSubmission(HandleCollision.OVERWRITE)
-        self._map_submission(hca_submission, submission_uuid)
+    def scoped(self, entity_types: Iterable[str]) -> 'HcaLoader':
+        """A copy of this loader that only loads the entity_types"""
+        loader = copy.copy(self)
+        loader.entity_types = set(entity_types).union(STRUCTURAL_ENTITY_TYPES)
+        return loader
+
+    def loads_entity_type(self, entity_type: str) -> bool:
+        return self.entity_types is None or entity_type in self.entity_types
+
+    def _load(self, create_submission: Callable[[], HcaSubmission], entity_type: str, entity_uuid: str,
+              map_entity: Callable[[HcaSubmission, str], None]) -> HcaSubmission:
+        snapshot_name = f'{entity_type}_{entity_uuid}'
+        if self.entity_types is not None:
+            snapshot_name += '_' + '-'.join(sorted(self.entity_types.difference(STRUCTURAL_ENTITY_TYPES)))
+        if self.snapshot:
+            hca_submission = self.snapshot.load(snapshot_name, create_submission)
+            if hca_submission and self._is_fresh(hca_submission, entity_type):
+                return hca_submission
+        hca_submission = create_submission()
+        map_entity(hca_submission, entity_uuid)
+        if self.snapshot:
+            self.snapshot.save(snapshot_name, hca_submission)
         return hca_submission
 
+    def _is_fresh(self, hca_submission: HcaSubmission, loaded_entity_type: str) -> bool:
+        """
+        Checks the updateDate of every entity and the COUNTED_LINKS the loaded project or submission was mapped
+        with against ingest, with max_workers requests at a time.
+
+        Only the COUNTED_LINKS are counted, counting every link would take as many requests as loading again. A link
+        added to any other relation, e.g. a new process linked to a loaded biomaterial, is only noticed when ingest
+        changes the updateDate of a loaded entity with it. Otherwise the snapshot is still used, and has to be deleted
+        for the link to be loaded.
+        """
+        checks = [(self.__has_update_date, entity)
+                  for entity_type in hca_submission.get_entity_types()
+                  for entity in hca_submission.get_entities(entity_type)]
+        for entity_type, related_entity_type, link_name in COUNTED_LINKS:
+            # the project of a submission is loaded without its submissions
+            if entity_type == 'projects' and loaded_entity_type != 'projects':
+                continue
+            checks.extend((self.__has_link_count, entity, related_entity_type, link_name,
+                           len(hca_submission.get_linked_entities_by_name(entity, link_name)))
+                          for entity in hca_submission.get_entities(entity_type))
+        with ThreadPoolExecutor(max_workers=max(self.max_workers, 1)) as executor:
+            return all(executor.map(lambda check: check[0](*check[1:]), checks))
+
+    def __has_update_date(self, entity: Entity) -> bool:
+        try:
+            response = self.__ingest.get(HcaSubmission.get_link(entity.attributes, 'self'),
+                                         headers=self.__ingest.get_headers())
+            response.raise_for_status()
+            return response.json().get('updateDate') == entity.attributes.get('updateDate')
+        except (requests.RequestException, ValueError):
+            return False
+
+    def __has_link_count(self, entity: Entity, related_entity_type: str, link_name: str, count: int) -> bool:
+        try:
+            return count == (self.__ingest.get_related_entities_count(link_name, entity.attributes,
+                                                                      related_entity_type) or 0)
+        except (requests.RequestException, KeyError, ValueError):
+            return False
+
+    @staticmethod
+    def __create_submission() -> HcaSubmission:
+        return HcaSubmission(HandleCollision.OVERWRITE)
+
     def _map_project(self, hca_submission, project_uuid):
         project_type = 'projects'
         project = self._map_entity(hca_submission, project_type, project_uuid)
@@ -37,22 +153,59 @@ class HcaLoader:
         for manifest_entity in hca_submission.get_entities(manifest_type):
             self.__map_manifest_content(hca_submission, manifest_entity)
 
-    def _map_entity(self, submission: HcaSubmission, entity_type: str, entity_uuid: str) -> Entity:
+    def _map_entity(self, submission: HcaSubmission, entity_type: str, entity_uuid: str,
+                    entity_attributes: dict = None) -> Entity:
         entity = submission.get_entity_by_uuid(entity_type, entity_uuid)
         if not entity:
-            entity_attributes = self.__ingest.get_entity_by_uuid(entity_type, entity_uuid)
-            entity = submission.map_ingest_entity(entity_attributes)
+            entity = self.__map_new_entity(submission, entity_type, entity_uuid, entity_attributes)
             self.__add_related_entities(submission, entity)
         return entity
 
+    def _map_entities(self, submission: HcaSubmission, entity_type: str, entity_uuids: List[str]) -> List[Entity]:
+        entities_attributes = self._get_entities_by_uuid(submission, entity_type, entity_uuids)
+        if not self.breadth_first:
+            return [self._map_entity(submission, entity_type, uuid, entities_attributes.get(uuid))
+                    for uuid in entity_uuids]
+        # the new entities are the first level of one crawl
+        entities = []
+        new_entities = []
+        for uuid in entity_uuids:
+            entity = submission.get_entity_by_uuid(entity_type, uuid)
+            if not entity:
+                entity = self.__map_new_entity(submission, entity_type, uuid, entities_attributes.get(uuid))
+                new_entities.append(entity)
+            entities.append(entity)
+        self.__crawl(submission, new_entities)
+        return entities
+
+    def __map_new_entity(self, submission: HcaSubmission, entity_type: str, entity_uuid: str,
+                         entity_attributes: dict = None) -> Entity:
+        if not entity_attributes:
+            entity_attributes = self.__ingest.get_entity_by_uuid(entity_type, entity_uuid)
+        return submission.map_ingest_entity(entity_attributes)
+
+    def _get_entities_by_uuid(self, submission: HcaSubmission, entity_type: str,
+                              entity_uuids: List[str]) -> Dict[str, dict]:
+        """Looks up the entities not yet in the submission concurrently, mapping stays on the calling thread."""
+        missing_uuids = [uuid for uuid in dict.fromkeys(entity_uuids)
+                         if not submission.contains_entity_by_uuid(entity_type, uuid)]
+        if len(missing_uuids) <= 1 or self.max_workers <= 1:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing_uuids))) as executor:
+            found = executor.map(lambda uuid: self.__ingest.get_entity_by_uuid(entity_type, uuid), missing_uuids)
+            return dict(zip(missing_uuids, found))
+
     def __add_related_entities(self, submission: HcaSubmission, entity: Entity):
-        entity_type = entity.identifier.entity_type
-        if entity_type == 'biomaterials' or entity_type == 'files':
-            self.__map_link_type_to_link_names(submission, entity, link_type='processes', link_names=['inputToProcesses', 'derivedByProcesses'])
-        elif entity_type == 'processes':
-            self.__map_link_type_to_link_names(submission, entity, 'protocols')
-            self.__map_link_type_to_link_names(submission, entity, link_type='biomaterials', link_names=['inputBiomaterials', 'derivedBiomaterials'])
-            self.__map_link_type_to_link_names(submission, entity, link_type='files', link_names=['inputFiles', 'derivedFiles'])
+        if self.breadth_first:
+            self.__crawl(submission, [entity])
+            return
+        for related_entity_type, link_name in self.__get_related_links(entity):
+            self.__map_related_entities(submission, entity, related_entity_type, link_name)
+
+    def __get_related_links(self, entity: Entity) -> List[tuple]:
+        return [(related_entity_type, link_name)
+                for related_entity_type, link_name in RELATED_LINKS.get(entity.identifier.entity_type, [])
+                if self.loads_entity_type(related_entity_type)]
 
     def __map_link_type_to_link_names(self, submission: HcaSubmission,
                                       entity: Entity,
@@ -67,12 +220,40 @@ class HcaLoader:
 
     def __map_related_entities(self, submission: HcaSubmission, entity: Entity, related_entity_type: str, link_name):
         related_entities = self.__ingest.get_related_entities(link_name, entity.attributes, related_entity_type)
+        for related_entity in self.__link_related_entities(submission, entity, link_name, related_entities):
+            self.__add_related_entities(submission, related_entity)
+
+    def __crawl(self, submission: HcaSubmission, entities: List[Entity]):
+        """
+        Follows the links of the new entities level by level, without recursion. Only the entities that were not
+        in the submission make it to the next level, so the links of an entity are only requested once.
+        """
+        level = entities
+        with ThreadPoolExecutor(max_workers=max(self.max_workers, 1)) as executor:
+            while level:
+                pending_links = [(entity, related_entity_type, link_name)
+                                 for entity in level
+                                 for related_entity_type, link_name in self.__get_related_links(entity)]
+                found = executor.map(lambda pending_link: self.__get_related_entities(*pending_link), pending_links)
+                level = []
+                for (entity, _, link_name), related_entities in zip(pending_links, found):
+                    level.extend(self.__link_related_entities(submission, entity, link_name, related_entities))
+
+    def __get_related_entities(self, entity: Entity, related_entity_type: str, link_name: str) -> List[dict]:
+        return list(self.__ingest.get_related_entities(link_name, entity.attributes, related_entity_type))
+
+    @staticmethod
+    def __link_related_entities(submission: HcaSubmission, entity: Entity, link_name: str,
+                                related_entities: Iterable[dict]) -> List[Entity]:
+        """Maps and links the related entities, giving back the ones that were not in the submission"""
+        new_entities = []
         for entity_attributes in related_entities:
             in_cache = submission.contains_entity(entity_attributes)
             related_entity = submission.map_ingest_entity(entity_attributes)
             if not in_cache:
-                self.__add_related_entities(submission, related_entity)
-            submission.link_entities(entity, related_entity)
+                new_entities.append(related_entity)
+            submission.link_entities_by_name(entity, related_entity, link_name)
+        return new_entities
 
     def __map_manifest_content(self, submission: HcaSubmission, manifest: Entity):
         self.__map_bundle_manifest_relations(submission, manifest, 'projects', 'fileProjectMap')
@@ -82,6 +263,8 @@ class HcaLoader:
         self.__map_bundle_manifest_relations(submission, manifest, 'files', 'fileFilesMap')
 
     def __map_bundle_manifest_relations(self, submission: HcaSubmission, manifest: Entity, entity_type, manifest_key):
-        for uuid in manifest.attributes.get(manifest_key, {}).keys():
-            entity = self._map_entity(submission, entity_type, uuid)
+        if not self.loads_entity_type(entity_type):
+            return
+        uuids = list(manifest.attributes.get(manifest_key, {}).keys())
+        for entity in self._map_entities(submission, entity_type, uuids):
             submission.link_entities(manifest, entity)
@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+import re
+import threading
+from typing import Callable, Iterator, Optional
+
+import config
+from hca.submission import HcaSubmission, Entity
+
+SNAPSHOT_FORMAT = 2
+# each entity is written on its own line as a list of these fields
+SNAPSHOT_FIELDS = ['entity_type', 'index', 'attributes', 'accessions', 'links', 'errors', 'named_links']
+
+
+class HcaSubmissionSnapshot:
+    """
+    Keeps loaded HcaSubmissions in a directory so that they can be reused by the next run, e.g. the retry of a failed
+    archiving or the utils/duplicate tools. A snapshot is a gzipped json lines file, a header line followed by one
+    line per entity with its attributes, accessions, links, errors and links by name, so it is written and read one
+    entity at a time.
+
+    The snapshot does not know if ingest changed since it was written, HcaLoader checks the updateDate of the entities
+    and the number of manifests and submissions before using it.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def save(self, name: str, submission: HcaSubmission):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.__path(name)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        entity_types = list(submission.get_entity_types())
+        with gzip.open(temp_path, 'wt', encoding=config.ENCODING) as snapshot_file:
+            header = {'format': SNAPSHOT_FORMAT, 'fields': SNAPSHOT_FIELDS}
+            snapshot_file.write(json.dumps(header) + '\n')
+            for entity_type in entity_types:
+                for entity in submission.get_entities(entity_type):
+                    line = self.__encode(submission, entity, entity_types)
+                    snapshot_file.write(json.dumps(line, separators=(',', ':')) + '\n')
+        os.replace(temp_path, path)
+
+    def load(self, name: str, create_submission: Callable[[], HcaSubmission]) -> Optional[HcaSubmission]:
+        """Gives back None when there is no snapshot, or it can't be read, e.g. it was cut short"""
+        try:
+            return self.__load(name, create_submission)
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def __load(self, name: str, create_submission: Callable[[], HcaSubmission]) -> Optional[HcaSubmission]:
+        lines = self.__read(name)
+        header = next(lines, None)
+        if not header or header.get('format') != SNAPSHOT_FORMAT:
+            return None
+        submission = create_submission()
+        for entity_type, index, attributes, accessions, links, errors, named_links in lines:
+            entity = submission.map_ingest_entity(attributes)
+            for service, accession in accessions.items():
+                entity.add_accession(service, accession)
+            for linked_type, linked_indexes in links.items():
+                for linked_index in linked_indexes:
+                    entity.add_link(linked_type, linked_index)
+            for attribute, error_msgs in errors.items():
+                entity.add_errors(attribute, error_msgs)
+            for link_name, related in named_links.items():
+                for related_entity_type, related_index in related:
+                    submission.add_named_link(entity, link_name, related_entity_type, related_index)
+        return submission
+
+    def delete(self, name: str):
+        try:
+            os.remove(self.__path(name))
+        except FileNotFoundError:
+            pass
+
+    def __read(self, name: str) -> Iterator:
+        with gzip.open(self.__path(name), 'rt', encoding=config.ENCODING) as snapshot_file:
+            for line in snapshot_file:
+                yield json.loads(line)
+
+    @staticmethod
+    def __encode(submission: HcaSubmission, entity: Entity, entity_types: list) -> list:
+        links = {}
+        for entity_type in entity_types:
+            linked_indexes = entity.get_linked_indexes(entity_type)
+            if linked_indexes:
+                links[entity_type] = sorted(linked_indexes)
+        return [entity.identifier.entity_type, entity.identifier.index, entity.attributes,
+                dict(entity.get_accessions()), links, entity.get_errors(), submission.get_named_links(entity)]
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', name) + '.jsonl.gz')
+
+
+def create_hca_submission_snapshot() -> Optional[HcaSubmissionSnapshot]:
+    if not config.HCA_SNAPSHOT_DIR:
+        return None
+    return HcaSubmissionSnapshot(config.HCA_SNAPSHOT_DIR)
@@ -1,4 +1,5 @@
 import re
+from typing import Dict, List, Tuple
 
 from submission_broker.submission.submission import Submission, Entity, HandleCollision
 
@@ -8,6 +9,8 @@ from hca.accession_mapper import accession_spec, AccessionMapper
 class HcaSubmission(Submission):
     def __init__(self, collider: HandleCollision = None):
         self.__uuid_map = {}
+        # the links by the name they have in ingest, e.g. the inputBiomaterials of a process, in the order ingest gave
+        self.__named_links: Dict[Tuple[str, str], Dict[str, Dict[Tuple[str, str], None]]] = {}
         self.__regex = re.compile(r'/(?P<entity_type>\w+)/(?P<entity_id>\w+)$')
         super().__init__(collider)
 
@@ -37,6 +40,22 @@ class HcaSubmission(Submission):
             return True
         return False
 
+    def link_entities_by_name(self, entity: Entity, related_entity: Entity, link_name: str):
+        self.link_entities(entity, related_entity)
+        self.add_named_link(entity, link_name, related_entity.identifier.entity_type, related_entity.identifier.index)
+
+    def add_named_link(self, entity: Entity, link_name: str, related_entity_type: str, related_index: str):
+        named_links = self.__named_links.setdefault((entity.identifier.entity_type, entity.identifier.index), {})
+        named_links.setdefault(link_name, {})[(related_entity_type, related_index)] = None
+
+    def get_linked_entities_by_name(self, entity: Entity, link_name: str) -> List[Entity]:
+        named_links = self.__named_links.get((entity.identifier.entity_type, entity.identifier.index), {})
+        return [self.get_entity(entity_type, index) for entity_type, index in named_links.get(link_name, {})]
+
+    def get_named_links(self, entity: Entity) -> Dict[str, List[Tuple[str, str]]]:
+        named_links = self.__named_links.get((entity.identifier.entity_type, entity.identifier.index), {})
+        return {link_name: list(related) for link_name, related in named_links.items()}
+
     def add_accessions_to_attributes(self, entity: Entity, archive_type: str, entity_type: str):
         accession = entity.get_accession(archive_type)
 
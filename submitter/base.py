@@ -1,6 +1,6 @@
 from abc import abstractmethod, ABCMeta
 from datetime import datetime
-from typing import Tuple, List
+from typing import Iterable, List, Set, Tuple
 
 
 from submission_broker.submission.submission import Entity
@@ -9,6 +9,7 @@ from converter.biostudies import BioStudiesConverter
 from converter.ena.ena_study import EnaStudyConverter
 
 from archiver import first_element_or_self, ArchiveResponse, ConvertedEntity
+from hca.assay import ASSAY_ENTITY_TYPES
 from hca.submission import HcaSubmission
 
 CREATED_ENTITY = 'CREATED'
@@ -21,6 +22,15 @@ ARCHIVE_TO_HCA_ENTITY_MAP = {
     'ENA': ['projects']
 }
 
+# the other entity types an archive needs HcaLoader to load, BioSamples sends the release date of the project and
+# biomaterials are linked to the biomaterials they are derived from through processes, the ENA experiments and runs
+# are made from the assays of the submission
+ARCHIVE_TO_HCA_ENTITY_DEPENDENCIES = {
+    'BioSamples': ['projects', 'processes'],
+    'BioStudies': [],
+    'ENA': ASSAY_ENTITY_TYPES
+}
+
 CONVERTERS_BY_ARCHIVE_TYPES = {
     'BioSamples_biomaterials': BioSamplesConverter(),
     'BioStudies_projects': BioStudiesConverter(),
@@ -34,6 +44,15 @@ ACCESSION_KEY_BY_ARCHIVE_TYPE = {
 }
 
 
+def get_load_profile(archive_types: Iterable[str]) -> Set[str]:
+    """The entity types HcaLoader has to load for the archive types to be archived"""
+    entity_types = set()
+    for archive_type in archive_types:
+        entity_types.update(ARCHIVE_TO_HCA_ENTITY_MAP[archive_type])
+        entity_types.update(ARCHIVE_TO_HCA_ENTITY_DEPENDENCIES[archive_type])
+    return entity_types
+
+
 class Submitter(metaclass=ABCMeta):
     def __init__(self, archive_client, converter, updater):
         self.archive_client = archive_client
@@ -3,10 +3,11 @@ from enum import Enum
 from http import HTTPStatus
 from typing import Dict, Tuple
 
-import requests
 from requests import Response
 from requests.auth import HTTPBasicAuth
 
+from api.session import shared_session
+
 
 class EnaAction(Enum):
     ADD = 'ADD'
@@ -32,7 +33,7 @@ class Ena:
             data['HOLD_DATE'] = hold_date
         if center_name:
             data['CENTER_NAME'] = center_name
-        response: Response = requests.post(self.url, auth=self.auth, data=data, files=ena_files)
+        response: Response = shared_session().post(self.url, auth=self.auth, data=data, files=ena_files)
         if response.status_code == HTTPStatus(200):
             return response.content
         else:
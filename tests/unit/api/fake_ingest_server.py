@@ -0,0 +1,179 @@
+"""
+In-process fake of the Ingest API, serving HAL entities from memory on a background thread so that the Ingest
+clients can be exercised offline. It only uses the standard library, so the IngestAPI tests don't need aiohttp.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid as uuid_lib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakeIngestServer:
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.url = None
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.connection_count = 0
+        self.entities: Dict[str, Dict[str, dict]] = {}
+        self.relations: Dict[str, Dict[str, Dict[str, List[tuple]]]] = {}
+        self.__failures = []
+        self.__lock = threading.Lock()
+        self.__server = None
+        self.__thread = None
+
+    def add_entity(self, entity_type: str, entity_id: str = None, entity_uuid: str = None, content: dict = None,
+                   relations: Dict[str, List[tuple]] = None) -> dict:
+        entity_id = entity_id if entity_id else uuid_lib.uuid4().hex
+        entity_uuid = entity_uuid if entity_uuid else str(uuid_lib.uuid4())
+        entity = {
+            'uuid': {'uuid': entity_uuid},
+            'content': content if content else {}
+        }
+        self.entities.setdefault(entity_type, {})[entity_id] = entity
+        self.relations.setdefault(entity_type, {})[entity_id] = {}
+        for relation, related in (relations if relations else {}).items():
+            self.link(entity_type, entity_id, relation, related)
+        return self.get_entity(entity_type, entity_id)
+
+    def link(self, entity_type: str, entity_id: str, relation: str, related: List[tuple]):
+        """related is a list of (entity_type, entity_id) pairs"""
+        self.relations[entity_type][entity_id][relation] = list(related)
+
+    def get_entity(self, entity_type: str, entity_id: str) -> dict:
+        entity = dict(self.entities[entity_type][entity_id])
+        self_url = f'{self.url}/{entity_type}/{entity_id}'
+        entity['_links'] = {'self': {'href': self_url}}
+        for relation in self.relations[entity_type][entity_id]:
+            entity['_links'][relation] = {'href': f'{self_url}/{relation}'}
+        return entity
+
+    def fail_next(self, count: int, status: int = 503):
+        self.__failures.extend([status] * count)
+
+    def start_in_thread(self) -> str:
+        self.__server = _FakeIngestHTTPServer(('127.0.0.1', 0), _FakeIngestRequestHandler)
+        self.__server.fake_ingest = self
+        self.url = f'http://127.0.0.1:{self.__server.server_address[1]}'
+        self.__thread = threading.Thread(target=self.__server.serve_forever, args=(0.05,), daemon=True)
+        self.__thread.start()
+        return self.url
+
+    def stop_thread(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+    def on_connection(self):
+        with self.__lock:
+            self.connection_count += 1
+
+    def handle(self, method: str, path: str, headers, body: Optional[dict]) -> Tuple[int, Optional[dict], dict]:
+        """Gives back the status, json body and headers of the response"""
+        with self.__lock:
+            self.request_count += 1
+            failure = self.__failures.pop(0) if self.__failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure is not None:
+            return failure, None, {}
+
+        location = urlparse(path)
+        query = dict(parse_qsl(location.query))
+        segments = location.path.strip('/').split('/')
+        if method == 'GET' and len(segments) == 3 and segments[1:] == ['search', 'findByUuid']:
+            return self.__find_by_uuid(segments[0], query.get('uuid'), headers)
+        if len(segments) == 2 and segments[1] in self.entities.get(segments[0], {}):
+            if method == 'PATCH':
+                return self.__patch_entity(segments[0], segments[1], body)
+            if method == 'GET':
+                return self.__entity_response(segments[0], segments[1], headers)
+        if method == 'GET' and len(segments) == 3:
+            return self.__get_related(*segments, query)
+        return 404, None, {}
+
+    def __find_by_uuid(self, entity_type: str, entity_uuid: str, headers):
+        for entity_id, entity in self.entities.get(entity_type, {}).items():
+            if entity['uuid']['uuid'] == entity_uuid:
+                return self.__entity_response(entity_type, entity_id, headers)
+        return 404, None, {}
+
+    def __patch_entity(self, entity_type: str, entity_id: str, patch: dict):
+        patch.pop('_links', None)
+        self.entities[entity_type][entity_id].update(patch)
+        return self.__entity_response(entity_type, entity_id, {})
+
+    def __get_related(self, entity_type: str, entity_id: str, relation: str, query: dict):
+        related = self.relations.get(entity_type, {}).get(entity_id, {}).get(relation)
+        if related is None:
+            return 404, None, {}
+        page_number = int(query.get('page', 0))
+        page_size = int(query.get('size', 20))
+        related_type = related[0][0] if related else relation
+        page_related = related[page_number * page_size:(page_number + 1) * page_size]
+        total_pages = max((len(related) + page_size - 1) // page_size, 1)
+        related_entities = [self.get_entity(*entity_key) for entity_key in page_related]
+        self_url = f'{self.url}/{entity_type}/{entity_id}/{relation}'
+        body = {
+            '_embedded': {related_type: related_entities},
+            '_links': {'self': {'href': self_url}},
+            'page': {
+                'size': page_size,
+                'totalElements': len(related),
+                'totalPages': total_pages,
+                'number': page_number
+            }
+        }
+        if page_number + 1 < total_pages:
+            body['_links']['next'] = {'href': f'{self_url}?page={page_number + 1}&size={page_size}'}
+        return 200, body, {}
+
+    def __entity_response(self, entity_type: str, entity_id: str, headers):
+        entity = self.get_entity(entity_type, entity_id)
+        etag = '"' + hashlib.md5(json.dumps(entity, sort_keys=True).encode()).hexdigest() + '"'
+        if headers.get('If-None-Match') == etag:
+            with self.__lock:
+                self.not_modified_count += 1
+            return 304, None, {'ETag': etag}
+        return 200, entity, {'ETag': etag}
+
+
+class _FakeIngestHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the clients under test open many connections at once
+    request_queue_size = 128
+
+
+class _FakeIngestRequestHandler(BaseHTTPRequestHandler):
+    # keeps the connections alive between requests, like Ingest does
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.fake_ingest.on_connection()
+
+    def do_GET(self):
+        self.__respond(*self.server.fake_ingest.handle('GET', self.path, self.headers, None))
+
+    def do_PATCH(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length)) if length else {}
+        self.__respond(*self.server.fake_ingest.handle('PATCH', self.path, self.headers, body))
+
+    def log_message(self, format, *args):
+        pass
+
+    def __respond(self, status: int, body: Optional[dict], headers: dict):
+        content = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
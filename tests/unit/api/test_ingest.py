@@ -0,0 +1,142 @@
+import sys
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from requests import HTTPError
+
+from api.ingest import IngestAPI
+from api.revalidation import MemoryRevalidationStore
+from api.schema import SchemaRegistry
+from tests.unit.api.fake_ingest_server import FakeIngestServer
+from utils.cache import LruEntityCache, SingleFlight
+
+
+class IngestAPISingleFlightTest(TestCase):
+    def setUp(self):
+        self.server = FakeIngestServer(latency=0.2)
+        self.url = self.server.start_in_thread()
+        self.single_flight = SingleFlight()
+
+    def tearDown(self):
+        self.server.stop_thread()
+
+    def create_ingest_api(self):
+        return IngestAPI(self.url, entity_cache=LruEntityCache(), schema_registry=SchemaRegistry(),
+                         revalidation_store=MemoryRevalidationStore(), single_flight=self.single_flight)
+
+    def test_get_entity__concurrent_threads_share_one_request(self):
+        # given
+        project = self.server.add_entity('projects', 'p1', 'uuid-p1')
+        ingest_apis = [self.create_ingest_api() for _ in range(8)]
+        results = []
+
+        # when
+        threads = [threading.Thread(target=lambda api=api: results.append(api.get_project_by_uuid('uuid-p1')))
+                   for api in ingest_apis]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # then
+        self.assertEqual(1, self.server.request_count)
+        self.assertEqual([project['uuid']] * 8, [result['uuid'] for result in results])
+        self.assertEqual(7, self.single_flight.shared)
+
+
+class IngestAPIBulkLookupTest(TestCase):
+    def setUp(self):
+        self.server = FakeIngestServer(latency=0.05)
+        self.url = self.server.start_in_thread()
+        self.ingest_api = IngestAPI(self.url, entity_cache=LruEntityCache(), schema_registry=SchemaRegistry(),
+                                    revalidation_store=MemoryRevalidationStore(), single_flight=SingleFlight())
+
+    def tearDown(self):
+        self.server.stop_thread()
+
+    def test_get_entities_by_uuid__returns_entities_in_order(self):
+        # given
+        for index in range(20):
+            self.server.add_entity('biomaterials', f'b{index}', f'uuid-b{index}')
+        self.server.add_entity('files', 'f1', 'uuid-f1')
+        entity_uuids = [('biomaterials', f'uuid-b{index}') for index in reversed(range(20))] + [('files', 'uuid-f1')]
+
+        # when
+        entities = self.ingest_api.get_entities_by_uuid(entity_uuids)
+
+        # then
+        self.assertEqual([uuid for _, uuid in entity_uuids], [entity['uuid']['uuid'] for entity in entities])
+        self.assertEqual(21, self.server.request_count)
+
+    def test_get_entities_by_uuid__cached_and_duplicate_entities_are_not_requested(self):
+        # given
+        self.server.add_entity('biomaterials', 'b1', 'uuid-b1')
+        self.server.add_entity('biomaterials', 'b2', 'uuid-b2')
+        self.ingest_api.get_biomaterial_by_uuid('uuid-b1')
+
+        # when
+        entities = self.ingest_api.get_entities_by_uuid([('biomaterials', 'uuid-b1'), ('biomaterials', 'uuid-b2'),
+                                                         ('biomaterials', 'uuid-b2')])
+
+        # then
+        self.assertEqual(['uuid-b1', 'uuid-b2', 'uuid-b2'], [entity['uuid']['uuid'] for entity in entities])
+        self.assertEqual(2, self.server.request_count)
+
+
+class IngestAPISchemaTest(TestCase):
+    def test_get_concrete_entity_type__server_error_is_not_retried(self):
+        # given
+        ingest_api = IngestAPI('http://localhost:8080', entity_cache=LruEntityCache(), schema_registry=SchemaRegistry(),
+                               revalidation_store=MemoryRevalidationStore(), single_flight=SingleFlight())
+        ingest_api.get_headers = MagicMock(return_value={})
+        schema_url = 'https://schema.humancellatlas.org/type/protocol/sequencing/10.1.0/sequencing_protocol'
+        response = MagicMock(raise_for_status=MagicMock(side_effect=HTTPError('503 Server Error')))
+        session = MagicMock(get=MagicMock(return_value=response))
+
+        # when
+        with patch('api.ingest.shared_session', return_value=session):
+            concrete_type = ingest_api.get_concrete_entity_type({'content': {'describedBy': schema_url}})
+
+        # then
+        self.assertEqual('sequencing_protocol', concrete_type)
+        session.get.assert_called_once_with(schema_url, headers={})
+        self.assertNotIn(schema_url, ingest_api.schema_registry)
+
+
+class IngestAPIPatchTest(TestCase):
+    def setUp(self):
+        self.server = FakeIngestServer()
+        self.url = self.server.start_in_thread()
+        # biosamples_v4 installs a process-wide requests cache on import, which would answer the reads after the patch
+        if 'requests_cache' in sys.modules:
+            cache_disabled = sys.modules['requests_cache'].disabled()
+            cache_disabled.__enter__()
+            self.addCleanup(cache_disabled.__exit__, None, None, None)
+        self.ingest_api = IngestAPI(self.url, entity_cache=LruEntityCache(), schema_registry=SchemaRegistry(),
+                                    revalidation_store=MemoryRevalidationStore(), single_flight=SingleFlight())
+
+    def tearDown(self):
+        self.server.stop_thread()
+
+    def test_patch_entity_by_id__entity_read_by_uuid_is_not_stale(self):
+        # given
+        self.server.add_entity('biomaterials', 'b1', 'uuid-b1', content={'name': 'before'})
+        self.ingest_api.get_biomaterial_by_uuid('uuid-b1')
+
+        # when
+        self.ingest_api.patch_entity_by_id('biomaterials', 'b1', {'content': {'name': 'after'}})
+
+        # then
+        self.assertEqual({'name': 'after'}, self.ingest_api.get_biomaterial_by_uuid('uuid-b1')['content'])
+
+    def test_patch__entity_read_by_uuid_is_not_stale(self):
+        # given
+        self.server.add_entity('biomaterials', 'b1', 'uuid-b1', content={'name': 'before'})
+        biomaterial = self.ingest_api.get_biomaterial_by_uuid('uuid-b1')
+
+        # when
+        self.ingest_api.patch(biomaterial['_links']['self']['href'], {'content': {'name': 'after'}})
+
+        # then
+        self.assertEqual({'name': 'after'}, self.ingest_api.get_biomaterial_by_uuid('uuid-b1')['content'])
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from aiohttp import ClientResponseError
+from urllib3.util import retry
+
+from api.ingest_async import AsyncIngestAPI
+from api.schema import SchemaRegistry
+from tests.unit.api.fake_ingest_server import FakeIngestServer
+from utils.cache import LruEntityCache
+
+
+class AsyncIngestAPITest(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = FakeIngestServer()
+        self.url = self.server.start_in_thread()
+        retry_policy = retry.Retry(total=100, status=2, read=10, status_forcelist=[500, 502, 503, 504],
+                                   backoff_factor=0)
+        self.ingest_api = AsyncIngestAPI(self.url, entity_cache=LruEntityCache(), schema_registry=SchemaRegistry(),
+                                         retry_policy=retry_policy)
+
+    def tearDown(self):
+        self.run_async(self.ingest_api.close())
+        self.server.stop_thread()
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_get_entity_by_uuid__is_cached(self):
+        # given
+        biomaterial = self.server.add_entity('biomaterials', 'b1', 'uuid-1')
+
+        # when
+        first = self.run_async(self.ingest_api.get_biomaterial_by_uuid('uuid-1'))
+        second = self.run_async(self.ingest_api.get_biomaterial_by_uuid('uuid-1'))
+
+        # then
+        self.assertEqual(biomaterial['uuid'], first['uuid'])
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.server.request_count)
+
+    def test_get_entities__fans_out(self):
+        # given
+        for index in range(50):
+            self.server.add_entity('processes', f'p{index}')
+        urls = [f'{self.url}/processes/p{index}' for index in range(50)]
+
+        # when
+        entities = self.run_async(self.ingest_api.get_entities(urls))
+
+        # then
+        self.assertEqual(urls, [entity['_links']['self']['href'] for entity in entities])
+
+    def test_get_related_entity__all_pages_in_order(self):
+        # given
+        for index in range(45):
+            self.server.add_entity('files', f'f{index}')
+        self.server.add_entity('processes', 'p1', relations={
+            'derivedFiles': [('files', f'f{index}') for index in range(45)]
+        })
+        process = self.server.get_entity('processes', 'p1')
+
+        # when
+        async def get_related():
+            return [file async for file in self.ingest_api.get_related_entity(process, 'derivedFiles', 'files')]
+        files = self.run_async(get_related())
+
+        # then
+        expected = [f'{self.url}/files/f{index}' for index in range(45)]
+        self.assertEqual(expected, [file['_links']['self']['href'] for file in files])
+
+    def test_get__retries_server_errors(self):
+        # given
+        self.server.add_entity('projects', 'p1')
+        self.server.fail_next(2, status=503)
+
+        # when
+        project = self.run_async(self.ingest_api.get(f'{self.url}/projects/p1'))
+
+        # then
+        self.assertEqual(f'{self.url}/projects/p1', project['_links']['self']['href'])
+        self.assertEqual(3, self.server.request_count)
+
+    def test_get__raises_when_retries_exhausted(self):
+        # given
+        self.server.add_entity('projects', 'p1')
+        self.server.fail_next(3, status=503)
+
+        # then
+        with self.assertRaises(ClientResponseError):
+            self.run_async(self.ingest_api.get(f'{self.url}/projects/p1'))
+
+    def test_patch_entity_by_id__refreshes_cache(self):
+        # given
+        self.server.add_entity('processes', 'p1', content={'process_core': {'process_id': 'old'}})
+        self.run_async(self.ingest_api.get_entity_by_id('processes', 'p1'))
+
+        # when
+        self.run_async(self.ingest_api.patch_entity_by_id('processes', 'p1', {
+            'content': {'process_core': {'process_id': 'new'}}
+        }))
+        process = self.run_async(self.ingest_api.get_entity_by_id('processes', 'p1'))
+
+        # then
+        self.assertEqual('new', process['content']['process_core']['process_id'])
+
+    @patch('config.PAGE_SIZE', 10)
+    def test_get_related_entity__pages_of_page_size(self):
+        # given
+        for index in range(45):
+            self.server.add_entity('files', f'f{index}')
+        self.server.add_entity('processes', 'p1', relations={
+            'derivedFiles': [('files', f'f{index}') for index in range(45)]
+        })
+        process = self.server.get_entity('processes', 'p1')
+
+        # when
+        async def get_related():
+            return [file async for file in self.ingest_api.get_related_entity(process, 'derivedFiles', 'files')]
+        files = self.run_async(get_related())
+
+        # then
+        self.assertEqual(45, len(files))
+        self.assertEqual(5, self.server.request_count)
+
+
+class AsyncIngestAPIConcurrencyTest(TestCase):
+    BIOMATERIALS = 100
+    LATENCY = 0.02
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = FakeIngestServer(latency=self.LATENCY)
+        self.url = self.server.start_in_thread()
+
+    def tearDown(self):
+        self.server.stop_thread()
+        self.loop.close()
+
+    def test_get_biomaterial_by_uuid__concurrent_lookups_overlap(self):
+        # given
+        uuids = [self.server.add_entity('biomaterials')['uuid']['uuid'] for _ in range(self.BIOMATERIALS)]
+
+        # when
+        async def get_all():
+            async with AsyncIngestAPI(self.url, entity_cache=LruEntityCache(),
+                                      schema_registry=SchemaRegistry()) as ingest_api:
+                return await asyncio.gather(*[ingest_api.get_biomaterial_by_uuid(uuid) for uuid in uuids])
+        started_at = time.perf_counter()
+        biomaterials = self.loop.run_until_complete(get_all())
+        elapsed = time.perf_counter() - started_at
+
+        # then
+        self.assertEqual(uuids, [biomaterial['uuid']['uuid'] for biomaterial in biomaterials])
+        # one by one the lookups take BIOMATERIALS * LATENCY
+        self.assertLess(elapsed, self.BIOMATERIALS * self.LATENCY / 2)
@@ -0,0 +1,87 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+from urllib.parse import urlparse, parse_qs
+
+from api.pagination import HalPaginator
+
+BASE_URL = 'https://ingest/submissionEnvelopes/1/files'
+
+
+def make_page(number, total_pages, page_size=2):
+    page = {
+        '_embedded': {
+            'files': [{'index': number * page_size + i} for i in range(page_size)]
+        },
+        '_links': {},
+        'page': {
+            'size': page_size,
+            'number': number,
+            'totalPages': total_pages
+        }
+    }
+    if number + 1 < total_pages:
+        page['_links']['next'] = {'href': f'{BASE_URL}?page={number + 1}&size={page_size}'}
+    return page
+
+
+class FakeSession:
+    def __init__(self, total_pages, with_page_info=True):
+        self.total_pages = total_pages
+        self.with_page_info = with_page_info
+        self.requested_urls = []
+
+    def get(self, url, headers=None):
+        self.requested_urls.append(url)
+        query = parse_qs(urlparse(url).query)
+        number = int(query.get('page', ['0'])[0])
+        page = make_page(number, self.total_pages)
+        if not self.with_page_info:
+            del page['page']
+        response = MagicMock()
+        response.json = MagicMock(return_value=page)
+        return response
+
+
+class HalPaginatorTest(TestCase):
+    def test_get_all__concurrent_pages_are_yielded_in_order(self):
+        # given
+        session = FakeSession(total_pages=10)
+        paginator = HalPaginator(session, lambda: {}, max_workers=3)
+
+        # when
+        entities = list(paginator.get_all(BASE_URL, 'files'))
+
+        # then
+        self.assertEqual(list(range(20)), [entity['index'] for entity in entities])
+        self.assertEqual(10, len(session.requested_urls))
+
+    def test_get_all__follows_next_links_without_page_info(self):
+        # given
+        session = FakeSession(total_pages=3, with_page_info=False)
+        paginator = HalPaginator(session, lambda: {}, max_workers=3)
+
+        # when
+        entities = list(paginator.get_all(BASE_URL, 'files'))
+
+        # then
+        self.assertEqual(list(range(6)), [entity['index'] for entity in entities])
+
+    def test_get_all__requests_page_size(self):
+        # given
+        session = FakeSession(total_pages=1)
+        paginator = HalPaginator(session, lambda: {}, page_size=500, max_workers=1)
+
+        # when
+        list(paginator.get_all(f'{BASE_URL}?sort=created', 'files'))
+
+        # then
+        self.assertEqual(f'{BASE_URL}?sort=created&size=500', session.requested_urls[0])
+
+    def test_get_all__no_embedded_entities(self):
+        # given
+        session = MagicMock()
+        session.get.return_value.json.return_value = {'_links': {}}
+        paginator = HalPaginator(session, lambda: {})
+
+        # then
+        self.assertEqual([], list(paginator.get_all(BASE_URL, 'files')))
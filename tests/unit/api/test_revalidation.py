@@ -0,0 +1,186 @@
+import os
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+from mock import patch
+
+import requests
+from urllib3.util import retry
+
+from api.ingest import IngestAPI
+from api.revalidation import DiskRevalidationStore, MemoryRevalidationStore, RevalidatingHTTPAdapter, \
+    StoredResponse, enable_revalidation
+from api.schema import SchemaRegistry
+from tests.unit.api.fake_ingest_server import FakeIngestServer
+from utils.cache import LruEntityCache
+
+
+class RevalidationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeIngestServer()
+        cls.url = cls.server.start_in_thread()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop_thread()
+
+    def setUp(self):
+        self.server.not_modified_count = 0
+        # biosamples_v4 installs a process-wide requests cache on import, which would answer before the server does
+        if 'requests_cache' in sys.modules:
+            cache_disabled = sys.modules['requests_cache'].disabled()
+            cache_disabled.__enter__()
+            self.addCleanup(cache_disabled.__exit__, None, None, None)
+
+    def create_ingest_api(self, store):
+        ingest_api = IngestAPI(self.url, entity_cache=LruEntityCache(), schema_registry=SchemaRegistry(),
+                               revalidation_store=store)
+        ingest_api.cache_enabled = False
+        return ingest_api
+
+    def test_get_entity__unchanged_entity_is_revalidated(self):
+        # given
+        self.server.add_entity('biomaterials', 'b1', 'uuid-1', content={'name': 'b1'})
+        ingest_api = self.create_ingest_api(MemoryRevalidationStore())
+
+        # when
+        first = ingest_api.get_biomaterial_by_uuid('uuid-1')
+        second = ingest_api.get_biomaterial_by_uuid('uuid-1')
+
+        # then
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.server.not_modified_count)
+        self.assertEqual(1, ingest_api.get_revalidation_stats()['hits'])
+        self.assertEqual(1, ingest_api.get_revalidation_stats()['misses'])
+
+    def test_get_entity__revalidated_entities_reuse_one_connection(self):
+        # given
+        self.server.add_entity('biomaterials', 'b4', 'uuid-4', content={'name': 'b4'})
+        ingest_api = self.create_ingest_api(MemoryRevalidationStore())
+        ingest_api.get_biomaterial_by_uuid('uuid-4')
+        connection_count = self.server.connection_count
+
+        # when
+        for _ in range(10):
+            ingest_api.get_biomaterial_by_uuid('uuid-4')
+
+        # then
+        self.assertEqual(10, ingest_api.get_revalidation_stats()['hits'])
+        self.assertEqual(connection_count, self.server.connection_count)
+
+    def test_get_entity__changed_entity_is_downloaded(self):
+        # given
+        self.server.add_entity('biomaterials', 'b2', 'uuid-2', content={'name': 'before'})
+        ingest_api = self.create_ingest_api(MemoryRevalidationStore())
+        ingest_api.get_entity_by_id('biomaterials', 'b2')
+
+        # when
+        self.server.entities['biomaterials']['b2']['content'] = {'name': 'after'}
+        entity = ingest_api.get_entity_by_id('biomaterials', 'b2')
+
+        # then
+        self.assertEqual({'name': 'after'}, entity['content'])
+        self.assertEqual(0, self.server.not_modified_count)
+
+    def test_patch_entity__invalidates_stored_response(self):
+        # given
+        self.server.add_entity('biomaterials', 'b3', 'uuid-3')
+        store = MemoryRevalidationStore()
+        ingest_api = self.create_ingest_api(store)
+        ingest_api.get_entity_by_id('biomaterials', 'b3')
+
+        # when
+        ingest_api.patch_entity_by_id('biomaterials', 'b3', {'content': {'name': 'patched'}})
+
+        # then
+        self.assertIsNone(store.get(f'{self.url}/biomaterials/b3'))
+
+    def test_disk_store__survives_between_clients(self):
+        # given
+        self.server.add_entity('projects', 'p1', 'uuid-p1', content={'title': 'project'})
+        with tempfile.TemporaryDirectory() as directory:
+            self.create_ingest_api(DiskRevalidationStore(directory)).get_project_by_uuid('uuid-p1')
+
+            # when
+            project = self.create_ingest_api(DiskRevalidationStore(directory)).get_project_by_uuid('uuid-p1')
+
+        # then
+        self.assertEqual({'title': 'project'}, project['content'])
+        self.assertEqual(1, self.server.not_modified_count)
+
+    def test_enable_revalidation__keeps_session_retries(self):
+        # given
+        session = requests.Session()
+        retry_policy = retry.Retry(total=5)
+        session.mount('https://', requests.adapters.HTTPAdapter(max_retries=retry_policy))
+
+        # when
+        store = enable_revalidation(session, MemoryRevalidationStore())
+
+        # then
+        adapter = session.get_adapter('https://api.ingest.archive.data.humancellatlas.org')
+        self.assertIsInstance(adapter, RevalidatingHTTPAdapter)
+        self.assertIs(store, adapter.store)
+        self.assertIs(retry_policy, adapter.max_retries)
+
+
+class DiskRevalidationStoreTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    @staticmethod
+    def stored(url: str) -> StoredResponse:
+        return StoredResponse(url, '"etag"', None, 'application/json', b'{}')
+
+    def test_put__removes_the_oldest_responses_over_max_entries(self):
+        # given
+        store = DiskRevalidationStore(self.directory, max_entries=10)
+        for index in range(10):
+            store.put(self.stored(f'https://ingest/{index}'))
+            os.utime(store._DiskRevalidationStore__path(f'https://ingest/{index}'), (index, index))
+
+        # when
+        store.put(self.stored('https://ingest/new'))
+
+        # then
+        self.assertEqual(9, len(store))
+        self.assertIsNone(store.get('https://ingest/0'))
+        self.assertIsNone(store.get('https://ingest/1'))
+        self.assertIsNotNone(store.get('https://ingest/2'))
+        self.assertIsNotNone(store.get('https://ingest/new'))
+        self.assertEqual(2, store.stats.evictions)
+
+    def test_get__does_not_use_responses_older_than_max_age(self):
+        # given
+        store = DiskRevalidationStore(self.directory, max_age=60)
+        store.put(self.stored('https://ingest/old'))
+        store.put(self.stored('https://ingest/recent'))
+        an_hour_ago = time.time() - 60 * 60
+        os.utime(store._DiskRevalidationStore__path('https://ingest/old'), (an_hour_ago, an_hour_ago))
+
+        # when
+        old = store.get('https://ingest/old')
+
+        # then
+        self.assertIsNone(old)
+        self.assertIsNotNone(store.get('https://ingest/recent'))
+        self.assertEqual(1, len(store))
+
+
+class SharedRevalidationStoreTest(TestCase):
+    @patch('api.revalidation._shared_store', None)
+    @patch('config.REVALIDATION_CACHE_DIR', None)
+    @patch('config.REVALIDATION_CACHE_ENABLED', True)
+    def test_enable_revalidation__sessions_share_one_store(self):
+        # when
+        first = enable_revalidation(requests.Session())
+        second = enable_revalidation(requests.Session())
+
+        # then
+        self.assertIsInstance(first, MemoryRevalidationStore)
+        self.assertIs(first, second)
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from requests import ConnectionError
+
+from api.schema import SchemaRegistry
+
+SEQUENCING_PROTOCOL_URL = 'https://schema.humancellatlas.org/type/protocol/sequencing/10.1.0/sequencing_protocol'
+
+
+class SchemaRegistryTest(TestCase):
+    def setUp(self):
+        self.registry = SchemaRegistry()
+
+    def test_get_schema_name__fetches_schema_once(self):
+        # given
+        fetch_schema = MagicMock(return_value={'name': 'sequencing_protocol'})
+
+        # when
+        first = self.registry.get_schema_name(SEQUENCING_PROTOCOL_URL, fetch_schema)
+        second = self.registry.get_schema_name(SEQUENCING_PROTOCOL_URL, fetch_schema)
+
+        # then
+        self.assertEqual('sequencing_protocol', first)
+        self.assertEqual('sequencing_protocol', second)
+        fetch_schema.assert_called_once_with(SEQUENCING_PROTOCOL_URL)
+
+    def test_get_schema_name__offline_uses_url(self):
+        # given
+        fetch_schema = MagicMock(side_effect=ConnectionError('offline'))
+
+        # when
+        name = self.registry.get_schema_name(SEQUENCING_PROTOCOL_URL, fetch_schema)
+
+        # then
+        self.assertEqual('sequencing_protocol', name)
+        self.assertNotIn(SEQUENCING_PROTOCOL_URL, self.registry)
+
+    def test_get_schema_name__fetches_again_after_failure(self):
+        # given
+        fetch_schema = MagicMock(side_effect=[ConnectionError('offline'), {'name': 'sequencing_protocol'}])
+
+        # when
+        self.registry.get_schema_name(SEQUENCING_PROTOCOL_URL, fetch_schema)
+        self.registry.get_schema_name(SEQUENCING_PROTOCOL_URL, fetch_schema)
+
+        # then
+        self.assertEqual(2, fetch_schema.call_count)
+        self.assertIn(SEQUENCING_PROTOCOL_URL, self.registry)
+
+    def test_load_dir(self):
+        # given
+        schema = {
+            '$id': SEQUENCING_PROTOCOL_URL,
+            'name': 'sequencing_protocol'
+        }
+        with tempfile.TemporaryDirectory() as schema_dir:
+            with open(os.path.join(schema_dir, 'sequencing_protocol.json'), 'w') as schema_file:
+                json.dump(schema, schema_file)
+
+            # when
+            self.registry.load_dir(schema_dir)
+
+        # then
+        fetch_schema = MagicMock()
+        self.assertEqual('sequencing_protocol', self.registry.get_schema_name(SEQUENCING_PROTOCOL_URL, fetch_schema))
+        fetch_schema.assert_not_called()
@@ -0,0 +1,61 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util import retry
+
+from api import session as session_module
+from api.session import TimeoutHTTPAdapter, create_session, create_retry_policy, shared_session
+
+
+class TestCreateSession(TestCase):
+    def test_http_and_https_share_retry_policy_and_timeout(self):
+        retry_policy = create_retry_policy()
+        session = create_session(retry_policy=retry_policy, pool_maxsize_by_host={}, timeout=(1, 2))
+
+        https_adapter = session.get_adapter('https://api.ingest.data.humancellatlas.org/')
+        http_adapter = session.get_adapter('http://localhost:8080/')
+
+        self.assertIs(https_adapter, http_adapter)
+        self.assertIsInstance(https_adapter, TimeoutHTTPAdapter)
+        self.assertIs(https_adapter.max_retries, retry_policy)
+        self.assertEqual(https_adapter.timeout, (1, 2))
+
+    def test_host_gets_own_pool(self):
+        session = create_session(pool_maxsize=5, pool_maxsize_by_host={
+            'https://www.ebi.ac.uk': 50,
+            'ontology.archive.data.humancellatlas.org': 30
+        })
+
+        self.assertEqual(session.get_adapter('https://www.ebi.ac.uk/ena/submit/drop-box/submit/')._pool_maxsize, 50)
+        self.assertEqual(session.get_adapter('http://ontology.archive.data.humancellatlas.org/api')._pool_maxsize, 30)
+        self.assertEqual(session.get_adapter('https://submission.ebi.ac.uk/api')._pool_maxsize, 5)
+
+    def test_adapter_applies_default_timeout(self):
+        adapter = TimeoutHTTPAdapter(timeout=(3, 4))
+        with patch('requests.adapters.HTTPAdapter.send') as send:
+            adapter.send(MagicMock())
+            adapter.send(MagicMock(), timeout=1)
+
+        self.assertEqual(send.call_args_list[0][1]['timeout'], (3, 4))
+        self.assertEqual(send.call_args_list[1][1]['timeout'], 1)
+
+    def test_shared_session_is_reused(self):
+        with patch.object(session_module, '_shared_session', None):
+            first = shared_session()
+            second = shared_session()
+
+        self.assertIs(first, second)
+        self.assertIsInstance(first.get_adapter('https://www.ebi.ac.uk').max_retries, retry.Retry)
+
+    def test_shared_session_only_retries_connections(self):
+        with patch.object(session_module, '_shared_session', None), \
+                patch('config.HTTP_SHARED_CONNECT_RETRIES', 2):
+            retry_policy = shared_session().get_adapter('https://www.ebi.ac.uk').max_retries
+
+        self.assertEqual((2, 2), (retry_policy.total, retry_policy.connect))
+        self.assertFalse(retry_policy.is_retry('GET', 503))
+        self.assertFalse(retry_policy.is_retry('POST', 500))
+        read_error = ReadTimeoutError(None, 'https://www.ebi.ac.uk', 'Read timed out.')
+        with self.assertRaises(ReadTimeoutError):
+            retry_policy.increment('GET', 'https://www.ebi.ac.uk', error=read_error)
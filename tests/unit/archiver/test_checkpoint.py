@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from archiver.checkpoint import ConversionCheckpoint
+from archiver.submission import ArchiveEntity, Error
+
+
+class ConversionCheckpointTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.checkpoint = ConversionCheckpoint(os.path.join(self.directory.name, 'submission_uuid'))
+
+    @staticmethod
+    def create_entity():
+        entity = ArchiveEntity()
+        entity.id = 'sequencingRun_1'
+        entity.archive_entity_type = 'sequencingRun'
+        entity.manifest_id = 'manifest/1'
+        entity.data = {'files': [{'cloudUrl': 's3://bucket/file.fastq.gz'}]}
+        entity.conversion = {'alias': 'sequencingRun_1'}
+        entity.metadata_uuids = ['process_uuid', 'file_uuid']
+        entity.accessioned_metadata_uuids = ['file_uuid']
+        entity.add_error('code', 'message', {'detail': 'value'})
+        return entity
+
+    def test_save_and_load(self):
+        entity = self.create_entity()
+        self.assertFalse(self.checkpoint.is_done('manifest/1'))
+
+        self.checkpoint.save('manifest/1', [entity])
+        loaded = self.checkpoint.load('manifest/1')
+
+        self.assertTrue(self.checkpoint.is_done('manifest/1'))
+        self.assertEqual([entity.to_dict()], [loaded_entity.to_dict() for loaded_entity in loaded])
+        self.assertIsInstance(loaded[0].errors[0], Error)
+
+    def test_load_with_other_parameters(self):
+        self.checkpoint.save('manifest/1', [self.create_entity()], {'alias_prefix': '', 'manifest_update_date': '1'})
+
+        self.assertIsNone(self.checkpoint.load('manifest/1', {'alias_prefix': 'prefix_', 'manifest_update_date': '1'}))
+        self.assertIsNone(self.checkpoint.load('manifest/1', {'alias_prefix': '', 'manifest_update_date': '2'}))
+        self.assertIsNotNone(self.checkpoint.load('manifest/1', {'alias_prefix': '', 'manifest_update_date': '1'}))
+
+    def test_file_has_report_layout(self):
+        entity = self.create_entity()
+
+        self.checkpoint.save('manifest/1', [entity])
+
+        with open(os.path.join(self.checkpoint.directory, 'manifest_1.json')) as checkpoint_file:
+            report_entity = json.load(checkpoint_file)['entities']['sequencingRun_1']
+        self.assertEqual(entity.to_report(), {key: report_entity[key] for key in entity.to_report()})
+
+    def test_clear(self):
+        self.checkpoint.clear()
+        self.checkpoint.save('manifest/1', [self.create_entity()])
+
+        self.checkpoint.clear()
+
+        self.assertFalse(self.checkpoint.is_done('manifest/1'))
+        self.assertIsNone(self.checkpoint.load('manifest/1'))
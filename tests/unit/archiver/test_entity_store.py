@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from archiver.entity_store import MemoryEntityStore, SpillingEntityStore
+from archiver.submission import ArchiveEntity, ArchiveEntityMap
+
+
+def create_entity(entity_type, alias, conversion=None):
+    entity = ArchiveEntity()
+    entity.archive_entity_type = entity_type
+    entity.id = alias
+    entity.data = {'content': {'name': alias}}
+    entity.conversion = conversion if conversion is not None else {'alias': alias}
+    return entity
+
+
+class SpillingEntityStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = SpillingEntityStore(ArchiveEntity.to_dict, ArchiveEntity.from_dict, max_entities=2,
+                                         directory=self.directory.name)
+        self.addCleanup(self.store.close)
+
+    def test_entities_over_budget_are_moved_to_disk(self):
+        # when
+        for index in range(5):
+            self.store.put(('sample', f's{index}'), create_entity('sample', f's{index}'))
+
+        # then
+        self.assertEqual(3, self.store.spilled)
+        self.assertEqual(1, len(os.listdir(self.directory.name)))
+        entity = self.store.get(('sample', 's0'))
+        self.assertEqual({'content': {'name': 's0'}}, entity.data)
+        self.assertIsNone(self.store.get(('sample', 'unknown')))
+
+    def test_changes_to_entities_in_use_are_kept(self):
+        # given
+        entity = create_entity('sample', 's0')
+        self.store.put(('sample', 's0'), entity)
+        for index in range(1, 4):
+            self.store.put(('sample', f's{index}'), create_entity('sample', f's{index}'))
+
+        # when
+        entity.accession = 'SAMEA1'
+        entity.add_error('code', 'message', {'detail': 1})
+
+        # then
+        self.assertIs(entity, self.store.get(('sample', 's0')))
+        del entity
+        for index in range(1, 4):
+            self.store.get(('sample', f's{index}'))
+        reloaded = self.store.get(('sample', 's0'))
+        self.assertEqual('SAMEA1', reloaded.accession)
+        self.assertEqual('code', reloaded.errors[0].error_code)
+
+    def test_changes_to_entities_put_again_are_kept(self):
+        # given
+        entity = create_entity('sample', 's0')
+        self.store.put(('sample', 's0'), entity)
+        for index in range(1, 4):
+            self.store.put(('sample', f's{index}'), create_entity('sample', f's{index}'))
+
+        # when
+        entity.accession = 'SAMEA1'
+        self.store.put(('sample', 's0'), entity)
+        del entity
+        for index in range(1, 4):
+            self.store.get(('sample', f's{index}'))
+
+        # then
+        self.assertEqual('SAMEA1', self.store.get(('sample', 's0')).accession)
+
+    def test_close_removes_file(self):
+        for index in range(3):
+            self.store.put(('sample', f's{index}'), create_entity('sample', f's{index}'))
+
+        self.store.close()
+
+        self.assertEqual([], os.listdir(self.directory.name))
+
+
+class ArchiveEntityMapTest(TestCase):
+    def create_map(self, store):
+        entity_map = ArchiveEntityMap(store)
+        entity_map.add_entities([
+            create_entity('project', 'project_1'),
+            create_entity('sample', 'sample_1'),
+            create_entity('sample', 'sample_2', conversion={}),
+            create_entity('sequencingRun', 'run_1'),
+        ])
+        entity_map.find_entity('run_1').dsp_json = {'_links': {'self': {'href': 'dsp/run_1'}}}
+        return entity_map
+
+    def test_spilled_map_matches_memory_map(self):
+        # given
+        memory_map = self.create_map(MemoryEntityStore())
+        with tempfile.TemporaryDirectory() as directory:
+            store = SpillingEntityStore(ArchiveEntity.to_dict, ArchiveEntity.from_dict, max_entities=1,
+                                        directory=directory)
+            spilled_map = self.create_map(store)
+
+            # then
+            self.assertEqual(memory_map.generate_report(), spilled_map.generate_report())
+            self.assertEqual(['project_1', 'sample_1', 'sample_2', 'run_1'],
+                             [entity.id for entity in spilled_map.iter_entities()])
+            self.assertEqual('sample_2', spilled_map.find_entity('sample_2').id)
+            self.assertIsNone(spilled_map.get_entity('project', 'sample_1'))
+            store.close()
+
+    def test_write_report_matches_generate_report(self):
+        entity_map = self.create_map(MemoryEntityStore())
+        report_file = io.StringIO()
+
+        entity_map.write_report(report_file)
+
+        self.assertEqual(json.dumps(entity_map.generate_report(), indent=4), report_file.getvalue())
+
+    def test_write_report_of_empty_map(self):
+        entity_map = ArchiveEntityMap(MemoryEntityStore())
+        report_file = io.StringIO()
+
+        entity_map.write_report(report_file)
+
+        self.assertEqual(json.dumps(entity_map.generate_report(), indent=4), report_file.getvalue())
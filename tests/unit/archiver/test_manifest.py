@@ -1,8 +1,9 @@
 from unittest import TestCase
 
-from mock import MagicMock
+from mock import MagicMock, patch
 
-from archiver.archiver import Manifest, Biomaterial, ArchiverException
+from archiver.archiver import Manifest, Biomaterial, ArchiverException, ConversionContext, BiomaterialGraph
+from utils.cache import LruEntityCache
 
 
 class ManifestTest(TestCase):
@@ -24,10 +25,12 @@ class ManifestTest(TestCase):
     def test_get_biomaterials(self):
         ingest_api_mock = MagicMock(name='ingest_api')
         ingest_api_mock.get_manifest_by_id = MagicMock(return_value={'fileBiomaterialMap': ['b1']})
+        ingest_api_mock.get_entities_by_uuid = MagicMock(return_value=[{'uuid': {'uuid': 'b1'}, '_links': {}}])
         manifest = Manifest(ingest_api_mock, 'manifest_id')
-        biomaterials = manifest.get_biomaterials()
-        Biomaterial.from_uuid = MagicMock(return_value='biomaterial')
-        self.assertEqual(list(biomaterials), ['biomaterial'])
+        biomaterials = list(manifest.get_biomaterials())
+        self.assertEqual(['b1'], [biomaterial.data['uuid']['uuid'] for biomaterial in biomaterials])
+        ingest_api_mock.get_entities_by_uuid.assert_called_once_with([('biomaterials', 'b1')])
+        ingest_api_mock.get_related_entity.assert_not_called()
 
     def test_get_assay_process(self):
         ingest_api_mock = MagicMock(name='ingest_api')
@@ -37,7 +40,6 @@ class ManifestTest(TestCase):
             'derivedByProcesses': iter(['p1'])
         }
         ingest_api_mock.get_related_entity = lambda f, relationship, t: related_entity_map.get(relationship)
-        ingest_api_mock.get_related_entity_count = MagicMock(return_value=1)
         manifest = Manifest(ingest_api_mock, 'manifest_id')
         assay_process = manifest.get_assay_process()
         self.assertEqual(assay_process, 'p1')
@@ -50,7 +52,6 @@ class ManifestTest(TestCase):
             'derivedByProcesses': iter(['p1', 'p2'])
         }
         ingest_api_mock.get_related_entity = lambda f, relationship, t: related_entity_map.get(relationship)
-        ingest_api_mock.get_related_entity_count = MagicMock(return_value=2)
         manifest = Manifest(ingest_api_mock, 'manifest_id')
 
         with self.assertRaises(ArchiverException):
@@ -154,3 +155,101 @@ class ManifestTest(TestCase):
         biomaterial = manifest.get_input_biomaterial()
 
         self.assertEqual(biomaterial, 'b1')
+
+
+class ManifestConversionContextTest(TestCase):
+    def test_get_biomaterials_reuses_biomaterials_of_other_manifests(self):
+        ingest_api_mock = MagicMock(name='ingest_api')
+        ingest_api_mock.get_manifest_by_id = MagicMock(side_effect=[
+            {'fileBiomaterialMap': {'donor': [], 'specimen_1': []}},
+            {'fileBiomaterialMap': {'donor': [], 'specimen_2': []}}
+        ])
+        ingest_api_mock.get_entities_by_uuid = MagicMock(
+            side_effect=lambda entity_uuids: [{'uuid': {'uuid': uuid}} for _, uuid in entity_uuids])
+        context = ConversionContext()
+
+        first = list(Manifest(ingest_api_mock, 'manifest_1', context).get_biomaterials())
+        second = list(Manifest(ingest_api_mock, 'manifest_2', context).get_biomaterials())
+
+        self.assertIs(first[0], second[0])
+        self.assertEqual('specimen_2', second[1].data['uuid']['uuid'])
+        ingest_api_mock.get_entities_by_uuid.assert_called_with([('biomaterials', 'specimen_2')])
+
+    def test_get_biomaterials_fetches_again_the_biomaterials_dropped_by_the_context(self):
+        ingest_api_mock = MagicMock(name='ingest_api')
+        ingest_api_mock.get_manifest_by_id = MagicMock(side_effect=[
+            {'fileBiomaterialMap': {'donor': [], 'specimen_1': []}},
+            {'fileBiomaterialMap': {'donor': [], 'specimen_2': []}}
+        ])
+        ingest_api_mock.get_entities_by_uuid = MagicMock(
+            side_effect=lambda entity_uuids: [{'uuid': {'uuid': uuid}} for _, uuid in entity_uuids])
+        with patch('config.CONVERSION_CONTEXT_MAX_ENTRIES', 1):
+            context = ConversionContext()
+
+        list(Manifest(ingest_api_mock, 'manifest_1', context).get_biomaterials())
+        second = list(Manifest(ingest_api_mock, 'manifest_2', context).get_biomaterials())
+
+        self.assertEqual(['donor', 'specimen_2'], [biomaterial.data['uuid']['uuid'] for biomaterial in second])
+        ingest_api_mock.get_entities_by_uuid.assert_called_with([('biomaterials', 'donor'),
+                                                                 ('biomaterials', 'specimen_2')])
+        self.assertEqual(1, len(context.biomaterials))
+
+
+class BiomaterialGraphTest(TestCase):
+    @staticmethod
+    def entity(name, *relations):
+        links = {'self': {'href': f'{name}/self'}}
+        links.update({relation: {'href': f'{name}/{relation}'} for relation in relations})
+        return {'name': name, '_links': links}
+
+    def setUp(self):
+        dissociation = self.entity('dissociation', 'protocols', 'inputBiomaterials')
+        self.related = {
+            'specimen_1/derivedByProcesses': [dissociation],
+            'specimen_2/derivedByProcesses': [dissociation],
+            'dissociation/protocols': [self.entity('collection_protocol'), self.entity('dissociation_protocol')],
+            'dissociation/inputBiomaterials': [self.entity('donor')],
+        }
+        self.ingest_api = MagicMock(name='ingest_api')
+        self.ingest_api.get_related_entity = MagicMock(
+            side_effect=lambda entity, relation, entity_type: iter(self.related[entity['_links'][relation]['href']]))
+        self.ingest_api.get_concrete_entity_type = MagicMock(side_effect=lambda protocol: protocol['name'])
+
+    def test_get_biomaterials__fetches_shared_process_once(self):
+        specimens = [self.entity('specimen_1', 'derivedByProcesses'), self.entity('specimen_2', 'derivedByProcesses')]
+
+        biomaterials = BiomaterialGraph(self.ingest_api).get_biomaterials(specimens)
+
+        self.assertEqual(['donor'], [donor['name'] for donor in biomaterials[0].derived_from_biomaterials])
+        self.assertEqual(biomaterials[0].derived_with_protocols, biomaterials[1].derived_with_protocols)
+        self.assertEqual(['collection_protocol', 'dissociation_protocol'],
+                         sorted(biomaterials[1].derived_with_protocols))
+        self.assertEqual('dissociation', biomaterials[1].derived_by_process['name'])
+        self.assertEqual(4, self.ingest_api.get_related_entity.call_count)
+        self.assertEqual(2, self.ingest_api.get_concrete_entity_type.call_count)
+        self.ingest_api.get_related_entity_count.assert_not_called()
+
+    def test_get_biomaterials__not_derived(self):
+        donor = self.entity('donor', 'derivedByProcesses')
+        self.related['donor/derivedByProcesses'] = []
+
+        biomaterial = Biomaterial.from_entity(self.ingest_api, donor)
+
+        self.assertIs(donor, biomaterial.data)
+        self.assertIsNone(biomaterial.derived_by_process)
+
+    def test_get_biomaterials__process_without_input_error(self):
+        self.related['dissociation/inputBiomaterials'] = []
+
+        with self.assertRaises(ArchiverException):
+            BiomaterialGraph(self.ingest_api).get_biomaterials([self.entity('specimen_1', 'derivedByProcesses')])
+
+    def test_related_entities_are_shared(self):
+        related_entities = LruEntityCache()
+        BiomaterialGraph(self.ingest_api, related_entities).get_biomaterials(
+            [self.entity('specimen_1', 'derivedByProcesses')])
+
+        BiomaterialGraph(self.ingest_api, related_entities).get_biomaterials(
+            [self.entity('specimen_2', 'derivedByProcesses')])
+
+        self.assertEqual(4, self.ingest_api.get_related_entity.call_count)
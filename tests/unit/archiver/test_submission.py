@@ -0,0 +1,268 @@
+from unittest import TestCase
+
+from mock import MagicMock
+
+from archiver.submission import ArchiveEntity, ArchiveEntityMap, ArchiveSubmission, Error
+from utils.poller import Poller
+
+
+class ArchiveSubmissionPollingTest(TestCase):
+    def setUp(self):
+        self.dsp_api = MagicMock(name='dsp_api')
+        self.sleeps = []
+        poller = Poller(step=1, max_step=8, backoff=2, jitter=0, sleep=self.sleeps.append)
+        self.archive_submission = ArchiveSubmission(self.dsp_api, validation_poller=poller, submission_poller=poller)
+        self.archive_submission.submission = {
+            '_links': {
+                'validationResults': {'href': 'validationResults'},
+                'submissionStatus': {'href': 'submissionStatus'}
+            }
+        }
+
+    @staticmethod
+    def validation_results(*statuses):
+        return [{
+            'validationStatus': status,
+            '_links': {'validationResult': {'href': f'validationResult/{index}'}}
+        } for index, status in enumerate(statuses)]
+
+    def test_validate__backs_off_until_progress(self):
+        self.dsp_api.get_validation_results.side_effect = [
+            self.validation_results('Pending', 'Pending'),
+            self.validation_results('Pending', 'Pending'),
+            self.validation_results('Complete', 'Pending'),
+            self.validation_results('Complete', 'Complete'),
+            self.validation_results('Complete', 'Complete')
+        ]
+        self.dsp_api.get_validation_result_details.return_value = {}
+
+        self.archive_submission.validate()
+
+        self.assertEqual([1, 2, 1], self.sleeps)
+        self.assertEqual([], self.archive_submission.errors)
+
+    def test_validate_and_submit__stops_when_validated_with_errors(self):
+        self.dsp_api.get_validation_results.return_value = self.validation_results('Complete')
+        self.dsp_api.get_validation_result_details.return_value = {'errorMessages': ['invalid']}
+        self.dsp_api.get_available_statuses.return_value = []
+
+        self.archive_submission.validate_and_submit()
+
+        self.assertEqual([], self.sleeps)
+        self.assertTrue(self.archive_submission.invalid)
+        self.assertEqual('archive_submission.validate_and_submit.dsp_validation_errors',
+                         self.archive_submission.errors[0].error_code)
+        self.dsp_api.update_submission_status.assert_not_called()
+
+
+class ValidationSnapshotTest(TestCase):
+    def setUp(self):
+        self.dsp_api = MagicMock(name='dsp_api')
+        self.dsp_api.get_validation_results.return_value = [
+            {'validationStatus': 'Complete', '_links': {'validationResult': {'href': 'validationResult/1{?projection}'}}},
+            {'validationStatus': 'Complete', '_links': {'validationResult': {'href': 'validationResult/2'}}},
+            {'validationStatus': 'Pending', '_links': {'validationResult': {'href': 'validationResult/3'}}},
+            {'validationStatus': 'Pending', '_links': {'validationResult': {'href': 'validationResult/4'}}}
+        ]
+        details = {
+            'validationResult/1': {'errorMessages': ['invalid'], '_links': {'submittable': {'href': 'sample/1'}}},
+            'validationResult/2': {},
+            'validationResult/3': {'expectedResults': {'ENA': []}},
+            'validationResult/4': {}
+        }
+        self.dsp_api.get_validation_result_details.side_effect = lambda url: details[url]
+        self.archive_submission = ArchiveSubmission(self.dsp_api)
+        self.archive_submission.submission = {'_links': {'validationResults': {'href': 'validationResults'}}}
+
+    def test_views_share_one_read(self):
+        self.assertFalse(self.archive_submission.is_validated())
+        errors = self.archive_submission.get_all_validation_errors()
+        result_details = self.archive_submission.get_all_validation_result_details()
+        report = self.archive_submission.get_validation_error_report()
+
+        self.assertEqual([['invalid']], errors)
+        self.assertEqual(2, len(result_details))
+        self.assertEqual({'sample/1': [['invalid']]}, report['errors'])
+        self.assertEqual([{'expectedResults': {'ENA': []}}], report['pending'])
+        self.assertEqual(2, self.archive_submission.validation_progress)
+        self.assertEqual(1, self.dsp_api.get_validation_results.call_count)
+        self.assertEqual(4, self.dsp_api.get_validation_result_details.call_count)
+
+    def test_is_validated_reads_again(self):
+        self.archive_submission.is_validated()
+        self.archive_submission.get_all_validation_errors()
+        self.archive_submission.is_validated()
+        self.archive_submission.get_all_validation_errors()
+
+        self.assertEqual(2, self.dsp_api.get_validation_results.call_count)
+        self.assertEqual(8, self.dsp_api.get_validation_result_details.call_count)
+
+
+class ArchiveSubmissionAddEntitiesTest(TestCase):
+    def setUp(self):
+        self.dsp_api = MagicMock(name='dsp_api')
+        self.dsp_api.get_contents.return_value = {'_links': {'samples:create': {'href': 'samples/create'}}}
+        self.dsp_api.get_entity_url.return_value = 'samples'
+        self.created = []
+
+        def create_entity(url, content):
+            self.created.append(content['alias'])
+            return {'_links': {'self': {'href': f'samples/{content["alias"]}'}}}
+
+        self.dsp_api.create_entity.side_effect = create_entity
+        self.archive_submission = ArchiveSubmission(self.dsp_api)
+        self.archive_submission.submission = {'_links': {'contents': {'href': 'contents'}}}
+
+    @staticmethod
+    def sample(alias, derived_from=None):
+        entity = ArchiveEntity()
+        entity.id = alias
+        entity.archive_entity_type = 'sample'
+        entity.conversion = {'alias': alias}
+        if derived_from:
+            entity.conversion['sampleRelationships'] = [
+                {'alias': parent, 'relationshipNature': 'derived from'} for parent in derived_from
+            ]
+        return entity
+
+    def test_add_entities__reads_contents_once(self):
+        samples = [self.sample(f'sample_{index}') for index in range(10)]
+
+        self.archive_submission.add_entities(samples, max_workers=4)
+
+        self.assertEqual(1, self.dsp_api.get_contents.call_count)
+        self.assertCountEqual([sample.id for sample in samples], self.created)
+        self.assertEqual(['sample_0', 'sample_9'], [samples[0].dsp_uuid, samples[9].dsp_uuid])
+
+    def test_add_entities__creates_derived_samples_after_their_sources(self):
+        samples = [
+            self.sample('donor'),
+            self.sample('other_donor'),
+            self.sample('specimen', ['donor']),
+            self.sample('other_specimen', ['other_donor']),
+            self.sample('cell_suspension', ['specimen', 'other_specimen'])
+        ]
+
+        self.archive_submission.add_entities(samples, max_workers=4)
+
+        self.assertLess(self.created.index('donor'), self.created.index('specimen'))
+        self.assertLess(self.created.index('other_donor'), self.created.index('other_specimen'))
+        self.assertEqual('cell_suspension', self.created[-1])
+
+    def test_add_entities__goes_through_the_entities_once_with_the_aliases(self):
+        samples = [self.sample('donor'), self.sample('specimen', ['donor']), self.sample('other_donor')]
+        created = []
+
+        self.archive_submission.add_entities(iter(samples), max_workers=4, aliases={'donor', 'specimen', 'other_donor'},
+                                             on_created=created.append)
+
+        self.assertEqual(['donor', 'specimen', 'other_donor'], [sample.id for sample in created])
+        self.assertTrue(all(sample.dsp_uuid for sample in created))
+
+    def test_iter_creation_waves__cuts_waves_at_max_size(self):
+        samples = [self.sample(f'donor_{index}') for index in range(5)] + [self.sample('specimen', ['donor_4'])]
+
+        waves = ArchiveSubmission.iter_creation_waves(samples, {sample.id for sample in samples}, max_size=2)
+
+        self.assertEqual([['donor_0', 'donor_1'], ['donor_2', 'donor_3'], ['donor_4'], ['specimen']],
+                         [[sample.id for sample in wave] for wave in waves])
+
+    def test_get_creation_waves(self):
+        samples = [
+            self.sample('donor'),
+            self.sample('other_donor'),
+            self.sample('specimen', ['donor']),
+            self.sample('other_specimen', ['other_donor']),
+            self.sample('cell_suspension', ['specimen'])
+        ]
+
+        waves = ArchiveSubmission.get_creation_waves(samples)
+
+        self.assertEqual([['donor', 'other_donor'], ['specimen', 'other_specimen'], ['cell_suspension']],
+                         [[sample.id for sample in wave] for wave in waves])
+
+
+class ArchiveEntityTest(TestCase):
+    def test_entity_and_error_have_no_dict(self):
+        entity = ArchiveEntity()
+        entity.add_error('code', 'message')
+
+        self.assertFalse(hasattr(entity, '__dict__'))
+        self.assertFalse(hasattr(entity.errors[0], '__dict__'))
+        with self.assertRaises(AttributeError):
+            entity.unknown = 'value'
+
+    def test_report_round_trip(self):
+        entity = ArchiveEntity()
+        entity.id = 'sample_1'
+        entity.archive_entity_type = 'sample'
+        entity.conversion = {'alias': 'sample_1'}
+        entity.accession = 'SAMEA1'
+        entity.add_error('code', 'message', {'detail': 'value'})
+        entity_map = ArchiveEntityMap()
+        entity_map.add_entity(entity)
+        report = entity_map.generate_report()
+
+        reloaded_map = ArchiveEntityMap.map_from_report(report['entities'])
+
+        self.assertEqual(report, reloaded_map.generate_report())
+
+    def test_ingest_entity_round_trip(self):
+        entity = ArchiveEntity.map_from_ingest_entity({
+            'alias': 'sample_1',
+            'type': 'sample',
+            'conversion': {'alias': 'sample_1'},
+            'accession': 'SAMEA1',
+            'errors': [{'error_code': 'code', 'message': 'message', 'details': None}],
+            'metadataUuids': ['uuid'],
+            'accessionedMetadataUuids': ['uuid'],
+            'dspUrl': 'dsp_url',
+            'dspUuid': 'dsp_uuid'
+        })
+
+        reloaded = ArchiveEntity.from_dict(entity.to_dict())
+
+        self.assertEqual(entity.to_dict(), reloaded.to_dict())
+        self.assertIsInstance(reloaded.errors[0], Error)
+
+
+class ArchiveEntityMapIndexTest(TestCase):
+    @staticmethod
+    def create_entity(entity_type, alias, converted=True):
+        entity = ArchiveEntity()
+        entity.archive_entity_type = entity_type
+        entity.id = alias
+        entity.conversion = {'alias': alias} if converted else {}
+        return entity
+
+    def setUp(self):
+        self.entity_map = ArchiveEntityMap()
+        self.entity_map.add_entities([
+            self.create_entity('project', 'project_1'),
+            self.create_entity('sample', 'sample_1'),
+            self.create_entity('sample', 'sample_2', converted=False),
+            self.create_entity('sample', 'sample_3'),
+        ])
+
+    def test_find_entity(self):
+        self.assertEqual('sample', self.entity_map.find_entity('sample_2').archive_entity_type)
+        self.assertIsNone(self.entity_map.find_entity('unknown'))
+
+    def test_conversion_summary_is_counted_on_add(self):
+        self.assertEqual({'project': 1, 'sample': 2}, self.entity_map.get_conversion_summary())
+
+        failed = self.create_entity('sample', 'sample_1')
+        failed.add_error('code', 'message')
+        self.entity_map.add_entity(failed)
+        self.entity_map.add_entity(self.create_entity('sample', 'sample_2'))
+
+        self.assertEqual({'project': 1, 'sample': 2}, self.entity_map.get_conversion_summary())
+        self.assertEqual(['project_1', 'sample_3', 'sample_2'],
+                         [entity.id for entity in self.entity_map.get_converted_entities()])
+        self.assertEqual(4, len(self.entity_map))
+
+    def test_views_are_iterators(self):
+        entities = self.entity_map.get_entities()
+
+        self.assertEqual('project_1', next(entities).id)
+        self.assertEqual(['sample_1', 'sample_2', 'sample_3'], [entity.id for entity in entities])
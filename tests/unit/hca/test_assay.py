@@ -0,0 +1,202 @@
+import copy
+import unittest
+
+from hca.assay import AssayData, HcaSubmissionAssayData, ASSAY_ENTITY_TYPES
+from hca.loader import HcaLoader
+from tests.unit.hca.test_loader import FakeIngest
+
+SCHEMA_URL = 'https://schema.humancellatlas.org/type'
+
+
+def content(schema_type: str, concrete_type: str, **fields) -> dict:
+    return {'content': dict(describedBy=f'{SCHEMA_URL}/{schema_type}/1.0.0/{concrete_type}', **fields)}
+
+
+class FakeIngestAPI:
+    """The api.ingest.IngestAPI calls AssayData makes, answered from a FakeIngest"""
+
+    def __init__(self, ingest: FakeIngest):
+        self.ingest = ingest
+        self.requests = []
+
+    def get_submission_by_uuid(self, submission_uuid: str) -> dict:
+        return copy.deepcopy(self.ingest.get_entity_by_uuid('submissionEnvelopes', submission_uuid))
+
+    def get(self, url: str) -> dict:
+        self.requests.append(url)
+        entities = self.ingest.related.get(url, [])
+        if not entities:
+            return {'_links': {}}
+        entity_type = entities[0]['_links']['self']['href'].split('/')[-2]
+        return {'_embedded': {entity_type: copy.deepcopy(entities)}, '_links': {}}
+
+    def get_related_entity_count(self, entity: dict, relation: str, entity_type: str) -> int:
+        return len(self.ingest.related.get(entity['_links'][relation]['href'], []))
+
+
+class TestHcaSubmissionAssayData(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ingest = FakeIngest()
+        self.submission = self.ingest.add('submissionEnvelopes', 'submission')
+        submission_link = {'href': self.submission['_links']['self']['href']}
+        for link_name in ['processes', 'relatedProjects']:
+            self.submission['_links'][link_name] = {'href': f'{submission_link["href"]}/{link_name}'}
+        project = self.ingest.add('projects', 'project', content('project', 'project'))
+        self.ingest.relate(self.submission, 'relatedProjects', [project])
+
+        donor = self.ingest.add('biomaterials', 'donor', content('biomaterial', 'donor_organism'))
+        cells = self.ingest.add('biomaterials', 'cells', content('biomaterial', 'cell_suspension'))
+        reads = [self.ingest.add('files', f'read{index}', content('file', 'sequence_file')) for index in range(2)]
+        image = self.ingest.add('files', 'image', content('file', 'image_file'))
+        sequencing = self.ingest.add('protocols', 'sequencing', content('protocol', 'sequencing_protocol'))
+        library = self.ingest.add('protocols', 'library', content('protocol', 'library_preparation_protocol'))
+        processes = []
+        for process_id, inputs, outputs, protocols in [
+            ('p1_dissociation', [donor], [cells], []),
+            ('p2_assay', [cells], reads, [sequencing, library]),
+            ('p3_imaging', [cells], [image], [sequencing, library]),
+        ]:
+            process = self.ingest.add('processes', process_id,
+                                      {'content': {'process_core': {'process_id': process_id}}})
+            # like ingest, a relation link of the process rather than the self link of the submission
+            process_link = process['_links']['self']['href']
+            process['_links']['submissionEnvelope'] = {'href': f'{process_link}/submissionEnvelope'}
+            self.ingest.link(process, inputs, outputs)
+            self.ingest.relate(process, 'protocols', protocols)
+            processes.append(process)
+        self.ingest.relate(self.submission, 'processes', processes)
+
+        manifest = self.ingest.add('bundleManifests', 'manifest', attributes={
+            'fileProjectMap': {'uuid_project': []},
+            'fileFilesMap': {'uuid_read0': [], 'uuid_read1': [], 'uuid_image': []},
+            'fileProcessMap': {f'uuid_{process_id}': [] for process_id in ['p1_dissociation', 'p2_assay', 'p3_imaging']}
+        })
+        self.ingest.relate(self.submission, 'bundleManifests', [manifest])
+        self.ingest_api = FakeIngestAPI(self.ingest)
+
+    def load_hca_submission(self):
+        return HcaLoader(self.ingest, entity_types=['projects'] + ASSAY_ENTITY_TYPES).get_submission('uuid_submission')
+
+    def test_assays_match_the_ones_from_ingest(self):
+        # given
+        from_ingest = AssayData(self.ingest_api, 'uuid_submission')
+        from_ingest.load()
+        self.ingest_api.requests.clear()
+
+        # when
+        data = HcaSubmissionAssayData(self.ingest_api, self.load_hca_submission(), 'uuid_submission')
+        data.load()
+
+        # then
+        self.assertEqual(['p2_assay'], [assay['content']['process_core']['process_id'] for assay in data.assays])
+        self.assertEqual(from_ingest.assays, data.assays)
+        self.assertEqual(from_ingest.project, data.project)
+        self.assertEqual([], self.ingest_api.requests)
+
+    def test_assay_fields_are_not_added_to_the_loaded_entities(self):
+        hca_submission = self.load_hca_submission()
+
+        HcaSubmissionAssayData(self.ingest_api, hca_submission, 'uuid_submission').load()
+
+        process = hca_submission.get_entity_by_uuid('processes', 'uuid_p2_assay')
+        self.assertNotIn('derived_files', process.attributes)
+
+    def test_processes_of_other_submissions_in_the_loaded_graph_are_left_out(self):
+        # given
+        cells = self.ingest.get_entity_by_uuid('biomaterials', 'uuid_cells')
+        other_process = self.ingest.add('processes', 'p4_other_submission',
+                                        {'content': {'process_core': {'process_id': 'p4'}}})
+        self.ingest.link(other_process, [cells], [])
+        hca_submission = self.load_hca_submission()
+        self.assertIsNotNone(hca_submission.get_entity_by_uuid('processes', 'uuid_p4_other_submission'))
+
+        # when
+        data = HcaSubmissionAssayData(self.ingest_api, hca_submission, 'uuid_submission')
+        data.load()
+
+        # then
+        self.assertEqual(['p2_assay'], [assay['content']['process_core']['process_id'] for assay in data.assays])
+        self.assertEqual([], self.ingest_api.requests)
+
+    def test_processes_missing_from_the_loaded_submission_are_asked_to_ingest(self):
+        # given
+        hca_submission = self.load_hca_submission()
+        extra_process = self.ingest.add('processes', 'p4_assay', {'content': {'process_core': {'process_id': 'p4'}}})
+        self.ingest.relate(self.submission, 'processes', [extra_process])
+
+        # when
+        data = HcaSubmissionAssayData(self.ingest_api, hca_submission, 'uuid_submission')
+        data.load()
+
+        # then
+        self.assertIn(self.submission['_links']['processes']['href'], self.ingest_api.requests)
+        self.assertEqual(['p2_assay'], [assay['content']['process_core']['process_id'] for assay in data.assays])
+
+
+class TestAssayData(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ingest = FakeIngest()
+        self.submission = self.ingest.add('submissionEnvelopes', 'submission')
+        self.submission['_links']['processes'] = {'href': f'{self.submission["_links"]["self"]["href"]}/processes'}
+        sequencing = self.ingest.add('protocols', 'sequencing', content('protocol', 'sequencing_protocol'))
+        library = self.ingest.add('protocols', 'library', content('protocol', 'library_preparation_protocol'))
+        processes = []
+        for index in range(30):
+            is_assay = index % 3 == 0
+            process_id = f'p{index}_{"assay" if is_assay else "other"}'
+            process = self.ingest.add('processes', process_id, {'content': {'process_core': {'process_id': process_id}}})
+            cells = self.ingest.add('biomaterials', f'cells{index}', content('biomaterial', 'cell_suspension'))
+            read = self.ingest.add('files', f'read{index}', content('file', 'sequence_file'))
+            self.ingest.link(process, [cells], [read])
+            self.ingest.relate(process, 'protocols', [sequencing, library] if is_assay else [library])
+            processes.append(process)
+        self.ingest.relate(self.submission, 'processes', processes)
+        self.ingest_api = FakeIngestAPI(self.ingest)
+
+    def get_assays(self, max_workers: int, assay_data_type=AssayData) -> list:
+        data = assay_data_type(self.ingest_api, 'uuid_submission', max_workers=max_workers)
+        data.submission = data.get_submission('uuid_submission')
+        return data.get_submission_assays()
+
+    def test_processes_are_checked_concurrently_in_order(self):
+        sequential = self.get_assays(max_workers=1)
+        concurrent = self.get_assays(max_workers=8)
+
+        self.assertEqual([f'p{index}_assay' for index in range(0, 30, 3)],
+                         [assay['content']['process_core']['process_id'] for assay in concurrent])
+        self.assertEqual(sequential, concurrent)
+
+    def test_ruled_out_processes_are_not_checked_further(self):
+        class InputFilesFailAssayData(AssayData):
+            def has_input_files(self, process):
+                if process['content']['process_core']['process_id'].endswith('other'):
+                    raise Exception('Input files of a ruled out process were needed')
+                return super().has_input_files(process)
+
+        for max_workers in [1, 8]:
+            with self.subTest(max_workers=max_workers):
+                assays = self.get_assays(max_workers, InputFilesFailAssayData)
+
+                self.assertEqual(10, len(assays))
+
+    def test_only_the_protocols_of_ruled_out_processes_are_requested(self):
+        for max_workers in [1, 8]:
+            with self.subTest(max_workers=max_workers):
+                self.ingest_api.requests.clear()
+
+                self.get_assays(max_workers)
+
+                other_requests = [url for url in self.ingest_api.requests if '_other/' in url]
+                self.assertEqual(20, len(other_requests))
+                self.assertTrue(all(url.endswith('/protocols') for url in other_requests))
+
+    def test_get_all_entities_follows_pages(self):
+        pages = {
+            'page0': {'_embedded': {'processes': [{'id': 0}]}, '_links': {'next': {'href': 'page1'}}},
+            'page1': {'_embedded': {'processes': [{'id': 1}]}, '_links': {}}
+        }
+        self.ingest_api.get = lambda url: pages[url]
+        data = AssayData(self.ingest_api, 'uuid_submission')
+
+        self.assertEqual([{'id': 0}, {'id': 1}], data.get_all_entities('page0', 'processes'))
+        self.assertEqual([{'id': 0}, {'id': 1}], data.get_all_entities('page0', 'processes'))
@@ -0,0 +1,216 @@
+import tempfile
+import unittest
+
+import requests
+from mock import MagicMock
+
+from hca.loader import HcaLoader, RELATED_LINKS
+from hca.snapshot import HcaSubmissionSnapshot
+from submitter.base import get_load_profile
+from tests.unit.utils import make_ingest_entity
+
+SCHEMA_TYPES = {
+    'submissionEnvelopes': 'submission',
+    'bundleManifests': 'bundle_manifest',
+    'projects': 'project',
+    'biomaterials': 'biomaterial',
+    'processes': 'process',
+    'protocols': 'protocol',
+    'files': 'file'
+}
+
+
+class FakeIngest:
+    """An ingest graph in memory, the related entities are looked up by link"""
+
+    def __init__(self):
+        self.entities = {}
+        self.related = {}
+        self.related_requests = []
+
+    def add(self, entity_type: str, index: str, attributes: dict = None) -> dict:
+        link_names = [link_name for _, link_name in RELATED_LINKS.get(entity_type, [])]
+        if entity_type == 'submissionEnvelopes':
+            link_names = ['bundleManifests']
+        entity = make_ingest_entity(entity_type, SCHEMA_TYPES[entity_type], index, f'uuid_{index}',
+                                    attributes=attributes, extra_links=[(name, name) for name in link_names])
+        self.entities[(entity_type, f'uuid_{index}')] = entity
+        return entity
+
+    def relate(self, entity: dict, link_name: str, related_entities: list):
+        self.related.setdefault(entity['_links'][link_name]['href'], []).extend(related_entities)
+
+    def link(self, process: dict, inputs: list, outputs: list):
+        for entity in inputs:
+            self.relate(entity, 'inputToProcesses', [process])
+        for entity in outputs:
+            self.relate(entity, 'derivedByProcesses', [process])
+        for entity in inputs + outputs:
+            entity_type = entity['_links']['self']['href'].split('/')[-2]
+            link_name = ('input' if entity in inputs else 'derived') + entity_type[:-1].capitalize() + 's'
+            self.relate(process, link_name, [entity])
+
+    def get_entity_by_uuid(self, entity_type: str, entity_uuid: str) -> dict:
+        return self.entities[(entity_type, entity_uuid)]
+
+    def get(self, url: str, **kwargs):
+        entity = next(entity for entity in self.entities.values() if entity['_links']['self']['href'] == url)
+        return MagicMock(json=MagicMock(return_value=entity))
+
+    @staticmethod
+    def get_headers() -> dict:
+        return {}
+
+    def get_related_entities_count(self, relation: str, entity: dict, entity_type: str) -> int:
+        return len(self.related.get(entity['_links'][relation]['href'], []))
+
+    def get_related_entities(self, relation: str, entity: dict, entity_type: str):
+        if relation in entity['_links']:
+            href = entity['_links'][relation]['href']
+            self.related_requests.append(href)
+            yield from self.related.get(href, [])
+
+
+def as_link_sets(hca_submission) -> dict:
+    view = hca_submission.as_dict()
+    for entities in view.values():
+        for entity in entities.values():
+            entity['links'] = {entity_type: set(indexes) for entity_type, indexes in entity.get('links', {}).items()}
+    return view
+
+
+class TestHcaLoader(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ingest = FakeIngest()
+        donor = self.ingest.add('biomaterials', 'donor')
+        specimen = self.ingest.add('biomaterials', 'specimen')
+        cell_suspension = self.ingest.add('biomaterials', 'cells')
+        read_1 = self.ingest.add('files', 'read1')
+        read_2 = self.ingest.add('files', 'read2')
+        collection = self.ingest.add('processes', 'collection')
+        dissociation = self.ingest.add('processes', 'dissociation')
+        sequencing = self.ingest.add('processes', 'sequencing')
+        protocol = self.ingest.add('protocols', 'protocol')
+        self.ingest.link(collection, [donor], [specimen])
+        self.ingest.link(dissociation, [specimen], [cell_suspension])
+        self.ingest.link(sequencing, [cell_suspension], [read_1, read_2])
+        for process in [collection, dissociation, sequencing]:
+            self.ingest.relate(process, 'protocols', [protocol])
+        manifest = self.ingest.add('bundleManifests', 'manifest', attributes={
+            'fileBiomaterialMap': {'uuid_cells': []},
+            'fileFilesMap': {'uuid_read1': [], 'uuid_read2': []},
+            'fileProcessMap': {'uuid_sequencing': []},
+            'fileProtocolMap': {'uuid_protocol': []}
+        })
+        self.submission = self.ingest.add('submissionEnvelopes', 'submission')
+        self.cell_suspension = cell_suspension
+        self.ingest.relate(self.submission, 'bundleManifests', [manifest])
+
+    def test_breadth_first_gives_same_links(self):
+        # when
+        depth_first = HcaLoader(self.ingest, breadth_first=False).get_submission('uuid_submission')
+        depth_first_requests = sorted(self.ingest.related_requests)
+        self.ingest.related_requests.clear()
+        breadth_first = HcaLoader(self.ingest, max_workers=4, breadth_first=True).get_submission('uuid_submission')
+
+        # then
+        self.assertEqual(as_link_sets(depth_first), as_link_sets(breadth_first))
+        self.assertEqual(depth_first_requests, sorted(self.ingest.related_requests))
+        self.assertEqual(len(self.ingest.related_requests), len(set(self.ingest.related_requests)))
+        self.assertEqual({'submissionEnvelopes', 'bundleManifests', 'biomaterials', 'files', 'processes', 'protocols'},
+                         set(breadth_first.get_entity_types()))
+
+    def test_breadth_first_loads_deep_graphs(self):
+        # given
+        depth = 2000
+        biomaterials = [self.ingest.add('biomaterials', f'b{index}') for index in range(depth + 1)]
+        for index in range(depth):
+            process = self.ingest.add('processes', f'p{index}')
+            self.ingest.link(process, [biomaterials[index]], [biomaterials[index + 1]])
+        loader = HcaLoader(self.ingest, max_workers=4, breadth_first=True)
+        hca_submission = loader.get_submission('uuid_submission')
+
+        # when
+        loader._map_entities(hca_submission, 'biomaterials', [f'uuid_b{depth}'])
+
+        # then
+        self.assertEqual(depth, len([entity for entity in hca_submission.get_entities('processes')
+                                     if entity.identifier.index.startswith('p')]))
+        last_process = hca_submission.get_entity('processes', f'p{depth - 1}')
+        self.assertEqual({f'b{depth - 1}', f'b{depth}'}, last_process.get_linked_indexes('biomaterials'))
+
+    def test_snapshot_is_reused_while_ingest_has_not_changed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # given
+            loader = HcaLoader(self.ingest, max_workers=4, snapshot=HcaSubmissionSnapshot(directory))
+            loaded = loader.get_submission('uuid_submission')
+            self.ingest.related_requests.clear()
+
+            # when
+            reloaded = loader.get_submission('uuid_submission')
+
+            # then
+            self.assertEqual([], self.ingest.related_requests)
+            self.assertEqual(as_link_sets(loaded), as_link_sets(reloaded))
+
+    def test_snapshot_is_not_used_when_an_entity_changed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # given
+            loader = HcaLoader(self.ingest, max_workers=4, snapshot=HcaSubmissionSnapshot(directory))
+            loader.get_submission('uuid_submission')
+            self.ingest.related_requests.clear()
+            self.cell_suspension['updateDate'] = '2021-01-01T00:00:00Z'
+
+            # when
+            reloaded = loader.get_submission('uuid_submission')
+
+            # then
+            self.assertTrue(self.ingest.related_requests)
+            cells = reloaded.get_entity_by_uuid('biomaterials', 'uuid_cells')
+            self.assertEqual('2021-01-01T00:00:00Z', cells.attributes['updateDate'])
+
+    def test_snapshot_is_not_used_when_a_manifest_was_added(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # given
+            loader = HcaLoader(self.ingest, max_workers=4, snapshot=HcaSubmissionSnapshot(directory))
+            loader.get_submission('uuid_submission')
+            new_manifest = self.ingest.add('bundleManifests', 'new_manifest', attributes={
+                'fileFilesMap': {'uuid_read1': []}
+            })
+            self.ingest.relate(self.submission, 'bundleManifests', [new_manifest])
+
+            # when
+            reloaded = loader.get_submission('uuid_submission')
+
+            # then
+            self.assertIsNotNone(reloaded.get_entity_by_uuid('bundleManifests', 'uuid_new_manifest'))
+
+    def test_snapshot_is_not_used_when_ingest_fails(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # given
+            loader = HcaLoader(self.ingest, max_workers=4, snapshot=HcaSubmissionSnapshot(directory))
+            loaded = loader.get_submission('uuid_submission')
+            self.ingest.related_requests.clear()
+            self.ingest.get = MagicMock(side_effect=requests.ConnectionError('ingest is down'))
+
+            # when
+            reloaded = loader.get_submission('uuid_submission')
+
+            # then
+            self.assertTrue(self.ingest.related_requests)
+            self.assertEqual(as_link_sets(loaded), as_link_sets(reloaded))
+
+    def test_load_profile_only_loads_the_entity_types_asked_for(self):
+        # when
+        hca_submission = HcaLoader(self.ingest).get_submission('uuid_submission',
+                                                               entity_types=get_load_profile(['BioSamples']))
+
+        # then
+        self.assertEqual({'submissionEnvelopes', 'bundleManifests', 'biomaterials', 'processes'},
+                         set(hca_submission.get_entity_types()))
+        self.assertEqual({'donor', 'specimen', 'cells'},
+                         {entity.identifier.index for entity in hca_submission.get_entities('biomaterials')})
+        self.assertFalse([href for href in self.ingest.related_requests
+                          if href.endswith('Files') or href.endswith('protocols')])
+        cells = hca_submission.get_entity_by_uuid('biomaterials', 'uuid_cells')
+        self.assertEqual({'dissociation', 'sequencing'}, cells.get_linked_indexes('processes'))
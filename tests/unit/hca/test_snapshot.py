@@ -0,0 +1,52 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from hca.snapshot import HcaSubmissionSnapshot
+from hca.submission import HcaSubmission
+from tests.unit.utils import make_ingest_entity
+
+
+class TestHcaSubmissionSnapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.snapshot = HcaSubmissionSnapshot(self.directory.name)
+        self.submission = HcaSubmission()
+        project = self.submission.map_ingest_entity(make_ingest_entity('projects', 'project', 'p1', 'project_uuid'))
+        biomaterial = self.submission.map_ingest_entity(
+            make_ingest_entity('biomaterials', 'biomaterial', 'b1', 'biomaterial_uuid'))
+        self.submission.link_entities_by_name(project, biomaterial, 'biomaterials')
+        biomaterial.add_accession('BioSamples', 'SAMEA1')
+        biomaterial.add_error('content', 'Error sending to BioSamples')
+
+    def test_save_and_load(self):
+        # when
+        self.snapshot.save('submission', self.submission)
+        loaded = self.snapshot.load('submission', HcaSubmission)
+
+        # then
+        self.assertEqual(self.submission.as_dict(), loaded.as_dict())
+        self.assertTrue(loaded.contains_entity_by_uuid('biomaterials', 'biomaterial_uuid'))
+        project = loaded.get_entity('projects', 'p1')
+        self.assertEqual(['b1'], [entity.identifier.index
+                                  for entity in loaded.get_linked_entities_by_name(project, 'biomaterials')])
+
+    def test_snapshot_is_written_one_entity_per_line(self):
+        self.snapshot.save('submission', self.submission)
+
+        with gzip.open(os.path.join(self.directory.name, 'submission.jsonl.gz'), 'rt') as snapshot_file:
+            self.assertEqual(3, len(snapshot_file.readlines()))
+
+    def test_missing_or_broken_snapshot_is_not_loaded(self):
+        self.assertIsNone(self.snapshot.load('submission', HcaSubmission))
+
+        self.snapshot.save('submission', self.submission)
+        path = os.path.join(self.directory.name, 'submission.jsonl.gz')
+        with open(path, 'rb') as snapshot_file:
+            content = snapshot_file.read()
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(content[:len(content) // 2])
+
+        self.assertIsNone(self.snapshot.load('submission', HcaSubmission))
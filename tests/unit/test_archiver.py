@@ -1,12 +1,15 @@
 import copy
 import datetime
 import json
+import tempfile
 import unittest
 
-from mock import MagicMock, patch
+from mock import ANY, MagicMock, patch
 
 import config
-from archiver.archiver import IngestArchiver, Manifest, ArchiveSubmission, Biomaterial
+from archiver.archiver import IngestArchiver, Manifest, ArchiveSubmission, Biomaterial, ArchiverException, \
+    ConversionProgress, ManifestConversionError
+from archiver.checkpoint import ConversionCheckpoint
 
 
 # TODO use mocks for integration tests
@@ -90,6 +93,7 @@ class TestIngestArchiver(unittest.TestCase):
         assay_manifest.get_files = MagicMock(
             return_value=manifest.get('files'))
         assay_manifest.manifest_id = manifest.get('manifest_id')
+        assay_manifest.manifest = {'updateDate': manifest.get('update_date', '2020-01-01T00:00:00.000Z')}
         return assay_manifest
 
     def test_archive_skip_metadata_with_accessions(self):
@@ -109,3 +113,210 @@ class TestIngestArchiver(unittest.TestCase):
         self.assertTrue(archive_submission.is_completed)
         self.assertTrue(archive_submission.errors)
         self.assertFalse(archive_submission.processing_result)
+
+    def test_convert_checks_current_version_of_shared_entities_once(self):
+        mock_manifest = self._mock_manifest(self.base_manifest)
+        self.dsp_api.get_current_versions = MagicMock(
+            side_effect=lambda entity_keys: {entity_key: None for entity_key in entity_keys})
+        archiver = IngestArchiver(
+            ontology_api=self.ontology_api,
+            ingest_api=self.ingest_api,
+            dsp_api=self.dsp_api,
+            exclude_types=['study', 'sample', 'sequencingExperiment', 'sequencingRun'])
+        archiver.get_manifest = MagicMock(return_value=mock_manifest)
+
+        entity_map = archiver.convert(['manifests/1', 'manifests/2'])
+
+        project_alias = f'project_{self.base_manifest["project"]["uuid"]["uuid"]}'
+        self.assertIsNotNone(entity_map.get_entity('project', project_alias))
+        self.dsp_api.get_current_versions.assert_called_once_with([('project', project_alias)])
+        self.dsp_api.get_current_version.assert_not_called()
+
+    def test_convert_converts_shared_entities_once(self):
+        mock_manifest = self._mock_manifest(self.base_manifest)
+        archiver = IngestArchiver(
+            ontology_api=self.ontology_api,
+            ingest_api=self.ingest_api,
+            dsp_api=self.dsp_api,
+            exclude_types=['sample', 'sequencingExperiment', 'sequencingRun'],
+            dsp_validation=False)
+        archiver.get_manifest = MagicMock(return_value=mock_manifest)
+        for archive_entity_type in ['project', 'study']:
+            archiver.converter[archive_entity_type] = MagicMock()
+            archiver.converter[archive_entity_type].convert = MagicMock(side_effect=lambda data: {})
+
+        entity_map = archiver.convert(['manifests/1', 'manifests/2', 'manifests/3'])
+
+        self.assertEqual(1, archiver.converter['project'].convert.call_count)
+        self.assertEqual(1, archiver.converter['study'].convert.call_count)
+        self.assertEqual(2, len(list(entity_map.get_converted_entities())))
+
+    def _create_converting_archiver(self, **kwargs):
+        archiver = IngestArchiver(
+            ontology_api=self.ontology_api,
+            ingest_api=self.ingest_api,
+            dsp_api=self.dsp_api,
+            exclude_types=kwargs.pop('exclude_types', ['sequencingRun']),
+            dsp_validation=False,
+            **kwargs)
+        for archive_entity_type in archiver.converter:
+            archiver.converter[archive_entity_type] = MagicMock()
+            archiver.converter[archive_entity_type].convert = MagicMock(side_effect=lambda data: {})
+        return archiver
+
+    def _mock_manifests(self, manifest_ids):
+        manifests = {}
+        for manifest_id in manifest_ids:
+            manifest = copy.deepcopy(self.base_manifest)
+            manifest['manifest_id'] = manifest_id
+            manifest['files'][0]['uuid']['uuid'] = self._generate_fake_id(prefix='file_')
+            manifests[manifest_id] = self._mock_manifest(manifest)
+        return manifests
+
+    def test_convert__concurrently_gives_same_map_as_sequentially(self):
+        manifests = self._mock_manifests(['1', '2', '3', '4'])
+        manifest_urls = [f'manifests/{manifest_id}' for manifest_id in manifests]
+        sequential = self._create_converting_archiver()
+        sequential.get_manifest = MagicMock(side_effect=lambda manifest_id, context: manifests[manifest_id])
+        concurrent = self._create_converting_archiver(max_workers=4)
+        concurrent.get_manifest = MagicMock(side_effect=lambda manifest_id, context: manifests[manifest_id])
+
+        sequential_map = sequential.convert(manifest_urls)
+        concurrent_map = concurrent.convert(manifest_urls)
+
+        def entity_keys(entity_map):
+            return [(entity.archive_entity_type, entity.id, entity.manifest_id) for entity in entity_map.get_entities()]
+
+        self.assertEqual(entity_keys(sequential_map), entity_keys(concurrent_map))
+        self.assertEqual(len(list(sequential_map.get_converted_entities())),
+                         len(list(concurrent_map.get_converted_entities())))
+
+    def test_convert__concurrently_aggregates_max_workers_manifests_ahead(self):
+        manifests = self._mock_manifests([str(index) for index in range(1, 7)])
+        archiver = self._create_converting_archiver(max_workers=2)
+        archiver.get_manifest = MagicMock(side_effect=lambda manifest_id, context: manifests[manifest_id])
+        convert_entity = archiver._convert_entity
+        aggregated_when_converted = []
+
+        def record_convert_entity(archive_entity):
+            aggregated_when_converted.append((int(archive_entity.manifest_id), archiver.get_manifest.call_count))
+            return convert_entity(archive_entity)
+
+        archiver._convert_entity = record_convert_entity
+
+        archiver.convert([f'manifests/{manifest_id}' for manifest_id in manifests])
+
+        self.assertTrue(aggregated_when_converted)
+        for manifest_index, aggregated in aggregated_when_converted:
+            self.assertLessEqual(aggregated, manifest_index + 2)
+
+    def test_convert__concurrently_keeps_errors_per_manifest(self):
+        manifests = self._mock_manifests(['1', '3'])
+
+        def get_manifest(manifest_id, context):
+            if manifest_id == '2':
+                raise ArchiverException('Manifest 2 has many assay processes.')
+            return manifests[manifest_id]
+
+        archiver = self._create_converting_archiver(max_workers=2)
+        archiver.get_manifest = MagicMock(side_effect=get_manifest)
+
+        with self.assertRaises(ManifestConversionError) as raised:
+            archiver.convert(['manifests/1', 'manifests/2', 'manifests/3'])
+
+        self.assertEqual(['2'], list(raised.exception.errors))
+        project_alias = f'project_{self.base_manifest["project"]["uuid"]["uuid"]}'
+        self.assertIsNotNone(raised.exception.entity_map.get_entity('project', project_alias))
+
+    def test_convert__releases_raw_data(self):
+        archiver = self._create_converting_archiver(exclude_types=[])
+        archiver.get_manifest = MagicMock(return_value=self._mock_manifest(self.base_manifest))
+
+        entity_map = archiver.convert(['manifests/1'])
+
+        released = {entity.archive_entity_type for entity in entity_map.get_entities() if entity.data is None}
+        self.assertEqual({'project', 'study', 'sample', 'sequencingExperiment'}, released)
+        runs = [entity for entity in entity_map.get_entities() if entity.archive_entity_type == 'sequencingRun']
+        self.assertTrue(runs)
+        self.assertTrue(all(run.data for run in runs))
+
+    def test_convert__keeps_raw_data(self):
+        archiver = self._create_converting_archiver(keep_raw_data=True)
+        archiver.get_manifest = MagicMock(return_value=self._mock_manifest(self.base_manifest))
+
+        entity_map = archiver.convert(['manifests/1'])
+
+        self.assertTrue(all(entity.data for entity in entity_map.get_entities()))
+
+    def test_convert__resumes_from_checkpoint(self):
+        for max_workers in [1, 2]:
+            with self.subTest(max_workers=max_workers), tempfile.TemporaryDirectory() as directory:
+                manifests = self._mock_manifests(['1', '2'])
+                checkpoint = ConversionCheckpoint(directory)
+
+                def get_manifest_failing_on_2(manifest_id, context):
+                    if manifest_id == '2':
+                        raise ArchiverException('Ingest is down')
+                    return manifests[manifest_id]
+
+                archiver = self._create_converting_archiver(checkpoint=checkpoint, max_workers=max_workers,
+                                                            exclude_types=[])
+                archiver.get_manifest = MagicMock(side_effect=get_manifest_failing_on_2)
+                with self.assertRaises(ArchiverException):
+                    archiver.convert(['manifests/1', 'manifests/2'])
+
+                manifests['1'].get_project.reset_mock()
+                resumed = self._create_converting_archiver(checkpoint=checkpoint, max_workers=max_workers,
+                                                           exclude_types=[])
+                resumed.get_manifest = MagicMock(side_effect=lambda manifest_id, context: manifests[manifest_id])
+                entity_map = resumed.convert(['manifests/1', 'manifests/2'])
+                manifests['1'].get_project.assert_not_called()
+
+                uninterrupted = self._create_converting_archiver(max_workers=max_workers, exclude_types=[])
+                uninterrupted.get_manifest = MagicMock(side_effect=lambda manifest_id, context: manifests[manifest_id])
+                expected_map = uninterrupted.convert(['manifests/1', 'manifests/2'])
+
+                self.assertEqual(expected_map.generate_report(), entity_map.generate_report())
+                runs = [entity for entity in entity_map.get_entities() if entity.archive_entity_type == 'sequencingRun']
+                self.assertTrue(runs)
+                self.assertTrue(all(run.data for run in runs))
+
+    def test_convert__does_not_resume_checkpoint_of_other_parameters(self):
+        for max_workers in [1, 2]:
+            for changed_kwargs, changed_manifest in [({'alias_prefix': 'prefix'}, {}),
+                                                     ({'exclude_types': ['sequencingRun']}, {}),
+                                                     ({}, {'update_date': '2021-01-01T00:00:00.000Z'})]:
+                with self.subTest(max_workers=max_workers, kwargs=changed_kwargs, manifest=changed_manifest), \
+                        tempfile.TemporaryDirectory() as directory:
+                    checkpoint = ConversionCheckpoint(directory)
+                    archiver = self._create_converting_archiver(checkpoint=checkpoint, max_workers=max_workers,
+                                                                exclude_types=[])
+                    archiver.get_manifest = MagicMock(return_value=self._mock_manifest(self.base_manifest))
+                    archiver.convert(['manifests/1'])
+
+                    kwargs = dict({'exclude_types': []}, **changed_kwargs)
+                    manifest = self._mock_manifest(dict(self.base_manifest, **changed_manifest))
+                    rerun = self._create_converting_archiver(checkpoint=checkpoint, max_workers=max_workers, **kwargs)
+                    rerun.get_manifest = MagicMock(return_value=manifest)
+                    entity_map = rerun.convert(['manifests/1'])
+
+                    uninterrupted = self._create_converting_archiver(max_workers=max_workers, **kwargs)
+                    uninterrupted.get_manifest = MagicMock(return_value=manifest)
+                    self.assertEqual(uninterrupted.convert(['manifests/1']).generate_report(),
+                                     entity_map.generate_report())
+                    manifest.get_project.assert_called()
+
+    def test_convert__reports_progress(self):
+        events = []
+        archiver = self._create_converting_archiver(progress=events.append)
+        archiver.get_manifest = MagicMock(return_value=self._mock_manifest(self.base_manifest))
+
+        archiver.convert(['manifests/1'])
+
+        self.assertEqual(ConversionProgress.MANIFEST_STARTED, events[0].stage)
+        self.assertEqual((1, 1), (events[0].count, events[0].total))
+        found = [event for event in events if event.stage == ConversionProgress.ENTITIES_FOUND]
+        self.assertEqual(['project', 'study', 'sample', 'sequencingExperiment'],
+                         [event.archive_entity_type for event in found])
+        converted = [event for event in events if event.stage == ConversionProgress.ENTITY_CONVERTED]
+        self.assertEqual(sum(event.total for event in found), len(converted))
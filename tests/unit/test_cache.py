@@ -0,0 +1,137 @@
+import threading
+from unittest import TestCase
+
+from utils.cache import LruEntityCache, SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLruEntityCache(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_get_returns_cached_entity(self):
+        cache = LruEntityCache(max_entries=2)
+        cache.put('https://ingest/biomaterials/1', {'uuid': '1'})
+
+        self.assertEqual({'uuid': '1'}, cache.get('https://ingest/biomaterials/1'))
+        self.assertIsNone(cache.get('https://ingest/biomaterials/2'))
+        self.assertEqual(1, cache.stats.hits)
+        self.assertEqual(1, cache.stats.misses)
+        self.assertEqual(0.5, cache.stats.hit_rate)
+
+    def test_least_recently_used_entity_is_evicted(self):
+        cache = LruEntityCache(max_entries=2)
+        cache.put('https://ingest/biomaterials/1', {'uuid': '1'})
+        cache.put('https://ingest/biomaterials/2', {'uuid': '2'})
+        cache.get('https://ingest/biomaterials/1')
+        cache.put('https://ingest/biomaterials/3', {'uuid': '3'})
+
+        self.assertIn('https://ingest/biomaterials/1', cache)
+        self.assertNotIn('https://ingest/biomaterials/2', cache)
+        self.assertIn('https://ingest/biomaterials/3', cache)
+        self.assertEqual(1, cache.stats.evictions)
+
+    def test_cache_is_bounded_by_bytes(self):
+        entity = {'content': 'x' * 100}
+        size = LruEntityCache.estimate_size(entity)
+        cache = LruEntityCache(max_entries=100, max_bytes=size * 2)
+        for index in range(5):
+            cache.put(f'https://ingest/files/{index}', entity)
+
+        self.assertEqual(2, len(cache))
+        self.assertLessEqual(cache.current_bytes, size * 2)
+        self.assertEqual(3, cache.stats.evictions)
+
+    def test_entity_expires_after_ttl_of_its_type(self):
+        cache = LruEntityCache(default_ttl=100, ttl_by_type={'submissionEnvelopes': 10}, clock=self.clock)
+        cache.put('https://ingest/submissionEnvelopes/search/findByUuidUuid?uuid=1', {'uuid': '1'})
+        cache.put('https://ingest/projects/1', {'uuid': '1'})
+        self.clock.now = 50
+
+        self.assertIsNone(cache.get('https://ingest/submissionEnvelopes/search/findByUuidUuid?uuid=1'))
+        self.assertEqual({'uuid': '1'}, cache.get('https://ingest/projects/1'))
+        self.assertEqual(1, cache.stats.expirations)
+
+    def test_zero_ttl_type_is_not_cached(self):
+        cache = LruEntityCache(ttl_by_type={'archiveJobs': 0})
+        cache.put('https://ingest/archiveJobs/1', {'status': 'Running'})
+
+        self.assertEqual(0, len(cache))
+
+    def test_invalidate_removes_entity(self):
+        cache = LruEntityCache()
+        cache.put('https://ingest/processes/1', {'uuid': '1'})
+        cache.invalidate('https://ingest/processes/1')
+
+        self.assertIsNone(cache.get('https://ingest/processes/1'))
+        self.assertEqual(1, cache.stats.invalidations)
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        self.fetched = {'uuid': '1'}
+        return self.fetched
+
+    def run_callers(self, count):
+        results = []
+
+        def call():
+            try:
+                results.append(self.single_flight.do('https://ingest/projects/1', self.fetch))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        while self.single_flight.shared < count - 1:
+            threading.Event().wait(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_call(self):
+        self.error = None
+
+        results = self.run_callers(5)
+
+        self.assertEqual(1, self.calls)
+        self.assertEqual([{'uuid': '1'}] * 5, results)
+        self.assertEqual(5, len({id(result) for result in results}))
+        # only the leader gets the object the function returned, e.g. the one kept in the entity cache
+        self.assertEqual(1, len([result for result in results if result is self.fetched]))
+        self.assertEqual(0, self.single_flight.in_flight())
+
+    def test_concurrent_callers_share_error(self):
+        self.error = ValueError('not found')
+
+        results = self.run_callers(3)
+
+        self.assertEqual(1, self.calls)
+        self.assertEqual([self.error] * 3, results)
+
+    def test_sequential_callers_are_not_shared(self):
+        self.error = None
+        self.release.set()
+
+        self.single_flight.do('https://ingest/projects/1', self.fetch)
+        self.single_flight.do('https://ingest/projects/1', self.fetch)
+
+        self.assertEqual(2, self.calls)
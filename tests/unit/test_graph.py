@@ -1,3 +1,4 @@
+import time
 from unittest import TestCase
 
 from utils.graph import Graph, CyclicDependencyError
@@ -19,8 +20,10 @@ class TestGraph(TestCase):
         g = Graph()
         g.add_edge(5, 2)
 
+        g.add_edge(2, 5)
+
         with self.assertRaises(CyclicDependencyError):
-            g.add_edge(2, 5)
+            g.topological_sort()
 
     def test_indirect_cyclic_dependency_error(self):
         g = Graph()
@@ -31,8 +34,10 @@ class TestGraph(TestCase):
         g.add_edge(2, 3)
         g.add_edge(3, 1)
 
+        g.add_edge(1, 2)
+
         with self.assertRaises(CyclicDependencyError):
-            g.add_edge(1, 2)
+            g.topological_sort()
 
     def test_indirect_cyclic_dependency_error_3_levels(self):
         g = Graph()
@@ -44,8 +49,10 @@ class TestGraph(TestCase):
         g.add_edge(3, 1)
         g.add_edge(1, 0)
 
+        g.add_edge(0, 2)
+
         with self.assertRaises(CyclicDependencyError) as context:
-            g.add_edge(0, 2)
+            g.topological_sort()
 
         self.assertEqual([0, 2, 3, 1], context.exception.cycle)
 
@@ -57,8 +64,10 @@ class TestGraph(TestCase):
         g.add_edge(3, 4)
         g.add_edge(4, 5)
 
+        g.add_edge(5, 0)
+
         with self.assertRaises(CyclicDependencyError) as context:
-            g.add_edge(5, 0)
+            g.topological_sort()
 
         self.assertEqual([5, 0, 1, 2, 3, 4], context.exception.cycle)
 
@@ -85,8 +94,10 @@ class TestGraph(TestCase):
         g = Graph()
         g.add_edge('donor', 'specimen')
 
+        g.add_edge('specimen', 'donor')
+
         with self.assertRaises(CyclicDependencyError) as context:
-            g.add_edge('specimen', 'donor')
+            g.topological_sort()
 
         self.assertEqual(['specimen', 'donor'], context.exception.cycle)
 
@@ -98,7 +109,97 @@ class TestGraph(TestCase):
         g.add_edge('cs2', 'cs3')
         g.add_edge('cs3', 'cs4')
 
+        g.add_edge('cs4', 'donor')
+
         with self.assertRaises(CyclicDependencyError) as context:
-            g.add_edge('cs4', 'donor')
+            g.topological_sort()
 
         self.assertEqual(['cs4', 'donor', 'specimen', 'cs', 'cs2', 'cs3'], context.exception.cycle)
+
+    def test_cycle_is_the_one_closed_by_the_first_cyclic_edge(self):
+        g = Graph()
+        g.add_edge('donor', 'specimen')
+        g.add_edge('specimen', 'cs')
+        g.add_edge('cs', 'donor')
+        g.add_edge('cs2', 'cs3')
+        g.add_edge('cs3', 'cs2')
+
+        with self.assertRaises(CyclicDependencyError) as context:
+            g.topological_sort()
+
+        self.assertEqual(['cs', 'donor', 'specimen'], context.exception.cycle)
+
+    def test_cycle_in_branching_graph_leaves_out_vertices_off_the_cycle(self):
+        g = Graph()
+        g.add_edge(0, 2)
+        g.add_edge(4, 3)
+        g.add_edge(4, 0)
+
+        g.add_edge(2, 4)
+
+        with self.assertRaises(CyclicDependencyError) as context:
+            g.topological_sort()
+
+        self.assertEqual([2, 4, 0], context.exception.cycle)
+
+    def test_self_cyclic_dependency_error(self):
+        g = Graph()
+        g.add_edge('donor', 'donor')
+
+        with self.assertRaises(CyclicDependencyError) as context:
+            g.topological_sort()
+
+        self.assertEqual(['donor', 'donor'], context.exception.cycle)
+
+
+class TestGraphBenchmark(TestCase):
+    NODES = 100000
+    # well above the time these take, so only going back to quadratic work fails them
+    MAX_SECONDS = 10
+
+    def assert_sorted(self, g, sorted_list):
+        position = {vertex: index for index, vertex in enumerate(sorted_list)}
+        self.assertEqual(len(g.vertices), len(sorted_list))
+        for u, v in g.edges:
+            self.assertLess(position[u], position[v])
+
+    def test_topological_sort_100k_chain(self):
+        g = Graph()
+        started_at = time.perf_counter()
+        for index in range(self.NODES - 1):
+            g.add_edge(f'cs{index}', f'cs{index + 1}')
+        sorted_list = g.topological_sort()
+        elapsed = time.perf_counter() - started_at
+
+        self.assert_sorted(g, sorted_list)
+        self.assertLess(elapsed, self.MAX_SECONDS)
+
+    def test_topological_sort_100k_samples(self):
+        # 1000 donors, 9 specimens each and 10 cell suspensions per specimen, some pooled from 2 specimens
+        g = Graph()
+        started_at = time.perf_counter()
+        for donor in range(1000):
+            for specimen in range(9):
+                g.add_edge(f'donor{donor}', f'specimen{donor}_{specimen}')
+                for cs in range(10):
+                    g.add_edge(f'specimen{donor}_{specimen}', f'cs{donor}_{specimen}_{cs}')
+                    if specimen and not cs:
+                        g.add_edge(f'specimen{donor}_{specimen - 1}', f'cs{donor}_{specimen}_{cs}')
+        sorted_list = g.topological_sort()
+        elapsed = time.perf_counter() - started_at
+
+        self.assertEqual(self.NODES, len(sorted_list))
+        self.assert_sorted(g, sorted_list)
+        self.assertLess(elapsed, self.MAX_SECONDS)
+
+    def test_cycle_in_100k_samples(self):
+        g = Graph()
+        for donor in range(1000):
+            for specimen in range(99):
+                g.add_edge(f'donor{donor}', f'specimen{donor}_{specimen}')
+        g.add_edge('specimen500_98', 'donor500')
+
+        with self.assertRaises(CyclicDependencyError) as context:
+            g.topological_sort()
+
+        self.assertEqual(['specimen500_98', 'donor500'], context.exception.cycle)
@@ -0,0 +1,87 @@
+import asyncio
+from unittest import TestCase
+
+from utils.poller import Poller, PollTimeoutException
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Condition:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.results.pop(0)
+
+
+class TestPoller(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def create_poller(self, **kwargs):
+        return Poller(clock=self.clock, sleep=self.clock.sleep, jitter=0, **kwargs)
+
+    def test_poll_backs_off_up_to_max_step(self):
+        poller = self.create_poller(step=1, max_step=5, backoff=2)
+
+        result = poller.poll(Condition([False, False, False, False, False, 'done']))
+
+        self.assertEqual('done', result)
+        self.assertEqual([1, 2, 4, 5, 5], self.clock.sleeps)
+
+    def test_poll_resets_step_on_progress(self):
+        poller = self.create_poller(step=1, max_step=10, backoff=2)
+        progress = iter([0, 0, 0, 1, 1])
+
+        poller.poll(Condition([False, False, False, False, False, True]), progress=lambda: next(progress))
+
+        self.assertEqual([1, 2, 4, 1, 2], self.clock.sleeps)
+
+    def test_poll_stops_early_on_terminal_state(self):
+        poller = self.create_poller(step=1)
+        condition = Condition([False, False, False])
+        terminal = iter([False, True])
+
+        result = poller.poll(condition, terminal=lambda: next(terminal))
+
+        self.assertFalse(result)
+        self.assertEqual(2, condition.calls)
+
+    def test_poll_times_out(self):
+        poller = self.create_poller(step=4, backoff=1, timeout=10)
+
+        with self.assertRaises(PollTimeoutException):
+            poller.poll(lambda: False)
+
+        self.assertEqual([4, 4, 2], self.clock.sleeps)
+
+    def test_jitter_stays_within_bounds(self):
+        poller = Poller(step=10, jitter=0.1, random_uniform=lambda low, high: high)
+
+        self.assertAlmostEqual(11, poller.add_jitter(10))
+
+    def test_poll_async_watches_many_conditions_from_one_thread(self):
+        poller = Poller(step=0.01, jitter=0)
+        conditions = [Condition([False] * index + [index]) for index in range(5)]
+
+        async def watch():
+            return await asyncio.gather(*[poller.poll_async(condition) for condition in conditions[1:]])
+
+        loop = asyncio.new_event_loop()
+        results = loop.run_until_complete(watch())
+        loop.close()
+
+        self.assertEqual([1, 2, 3, 4], results)
@@ -0,0 +1,218 @@
+import copy
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hit_rate
+        }
+
+
+class EntityCache(ABC):
+    """
+    Interface of the entity caches used by IngestAPI, entries are keyed by entity url.
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def put(self, url: str, entity: dict):
+        pass
+
+    @abstractmethod
+    def invalidate(self, url: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at')
+
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class LruEntityCache(EntityCache):
+    """
+    Thread-safe least-recently-used cache bounded by number of entries and, optionally, by the approximate
+    size in bytes of the cached json. Entries expire after the TTL configured for their entity type, which is
+    taken from the first path segment of the url e.g. biomaterials in /biomaterials/search/findByUuid.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = None, default_ttl: float = None,
+                 ttl_by_type: Dict[str, float] = None, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttl_by_type = ttl_by_type if ttl_by_type else {}
+        self.current_bytes = 0
+        self.__clock = clock
+        self.__entries: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def get(self, url: str) -> Optional[dict]:
+        with self.__lock:
+            entry = self.__entries.get(url)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if entry.expires_at is not None and entry.expires_at <= self.__clock():
+                self.__remove(url)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self.__entries.move_to_end(url)
+            self.stats.hits += 1
+            return entry.value
+
+    def put(self, url: str, entity: dict):
+        ttl = self.get_ttl(url)
+        if ttl is not None and ttl <= 0:
+            return
+        size = self.estimate_size(entity) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        expires_at = self.__clock() + ttl if ttl is not None else None
+        with self.__lock:
+            if url in self.__entries:
+                self.__remove(url)
+            self.__entries[url] = _CacheEntry(entity, size, expires_at)
+            self.current_bytes += size
+            self.__evict()
+
+    def invalidate(self, url: str):
+        with self.__lock:
+            if url in self.__entries:
+                self.__remove(url)
+                self.stats.invalidations += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.current_bytes = 0
+
+    def get_ttl(self, url: str) -> Optional[float]:
+        entity_type = self.entity_type_from_url(url)
+        return self.ttl_by_type.get(entity_type, self.default_ttl)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, url):
+        return url in self.__entries
+
+    def __evict(self):
+        while self.__entries and (len(self.__entries) > self.max_entries or
+                                  (self.max_bytes and self.current_bytes > self.max_bytes)):
+            url = next(iter(self.__entries))
+            self.__remove(url)
+            self.stats.evictions += 1
+
+    def __remove(self, url):
+        entry = self.__entries.pop(url)
+        self.current_bytes -= entry.size
+
+    @staticmethod
+    def entity_type_from_url(url: str) -> str:
+        location = urlparse(url).path.strip('/')
+        return location.split('/')[0]
+
+    @staticmethod
+    def estimate_size(entity: dict) -> int:
+        return len(json.dumps(entity))
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the function, the callers that arrive while
+    it is running wait for it and get the same exception, or their own copy of the result so that they can change it.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self.__flights: Dict[str, _Flight] = {}
+        self.__lock = threading.Lock()
+
+    def do(self, key: str, function: Callable[[], Any]) -> Any:
+        with self.__lock:
+            flight = self.__flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.__flights[key] = _Flight()
+            else:
+                flight.followers += 1
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        result = None
+        try:
+            result = function()
+            return result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__flights[key]
+            if flight.error is None and flight.followers:
+                # copied before the leader returns, so its caller can't change the result while the followers copy it
+                flight.result = copy.deepcopy(result)
+            flight.done.set()
+
+    def in_flight(self) -> int:
+        with self.__lock:
+            return len(self.__flights)
@@ -9,6 +9,7 @@ from ingest.api.ingestapi import IngestApi
 from submission_broker.services.biosamples import BioSamples
 
 from converter.biosamples import BioSamplesConverter
+from hca.snapshot import create_hca_submission_snapshot
 from .loader import DuplicateLoader
 from .submission import DuplicateSubmission, HcaSubmission
 
@@ -16,7 +17,7 @@ from .submission import DuplicateSubmission, HcaSubmission
 class DuplicateArchiver:
     def __init__(self, ingest: IngestApi, biosamples: BioSamplesClient, test_biosamples: BioSamples, converter: BioSamplesConverter, ignored_keys=[]):
         self.ingest = ingest
-        self.loader = DuplicateLoader(ingest)
+        self.loader = DuplicateLoader(ingest, snapshot=create_hca_submission_snapshot())
         self.read_biosamples = biosamples
         self.converter = converter
         self.write_biosamples = test_biosamples
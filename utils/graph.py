@@ -1,50 +1,124 @@
-# Python program to print topological sorting of a Directed Acyclic Graph (DAG)
-# https://www.geeksforgeeks.org/python-program-for-topological-sorting/
-from collections import defaultdict
+from collections import defaultdict, deque
+
+_VISITING = 1
+_VISITED = 2
 
 
 class Graph:
+    """
+    A directed graph, e.g. of samples and the samples they were derived from. Cycles are looked for once, when the
+    graph is sorted, instead of on every edge, and no recursion is used so very deep graphs can be sorted too.
+    """
+
     def __init__(self):
         self.adjacency_list = defaultdict(list)
-        self.visited = {}  # tracks vertices visited during sorting
+        self.vertices = {}  # vertices in the order they were added, used as a set that keeps the order
+        self.edges = []
 
     def add_edge(self, u, v):
-        self.check_cycle(u, v)
         self.adjacency_list[u].append(v)
-        self.visited[u] = False
-        self.visited[v] = False
-
-    def check_cycle(self, u, v, cycle=None):
-        if not cycle:
-            cycle = [u, v]
-        else:
-            cycle.append(v)
-
-        if u in self.adjacency_list[v]:
-            raise CyclicDependencyError(f'Cycle found! {cycle} ', cycle)
-        for adjacent_vertex in self.adjacency_list[v]:
-            self.check_cycle(u, adjacent_vertex, cycle)
-
-    def _topological_sort(self, vertex, stack):
-        self.visited[vertex] = True
-
-        for adjacent_vertex in self.adjacency_list[vertex]:
-            if not self.visited[adjacent_vertex]:
-                self._topological_sort(adjacent_vertex, stack)
-        stack.insert(0, vertex)
+        self.vertices.setdefault(u)
+        self.vertices.setdefault(v)
+        self.edges.append((u, v))
 
     def topological_sort(self):
-        stack = []
+        """
+        Depth-first, so the order is the one the graph always had. Raises CyclicDependencyError when the graph has
+        a cycle.
+        """
+        order = []
+        state = {}
+        for root in self.vertices:
+            if root in state:
+                continue
+            state[root] = _VISITING
+            stack = [(root, iter(self.adjacency_list.get(root, ())))]
+            while stack:
+                vertex, adjacent_vertices = stack[-1]
+                for adjacent_vertex in adjacent_vertices:
+                    adjacent_state = state.get(adjacent_vertex)
+                    if adjacent_state == _VISITING:
+                        raise self.find_cycle_error()
+                    if not adjacent_state:
+                        state[adjacent_vertex] = _VISITING
+                        stack.append((adjacent_vertex, iter(self.adjacency_list.get(adjacent_vertex, ()))))
+                        break
+                else:
+                    stack.pop()
+                    state[vertex] = _VISITED
+                    order.append(vertex)
+        order.reverse()
+        return order
 
-        for vertex in self.visited.keys():
-            if not self.visited[vertex]:
-                self._topological_sort(vertex, stack)
+    def find_cycle_error(self) -> 'CyclicDependencyError':
+        """
+        Reports the cycle closed by the first edge that made the graph cyclic, as [u, v, ...] where u -> v is that
+        edge and the rest is the path back from v to u. The check add_edge used to make listed every vertex its
+        search went through instead, so on a branching graph it also gave vertices off the cycle, e.g. [2, 4, 3, 0]
+        instead of [2, 4, 0] for the edges (0, 2), (4, 3), (4, 0), (2, 4). Along a single path both are the same.
+        """
+        # only the edges between vertices left over by Kahn's algorithm can be part of a cycle
+        cyclic_vertices = self._get_cyclic_vertices(self.edges)
+        edges = [(u, v) for u, v in self.edges if u in cyclic_vertices and v in cyclic_vertices]
+        low, high = 1, len(edges)
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_cyclic_vertices(edges[:middle]):
+                high = middle
+            else:
+                low = middle + 1
+        u, v = edges[low - 1]
+        cycle = [u] + self._find_path(edges[:low - 1], v, u)
+        return CyclicDependencyError(f'Cycle found! {cycle} ', cycle)
 
-        return stack
+    @staticmethod
+    def _get_cyclic_vertices(edges) -> set:
+        """
+        Kahn's algorithm, the vertices that never run out of incoming edges are in a cycle or downstream of one
+        """
+        adjacency_list = defaultdict(list)
+        in_degree = defaultdict(int)
+        for u, v in edges:
+            adjacency_list[u].append(v)
+            in_degree[v] += 1
+            in_degree.setdefault(u, 0)
+        ready = deque(vertex for vertex, degree in in_degree.items() if not degree)
+        while ready:
+            vertex = ready.popleft()
+            for adjacent_vertex in adjacency_list[vertex]:
+                in_degree[adjacent_vertex] -= 1
+                if not in_degree[adjacent_vertex]:
+                    ready.append(adjacent_vertex)
+        return {vertex for vertex, degree in in_degree.items() if degree}
+
+    @staticmethod
+    def _find_path(edges, start, target) -> list:
+        """the path from start to a vertex with an edge to target, not including target"""
+        adjacency_list = defaultdict(list)
+        for u, v in edges:
+            adjacency_list[u].append(v)
+        path = [start]
+        stack = [iter(adjacency_list[start])]
+        seen = {start}
+        if start == target or target in adjacency_list[start]:
+            return path
+        while stack:
+            for adjacent_vertex in stack[-1]:
+                if adjacent_vertex in seen:
+                    continue
+                seen.add(adjacent_vertex)
+                path.append(adjacent_vertex)
+                if target in adjacency_list[adjacent_vertex]:
+                    return path
+                stack.append(iter(adjacency_list[adjacent_vertex]))
+                break
+            else:
+                stack.pop()
+                path.pop()
+        return path
 
 
 class CyclicDependencyError(Exception):
     def __init__(self, message, cycle):
         self.cycle = cycle
         super(CyclicDependencyError, self).__init__(message)
-
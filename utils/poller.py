@@ -0,0 +1,100 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Optional
+
+
+class PollTimeoutException(Exception):
+    def __init__(self, last_result=None):
+        super().__init__('Polling timed out')
+        self.last_result = last_result
+
+
+class Poller:
+    """
+    Calls a condition until it returns a truthy value, sleeping between calls. The sleep starts at step and grows by
+    backoff, up to max_step, while nothing changes. It goes back to step whenever progress() returns a new value, so
+    a submission that is moving is checked often and one that is stuck is checked rarely. Some jitter is added so
+    that many submissions started together don't poll in lockstep.
+
+    Polling stops early, returning the last falsy result, when terminal() is true, and raises PollTimeoutException
+    once timeout seconds have passed. A timeout of None polls forever.
+    """
+
+    def __init__(self, step: float, max_step: float = None, backoff: float = 2.0, jitter: float = 0.1,
+                 timeout: float = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Any] = time.sleep, random_uniform: Callable[[float, float], float] = None):
+        self.step = step
+        self.max_step = max_step if max_step else step
+        self.backoff = backoff
+        self.jitter = jitter
+        self.timeout = timeout
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__random_uniform = random_uniform if random_uniform else random.uniform
+
+    def poll(self, condition: Callable[[], Any], progress: Callable[[], Any] = None,
+             terminal: Callable[[], bool] = None):
+        state = _PollState(self, progress, terminal)
+        while True:
+            result = condition()
+            delay = state.next_delay(result)
+            if delay is None:
+                return result
+            self.__sleep(delay)
+
+    async def poll_async(self, condition: Callable[[], Any], progress: Callable[[], Any] = None,
+                         terminal: Callable[[], bool] = None):
+        """
+        Same as poll, but waits on the event loop, so that one thread can watch many submissions. The condition
+        usually makes blocking requests so it is run in the loop's default executor.
+        """
+        loop = asyncio.get_running_loop()
+        state = _PollState(self, progress, terminal)
+        while True:
+            result = await loop.run_in_executor(None, condition)
+            delay = state.next_delay(result)
+            if delay is None:
+                return result
+            await asyncio.sleep(delay)
+
+    def now(self) -> float:
+        return self.__clock()
+
+    def add_jitter(self, delay: float) -> float:
+        if not self.jitter:
+            return delay
+        return max(delay * (1 + self.__random_uniform(-self.jitter, self.jitter)), 0)
+
+
+class _PollState:
+    def __init__(self, poller: Poller, progress: Optional[Callable[[], Any]], terminal: Optional[Callable[[], bool]]):
+        self.poller = poller
+        self.progress = progress
+        self.terminal = terminal
+        self.started_at = poller.now()
+        self.delay = poller.step
+        self.last_progress = None
+
+    def next_delay(self, result) -> Optional[float]:
+        """returns None when polling is over"""
+        if result or (self.terminal and self.terminal()):
+            return None
+
+        elapsed = self.poller.now() - self.started_at
+        if self.poller.timeout is not None and elapsed >= self.poller.timeout:
+            raise PollTimeoutException(result)
+
+        delay = self.__adjust_delay()
+        if self.poller.timeout is not None:
+            delay = min(delay, self.poller.timeout - elapsed)
+        return delay
+
+    def __adjust_delay(self) -> float:
+        current_progress = self.progress() if self.progress else None
+        if current_progress != self.last_progress:
+            self.delay = self.poller.step
+        delay = self.delay
+        self.delay = min(self.delay * self.poller.backoff, self.poller.max_step)
+        self.last_progress = current_progress
+        return self.poller.add_jitter(delay)